@@ -0,0 +1,48 @@
+"""Add per-session chat message sequence numbers
+
+Revision ID: 7c1e5a2b9d40
+Revises: 40a23020153d
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1e5a2b9d40'
+down_revision: Union[str, None] = '40a23020153d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('chat_sessions', sa.Column('last_seq', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('chat_messages', sa.Column('seq', sa.Integer(), nullable=True))
+    # CODEX: number existing messages in their historical order, then remember each session's high-water mark
+    op.execute("""
+        UPDATE chat_messages SET seq = numbered.rn
+        FROM (
+            SELECT id, row_number() OVER (PARTITION BY session_id ORDER BY created_at, id) AS rn
+            FROM chat_messages
+        ) AS numbered
+        WHERE chat_messages.id = numbered.id
+    """)
+    op.execute("""
+        UPDATE chat_sessions SET last_seq = COALESCE(
+            (SELECT max(seq) FROM chat_messages WHERE chat_messages.session_id = chat_sessions.id), 0)
+    """)
+    op.alter_column('chat_messages', 'seq', nullable=False)
+    op.create_index('ix_chat_messages_session_id_seq', 'chat_messages', ['session_id', 'seq'], unique=False)
+    op.create_index('ix_chat_sessions_user_id_id', 'chat_sessions', ['user_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_chat_sessions_user_id_id', table_name='chat_sessions')
+    op.drop_index('ix_chat_messages_session_id_seq', table_name='chat_messages')
+    op.drop_column('chat_messages', 'seq')
+    op.drop_column('chat_sessions', 'last_seq')
@@ -0,0 +1,34 @@
+"""Add chat message token counts and rolling session summaries
+
+Revision ID: a3f9c0d84e12
+Revises: 7c1e5a2b9d40
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f9c0d84e12'
+down_revision: Union[str, None] = '7c1e5a2b9d40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('chat_messages', sa.Column('token_count', sa.Integer(), server_default='0', nullable=False))
+    # CODEX: same ~4 characters per token estimate the app uses for new messages
+    op.execute("UPDATE chat_messages SET token_count = (length(text) + 3) / 4")
+    op.add_column('chat_sessions', sa.Column('summary', sa.String(), nullable=True))
+    op.add_column('chat_sessions', sa.Column('summary_seq', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('chat_sessions', 'summary_seq')
+    op.drop_column('chat_sessions', 'summary')
+    op.drop_column('chat_messages', 'token_count')
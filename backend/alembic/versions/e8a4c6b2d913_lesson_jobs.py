@@ -0,0 +1,71 @@
+"""Add batch lesson-generation jobs
+
+Revision ID: e8a4c6b2d913
+Revises: d52b7e1f3a68
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8a4c6b2d913'
+down_revision: Union[str, None] = 'd52b7e1f3a68'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+job_status = sa.Enum('queued', 'running', 'completed', 'failed', name='jobstatus')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('lesson_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('teacher_id', sa.Integer(), nullable=False),
+    sa.Column('status', job_status, nullable=False),
+    sa.Column('model', sa.String(), nullable=False),
+    sa.Column('style', sa.String(), nullable=True),
+    sa.Column('pre_prompt', sa.String(), nullable=True),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('completed', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('failed', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['teacher_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_lesson_jobs_id'), 'lesson_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_lesson_jobs_teacher_id'), 'lesson_jobs', ['teacher_id'], unique=False)
+    op.create_table('lesson_job_items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('job_id', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('prompt', sa.String(), nullable=False),
+    sa.Column('status', job_status, nullable=False),
+    sa.Column('result', sa.String(), nullable=True),
+    sa.Column('error', sa.String(), nullable=True),
+    sa.Column('cached', sa.Boolean(), server_default=sa.false(), nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['job_id'], ['lesson_jobs.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_lesson_job_items_id'), 'lesson_job_items', ['id'], unique=False)
+    op.create_index('ix_lesson_job_items_job_id_position', 'lesson_job_items', ['job_id', 'position'], unique=False)
+    op.create_index('ix_lesson_job_items_status', 'lesson_job_items', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_lesson_job_items_status', table_name='lesson_job_items')
+    op.drop_index('ix_lesson_job_items_job_id_position', table_name='lesson_job_items')
+    op.drop_index(op.f('ix_lesson_job_items_id'), table_name='lesson_job_items')
+    op.drop_table('lesson_job_items')
+    op.drop_index(op.f('ix_lesson_jobs_teacher_id'), table_name='lesson_jobs')
+    op.drop_index(op.f('ix_lesson_jobs_id'), table_name='lesson_jobs')
+    op.drop_table('lesson_jobs')
+    job_status.drop(op.get_bind(), checkfirst=True)
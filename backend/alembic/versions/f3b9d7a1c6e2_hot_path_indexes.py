@@ -0,0 +1,48 @@
+"""Index the foreign keys and sort keys used by the hot read paths
+
+Revision ID: f3b9d7a1c6e2
+Revises: e8a4c6b2d913
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b9d7a1c6e2'
+down_revision: Union[str, None] = 'e8a4c6b2d913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# chat_sessions.user_id and chat_messages.session_id are already covered by
+# ix_chat_sessions_user_id_id and ix_chat_messages_session_id_seq (revision 7c1e5a2b9d40).
+INDEXES = [
+    ('ix_classroom_students_student_id', 'classroom_students', ['student_id', 'classroom_id']),
+    ('ix_classrooms_teacher_id', 'classrooms', ['teacher_id']),
+    ('ix_assignments_classroom_id', 'assignments', ['classroom_id']),
+    ('ix_grades_student_id_assignment_id', 'grades', ['student_id', 'assignment_id']),
+    ('ix_grades_assignment_id', 'grades', ['assignment_id']),
+    ('ix_lessons_classroom_id_scheduled_date', 'lessons', ['classroom_id', 'scheduled_date']),
+    ('ix_subjects_classroom_id', 'subjects', ['classroom_id']),
+    ('ix_analytics_teacher_id', 'analytics', ['teacher_id']),
+    ('ix_analytics_student_id', 'analytics', ['student_id']),
+    ('ix_audit_logs_timestamp_id', 'audit_logs', ['timestamp', 'id']),
+    ('ix_audit_logs_user_id', 'audit_logs', ['user_id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CODEX: build concurrently on PostgreSQL so the tables stay writable (needs to run outside a transaction)
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,150 @@
+# CODEX: Priority admission control and backpressure in front of Ollama
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Dict, Optional
+
+from app.config import OLLAMA_MAX_CONCURRENCY, OLLAMA_MAX_QUEUE, OLLAMA_RETRY_AFTER, OLLAMA_MAX_WAIT
+
+
+class Priority(IntEnum):
+    """Lower value is admitted first."""
+    lesson = 0
+    analytics = 1
+    tutor = 2
+    summary = 3
+    batch = 4
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Caps concurrent Ollama generations; excess requests wait in a bounded priority queue.
+
+    A full queue rejects with 429 (or evicts a lower-priority waiter with 503), and a request
+    that outlives its wait deadline is rejected with 503. Both carry a Retry-After hint.
+    """
+
+    def __init__(self, max_concurrency: int = OLLAMA_MAX_CONCURRENCY, max_queue: int = OLLAMA_MAX_QUEUE,
+                 max_wait: Optional[Dict[str, float]] = None, retry_after: int = OLLAMA_RETRY_AFTER,
+                 default_max_wait: float = 30.0):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = dict(OLLAMA_MAX_WAIT if max_wait is None else max_wait)
+        self.default_max_wait = default_max_wait
+        self.retry_after = retry_after
+        self._active = 0
+        self._queued = 0
+        self._heap = []  # (priority, seq, future)
+        self._seq = itertools.count()
+        self._wait_samples = deque(maxlen=1024)
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_deadline = 0
+        self.evicted = 0
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+
+    def _deadline_for(self, priority: Priority) -> float:
+        return self.max_wait.get(priority.name, self.default_max_wait)
+
+    def _record_wait(self, waited: float):
+        self.admitted += 1
+        self.total_wait += waited
+        self.max_wait_seen = max(self.max_wait_seen, waited)
+        self._wait_samples.append(waited)
+
+    def _reject(self, status_code: int, detail: str) -> AdmissionRejected:
+        return AdmissionRejected(status_code, detail, self.retry_after)
+
+    def _lowest_priority_waiter(self):
+        live = [entry for entry in self._heap if not entry[2].done()]
+        return max(live, default=None)
+
+    async def acquire(self, priority: Priority, max_wait: Optional[float] = None):
+        start = time.monotonic()
+        if self._active < self.max_concurrency and self._queued == 0:
+            self._active += 1
+            self._record_wait(0.0)
+            return
+        if self._queued >= self.max_queue:
+            victim = self._lowest_priority_waiter()
+            if victim is None or victim[0] <= priority:
+                self.rejected_full += 1
+                raise self._reject(429, "AI service is busy, please retry shortly")
+            # make room for the more important request
+            victim[2].set_exception(self._reject(503, "AI request was displaced by higher-priority work"))
+            self._queued -= 1
+            self.evicted += 1
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (priority, next(self._seq), future))
+        self._queued += 1
+        try:
+            await asyncio.wait_for(future, timeout=self._deadline_for(priority) if max_wait is None else max_wait)
+        except asyncio.TimeoutError:
+            self._abandon(future)
+            self.rejected_deadline += 1
+            raise self._reject(503, "AI service is overloaded, please retry shortly")
+        except asyncio.CancelledError:
+            self._abandon(future)
+            raise
+        self._record_wait(time.monotonic() - start)
+
+    def _abandon(self, future: asyncio.Future):
+        if future.done() and not future.cancelled() and future.exception() is None:
+            # the slot was handed over just as the caller gave up
+            self.release()
+        elif future.cancelled():
+            self._queued -= 1
+
+    def release(self):
+        while self._heap:
+            _, _, future = heapq.heappop(self._heap)
+            if future.done():
+                continue
+            # hand the slot straight to the next waiter so it cannot be stolen
+            self._queued -= 1
+            future.set_result(True)
+            return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority, max_wait: Optional[float] = None):
+        await self.acquire(priority, max_wait)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        samples = sorted(self._wait_samples)
+
+        def pct(p):
+            return samples[min(len(samples) - 1, int(p * len(samples)))] if samples else 0.0
+
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self._active,
+            "queue_depth": self._queued,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected_full": self.rejected_full,
+            "rejected_deadline": self.rejected_deadline,
+            "evicted": self.evicted,
+            "avg_wait_seconds": self.total_wait / self.admitted if self.admitted else 0.0,
+            "p95_wait_seconds": pct(0.95),
+            "max_wait_seconds": self.max_wait_seen,
+        }
+
+
+ollama_admission = AdmissionController()
@@ -0,0 +1,94 @@
+# CODEX: Cached per-student advisor snapshots, invalidated by the writes that change them
+import threading
+from datetime import date
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import exists
+from sqlalchemy.orm import Session
+
+from app.authz import scope_to_classrooms
+from app.cache import LRUCache
+from app.config import ADVISOR_LOW_GRADE_THRESHOLD, ADVISOR_CACHE_MAX_ENTRIES, ADVISOR_CACHE_TTL
+from app.models import Assignment, Grade, Lesson, classroom_students
+from app.schemas import AdvisorResponse
+
+
+class AdvisorSnapshots:
+    """Advisor responses computed once per student and day, then served from an in-process LRU.
+
+    The routes that write grades, assignments, lessons, enrollments or classrooms invalidate
+    exactly the students affected. The TTL bounds staleness from writes made through other
+    workers. A snapshot computed while one of its inputs changed is not stored.
+    """
+
+    def __init__(self, max_entries: int = ADVISOR_CACHE_MAX_ENTRIES, ttl: float = ADVISOR_CACHE_TTL,
+                 low_grade_threshold: int = ADVISOR_LOW_GRADE_THRESHOLD):
+        self.low_grade_threshold = low_grade_threshold
+        self._cache = LRUCache(max_entries, ttl=ttl)
+        self._lock = threading.Lock()
+        self._computing: Dict[int, List[dict]] = {}
+        self.computed = 0
+        self.invalidations = 0
+
+    def compute(self, db: Session, student, today: date) -> dict:
+        lessons = scope_to_classrooms(db.query(Lesson), Lesson.classroom_id, student)\
+            .filter(Lesson.scheduled_date >= today).order_by(Lesson.scheduled_date, Lesson.id).all()
+        # anti-join: assignments of the student's classrooms without a grade for this student
+        graded = exists().where(Grade.assignment_id == Assignment.id, Grade.student_id == student.id)
+        pending = scope_to_classrooms(db.query(Assignment), Assignment.classroom_id, student)\
+            .filter(~graded).order_by(Assignment.id).all()
+        low_grades = db.query(Grade).filter(Grade.student_id == student.id, Grade.score < self.low_grade_threshold)\
+            .order_by(Grade.id).all()
+        self.computed += 1
+        return AdvisorResponse(upcoming_lessons=lessons, pending_assignments=pending,
+                               low_grades=low_grades).model_dump(mode="json")
+
+    def get(self, db: Session, student, today: Optional[date] = None) -> dict:
+        today = today or date.today()
+        cached = self._cache.get(student.id)
+        if cached is not None and cached[0] == today:
+            return cached[1]
+        marker = {"stale": False}
+        with self._lock:
+            self._computing.setdefault(student.id, []).append(marker)
+        try:
+            snapshot = self.compute(db, student, today)
+        except BaseException:
+            with self._lock:
+                self._forget(student.id, marker)
+            raise
+        with self._lock:
+            # check and store before the marker goes, so no invalidation can slip in between
+            self._forget(student.id, marker)
+            if not marker["stale"]:
+                self._cache.set(student.id, (today, snapshot))
+        return snapshot
+
+    def _forget(self, student_id: int, marker: dict):
+        markers = self._computing[student_id]
+        markers.remove(marker)
+        if not markers:
+            del self._computing[student_id]
+
+    def invalidate_students(self, student_ids: Iterable[int]):
+        with self._lock:
+            for student_id in student_ids:
+                self.invalidations += 1
+                self._cache.delete(student_id)
+                for marker in self._computing.get(student_id, ()):
+                    marker["stale"] = True
+
+    @staticmethod
+    def enrolled_students(db: Session, classroom_id: int) -> List[int]:
+        rows = db.query(classroom_students.c.student_id).filter(classroom_students.c.classroom_id == classroom_id)
+        return [row.student_id for row in rows]
+
+    def invalidate_classroom(self, db: Session, classroom_id: int):
+        """Drop the snapshots of every student enrolled in classroom_id (call after committing)."""
+        self.invalidate_students(self.enrolled_students(db, classroom_id))
+
+    def stats(self) -> dict:
+        return {**self._cache.stats(), "computed": self.computed, "invalidations": self.invalidations}
+
+
+advisor_snapshots = AdvisorSnapshots()
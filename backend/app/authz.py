@@ -0,0 +1,96 @@
+# CODEX: Role-based visibility of classrooms, expressed as SQL so listings stay one query
+import threading
+from typing import Optional
+
+from sqlalchemy import exists, select
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.sql import Select
+
+from app.cache import LRUCache
+from app.config import AUTHZ_CACHE_TTL, AUTHZ_CACHE_MAX_USERS
+from app.models import Classroom, UserRole, classroom_students
+
+
+def visible_classrooms(user) -> Optional[Select]:
+    """SELECT of the classroom ids whose content user may list; None means every classroom (admins)."""
+    if user.role == UserRole.admin:
+        return None
+    if user.role == UserRole.teacher:
+        return select(Classroom.id).where(Classroom.teacher_id == user.id)
+    return select(classroom_students.c.classroom_id).where(classroom_students.c.student_id == user.id)
+
+
+def scope_to_classrooms(query: Query, classroom_column, user) -> Query:
+    """Restrict query to rows whose classroom_column is visible to user.
+
+    "classroom_id IN (subquery)" is a semi-join: every row comes back once however many
+    classrooms match, and the database walks the classroom_students / teacher index instead
+    of Python walking relationships.
+    """
+    scope = visible_classrooms(user)
+    return query if scope is None else query.filter(classroom_column.in_(scope))
+
+
+class ClassroomAccess:
+    """Answers "can user U see classroom C" for the detail endpoints.
+
+    Each answer costs one indexed EXISTS query (the teacher index on classrooms, or the
+    classroom_students primary key) and is remembered in a short-TTL per-user map, so
+    repeated checks while browsing a classroom cost nothing. Joining a classroom, deleting a
+    classroom and changing or deleting a user invalidate the affected entries; the TTL
+    bounds staleness from writes made through other workers.
+    """
+
+    def __init__(self, ttl: float = AUTHZ_CACHE_TTL, max_users: int = AUTHZ_CACHE_MAX_USERS):
+        self._cache = LRUCache(max_users, ttl=ttl)  # user_id -> {classroom_id: visible}
+        self._lock = threading.Lock()
+        self._epoch = 0  # bumped by every invalidation
+        self.checks = 0
+        self.queries = 0
+
+    def _query(self, db: Session, user, classroom_id: int) -> bool:
+        self.queries += 1
+        if user.role == UserRole.teacher:
+            condition = exists().where(Classroom.id == classroom_id, Classroom.teacher_id == user.id)
+        else:
+            condition = exists().where(classroom_students.c.classroom_id == classroom_id,
+                                       classroom_students.c.student_id == user.id)
+        return bool(db.query(condition).scalar())
+
+    def can_view(self, db: Session, user, classroom_id: int) -> bool:
+        if user.role == UserRole.admin:
+            return True
+        self.checks += 1
+        with self._lock:
+            known = self._cache.get(user.id)
+            if known is not None and classroom_id in known:
+                return known[classroom_id]
+            epoch = self._epoch
+        visible = self._query(db, user, classroom_id)
+        with self._lock:
+            # an answer that raced with an invalidation may already be wrong: use it once, don't keep it
+            if epoch == self._epoch:
+                known = self._cache.get(user.id)
+                if known is None:
+                    known = {}
+                    self._cache.set(user.id, known)
+                known[classroom_id] = visible
+        return visible
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            self._epoch += 1
+            self._cache.delete(user_id)
+
+    def invalidate_classroom(self, classroom_id: int):
+        with self._lock:
+            self._epoch += 1
+            for known in self._cache.values():
+                known.pop(classroom_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._cache.stats(), "checks": self.checks, "queries": self.queries}
+
+
+classroom_access = ClassroomAccess()
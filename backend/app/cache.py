@@ -0,0 +1,244 @@
+# CODEX: Two-tier cache for AI responses (in-process LRU in front of a shared backend)
+import hashlib
+import logging
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from app.config import (
+    REDIS_URL,
+    AI_CACHE_BACKEND,
+    AI_CACHE_TTL,
+    AI_CACHE_L1_MAX_ENTRIES,
+    AI_CACHE_L1_MAX_BYTES,
+    AI_CACHE_L1_TTL,
+    AI_CACHE_COMPRESS_MIN_BYTES,
+    AI_CACHE_REDIS_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """Thread-safe bounded LRU with entry-count, byte-size and TTL eviction."""
+
+    def __init__(self, max_entries: int, ttl: Optional[float] = None, max_bytes: Optional[int] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._data: "OrderedDict[Any, tuple]" = OrderedDict()  # key -> (value, expires_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at, _ = entry
+            if expires_at is not None and expires_at <= self._clock():
+                self._pop(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: Optional[float] = None, size: int = 1):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = self._clock() + ttl if ttl else None
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._data[key] = (value, expires_at, size)
+            self._bytes += size
+            while len(self._data) > self.max_entries or (self.max_bytes is not None and self._bytes > self.max_bytes):
+                self._pop(next(iter(self._data)))
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _pop(self, key):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def __len__(self):
+        return len(self._data)
+
+    def values(self) -> list:
+        """Snapshot of the stored values, expired ones included; does not count as hits."""
+        with self._lock:
+            return [entry[0] for entry in self._data.values()]
+
+    def stats(self) -> dict:
+        return {"entries": len(self._data), "bytes": self._bytes, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions}
+
+
+class MemoryBackend:
+    """In-memory only backend for deployments or tests without Redis."""
+
+    def __init__(self, max_entries: int = 4096):
+        self._store = LRUCache(max_entries)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._store.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[int] = None):
+        self._store.set(key, value, ttl=ttl)
+
+    async def delete(self, key: str):
+        self._store.delete(key)
+
+    async def close(self):
+        self._store.clear()
+
+
+class RedisBackend:
+    """Redis backend that degrades to a cache miss (and backs off) while Redis is unreachable."""
+
+    def __init__(self, client, retry_after: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        self._client = client
+        self._retry_after = retry_after
+        self._clock = clock
+        self._down_until = 0.0
+        self.errors = 0
+
+    @classmethod
+    def from_url(cls, url: str, timeout: float = AI_CACHE_REDIS_TIMEOUT):
+        import redis.asyncio as aioredis
+        client = aioredis.from_url(url, socket_connect_timeout=timeout, socket_timeout=timeout)
+        return cls(client)
+
+    def _available(self) -> bool:
+        return self._clock() >= self._down_until
+
+    def _failed(self, op: str, exc: Exception):
+        self.errors += 1
+        self._down_until = self._clock() + self._retry_after
+        logger.warning("AI cache %s failed, bypassing Redis for %ss: %s", op, self._retry_after, exc)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        if not self._available():
+            return None
+        try:
+            return await self._client.get(key)
+        except Exception as exc:
+            self._failed("get", exc)
+            return None
+
+    async def set(self, key: str, value: bytes, ttl: Optional[int] = None):
+        if not self._available():
+            return
+        try:
+            await self._client.set(key, value, ex=ttl)
+        except Exception as exc:
+            self._failed("set", exc)
+
+    async def delete(self, key: str):
+        if not self._available():
+            return
+        try:
+            await self._client.delete(key)
+        except Exception as exc:
+            self._failed("delete", exc)
+
+    async def close(self):
+        try:
+            await self._client.aclose()
+        except Exception:
+            pass
+
+
+class AICache:
+    """L1 LRU in front of a shared backend, with hashed keys and optional zlib compression."""
+
+    _RAW = b"r"
+    _ZLIB = b"z"
+
+    def __init__(self, backend, ttl: int = AI_CACHE_TTL, l1_max_entries: int = AI_CACHE_L1_MAX_ENTRIES,
+                 l1_max_bytes: int = AI_CACHE_L1_MAX_BYTES, l1_ttl: float = AI_CACHE_L1_TTL,
+                 compress_min_bytes: Optional[int] = AI_CACHE_COMPRESS_MIN_BYTES):
+        self.backend = backend
+        self.ttl = ttl
+        self.compress_min_bytes = compress_min_bytes
+        self.l1 = LRUCache(l1_max_entries, ttl=l1_ttl, max_bytes=l1_max_bytes)
+        self.l2_hits = 0
+
+    @staticmethod
+    def make_key(namespace: str, *parts) -> str:
+        digest = hashlib.sha256("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+        return f"{namespace}:{digest[:32]}"
+
+    def _encode(self, value: str) -> bytes:
+        raw = value.encode("utf-8")
+        if self.compress_min_bytes is not None and len(raw) >= self.compress_min_bytes:
+            return self._ZLIB + zlib.compress(raw)
+        return self._RAW + raw
+
+    @classmethod
+    def _decode(cls, stored: bytes) -> Optional[str]:
+        marker, body = stored[:1], stored[1:]
+        if marker == cls._ZLIB:
+            return zlib.decompress(body).decode("utf-8")
+        if marker == cls._RAW:
+            return body.decode("utf-8")
+        return None
+
+    async def get(self, key: str) -> Optional[str]:
+        value = self.l1.get(key)
+        if value is not None:
+            return value
+        stored = await self.backend.get(key)
+        if not stored:
+            return None
+        try:
+            value = self._decode(stored)
+        except (zlib.error, UnicodeDecodeError):
+            value = None
+        if value is not None:
+            self.l2_hits += 1
+            self.l1.set(key, value, size=len(value))
+        return value
+
+    async def set(self, key: str, value: str, ttl: Optional[int] = None):
+        self.l1.set(key, value, size=len(value))
+        await self.backend.set(key, self._encode(value), ttl=ttl or self.ttl)
+
+    async def delete(self, key: str):
+        self.l1.delete(key)
+        await self.backend.delete(key)
+
+    async def close(self):
+        await self.backend.close()
+
+    def stats(self) -> dict:
+        return {"backend": type(self.backend).__name__, "l1": self.l1.stats(), "l2_hits": self.l2_hits,
+                "backend_errors": getattr(self.backend, "errors", 0)}
+
+
+def build_ai_cache() -> AICache:
+    if AI_CACHE_BACKEND == "memory":
+        return AICache(MemoryBackend())
+    return AICache(RedisBackend.from_url(REDIS_URL))
+
+
+ai_cache = build_ai_cache()
@@ -0,0 +1,77 @@
+# CODEX: Capped chat history kept as a per-session ring buffer ordered by sequence number
+from typing import Iterable, List, Optional
+
+from sqlalchemy import update, delete, select
+from sqlalchemy.orm import Session
+
+from app.models import ChatSession, ChatMessage
+from app.tutor_context import estimate_tokens
+
+MAX_MESSAGES_PER_SESSION = 128
+MAX_SESSIONS_PER_USER = 32
+
+
+def allocate_seq(db: Session, session_id: int, count: int = 1) -> Optional[int]:
+    """Reserve `count` sequence numbers for a session and return the last one (None if it was deleted)."""
+    return db.execute(
+        update(ChatSession)
+        .where(ChatSession.id == session_id)
+        .values(last_seq=ChatSession.last_seq + count)
+        .returning(ChatSession.last_seq)
+    ).scalar_one_or_none()
+
+
+def trim_messages(db: Session, session_id: int, last_seq: int, keep: int = MAX_MESSAGES_PER_SESSION):
+    # one indexed range delete on (session_id, seq), however long the session has run
+    db.execute(
+        delete(ChatMessage)
+        .where(ChatMessage.session_id == session_id, ChatMessage.seq <= last_seq - keep)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def append_messages(db: Session, session_id: int, messages: List[ChatMessage]) -> bool:
+    """Number new messages of one session, add them and drop whatever falls off the ring.
+
+    Returns False, adding nothing, when the session no longer exists.
+    """
+    with db.no_autoflush:
+        last_seq = allocate_seq(db, session_id, len(messages))
+        if last_seq is None:
+            return False
+        for offset, message in enumerate(messages):
+            message.session_id = session_id
+            message.seq = last_seq - len(messages) + offset + 1
+            message.token_count = estimate_tokens(message.text)
+        trim_messages(db, session_id, last_seq)
+    db.add_all(messages)
+    return True
+
+
+def sequence_pending_messages(db: Session, rows: Iterable):
+    """Write-behind flush hook: sequence and cap the chat messages queued in a batch."""
+    by_session = {}
+    for row in rows:
+        if isinstance(row, ChatMessage) and row.seq is None:
+            by_session.setdefault(row.session_id, []).append(row)
+    for session_id, messages in by_session.items():
+        if not append_messages(db, session_id, messages):
+            # the student deleted the session while its reply waited in the queue: drop only the reply
+            for message in messages:
+                db.expunge(message)
+
+
+def trim_sessions(db: Session, user_id: int, keep: int = MAX_SESSIONS_PER_USER):
+    """Delete a user's sessions (and their messages) older than the newest `keep`."""
+    watermark = (
+        select(ChatSession.id)
+        .where(ChatSession.user_id == user_id)
+        .order_by(ChatSession.id.desc())
+        .offset(keep - 1)
+        .limit(1)
+        .scalar_subquery()
+    )
+    stale = select(ChatSession.id).where(ChatSession.user_id == user_id, ChatSession.id < watermark)
+    db.execute(delete(ChatMessage).where(ChatMessage.session_id.in_(stale)).execution_options(synchronize_session=False))
+    db.execute(delete(ChatSession).where(ChatSession.user_id == user_id, ChatSession.id < watermark)
+               .execution_options(synchronize_session=False))
@@ -0,0 +1,219 @@
+# CODEX: Content-negotiated response compression (gzip, plus brotli/zstd when installed)
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import (
+    COMPRESSION_MINIMUM_SIZE,
+    COMPRESSION_GZIP_LEVEL,
+    COMPRESSION_BROTLI_QUALITY,
+    COMPRESSION_ZSTD_LEVEL,
+    COMPRESSION_EXCLUDE_PATHS,
+)
+
+try:  # listed in requirements.txt; "br" is simply not offered without it
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+try:  # listed in requirements.txt; "zstd" is simply not offered without it
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+_SKIP_KEY = "app.compression.skip"
+# already-compressed or latency-sensitive payloads are never worth compressing
+_INCOMPRESSIBLE = ("image/", "video/", "audio/", "application/zip", "application/gzip", "text/event-stream")
+
+
+class _Gzip:
+    def __init__(self, level: int):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._obj.compress(data)
+        # sync-flush streamed chunks so each one reaches the client without waiting for more
+        return out + self._obj.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _Brotli:
+    def __init__(self, quality: int):
+        self._obj = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._obj.process(data)
+        return out + (self._obj.finish() if final else self._obj.flush())
+
+
+class _Zstd:
+    def __init__(self, level: int):
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._obj.compress(data)
+        return out + self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH if final else zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+
+def available_encodings() -> List[str]:
+    """Encodings this process can produce, in server preference order."""
+    encodings = []
+    if brotli is not None:
+        encodings.append("br")
+    if zstandard is not None:
+        encodings.append("zstd")
+    encodings.append("gzip")
+    return encodings
+
+
+def negotiate_encoding(accept_encoding: Optional[str], supported: List[str]) -> Optional[str]:
+    """Best supported coding for an Accept-Encoding header: highest q-value, then server preference."""
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    best: Optional[Tuple[float, int, str]] = None
+    for rank, coding in enumerate(supported):
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > 0 and (best is None or (q, -rank) > (best[0], best[1])):
+            best = (q, -rank, coding)
+    return best[2] if best else None
+
+
+def no_compression(request: Request):
+    """Route dependency opting a single endpoint out of response compression."""
+    request.scope[_SKIP_KEY] = True
+
+
+def route_template(scope: Scope) -> str:
+    """The matched route's path template, e.g. "/api/users/{user_id}"; keeps per-route stats bounded.
+
+    Routers included with a prefix match only the rest of the path, so their route's template
+    lacks the prefix: it is taken back from the request path, whose leading segments are literal.
+    """
+    template = getattr(scope.get("route"), "path", None)
+    if template is None:
+        return "<unmatched>"
+    parts = scope["path"].split("/")
+    return "/".join(parts[:len(parts) - template.count("/")]) + template
+
+
+class CompressionStats:
+    def __init__(self):
+        self.routes: Dict[str, dict] = {}
+
+    def record(self, route: str, encoding: Optional[str], bytes_in: int, bytes_out: int):
+        entry = self.routes.setdefault(route, {"responses": 0, "compressed": 0, "bytes_in": 0, "bytes_out": 0,
+                                               "bytes_saved": 0, "encodings": {}})
+        entry["responses"] += 1
+        entry["bytes_in"] += bytes_in
+        entry["bytes_out"] += bytes_out
+        if encoding is not None:
+            entry["compressed"] += 1
+            entry["bytes_saved"] += bytes_in - bytes_out
+            entry["encodings"][encoding] = entry["encodings"].get(encoding, 0) + 1
+
+    def stats(self) -> dict:
+        saved = sum(e["bytes_saved"] for e in self.routes.values())
+        return {"encodings": available_encodings(), "bytes_saved": saved,
+                "routes": {route: dict(entry) for route, entry in self.routes.items()}}
+
+
+compression_stats = CompressionStats()
+
+
+class CompressionMiddleware:
+    """Compresses responses with the best coding the client accepts.
+
+    Single-message bodies are compressed only from minimum_size bytes. Streamed bodies are
+    compressed chunk by chunk with a flush after each, so they keep streaming; event streams,
+    bodies that already carry a Content-Encoding, excluded path prefixes and routes using the
+    no_compression dependency are passed through untouched.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MINIMUM_SIZE,
+                 exclude_paths: Optional[List[str]] = None, stats: CompressionStats = compression_stats):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.exclude_paths = tuple(COMPRESSION_EXCLUDE_PATHS if exclude_paths is None else exclude_paths)
+        self.stats = stats
+
+    def _compressor(self, encoding: str):
+        if encoding == "br":
+            return _Brotli(COMPRESSION_BROTLI_QUALITY)
+        if encoding == "zstd":
+            return _Zstd(COMPRESSION_ZSTD_LEVEL)
+        return _Gzip(COMPRESSION_GZIP_LEVEL)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"].startswith(self.exclude_paths):
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"), available_encodings())
+        start: Optional[Message] = None
+        compressor = None
+        passthrough = False
+        bytes_in = bytes_out = 0
+
+        async def wrapped_send(message: Message):
+            nonlocal start, compressor, passthrough, bytes_in, bytes_out
+            if message["type"] == "http.response.start":
+                start = message
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                passthrough = (encoding is None or scope.get(_SKIP_KEY) or "content-encoding" in headers
+                               or content_type.startswith(_INCOMPRESSIBLE))
+                if passthrough:
+                    await send(message)
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            bytes_in += len(body)
+            if passthrough:
+                bytes_out += len(body)
+                await send(message)
+                if not more_body:
+                    self.stats.record(route_template(scope), None, bytes_in, bytes_out)
+                return
+            if start is not None:
+                # first body message decides: small complete bodies go out as they are
+                if not more_body and len(body) < self.minimum_size:
+                    await send(start)
+                    start = None
+                    passthrough = True
+                    bytes_out += len(body)
+                    await send(message)
+                    self.stats.record(route_template(scope), None, bytes_in, bytes_out)
+                    return
+                compressor = self._compressor(encoding)
+                headers = MutableHeaders(raw=start["headers"])
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                del headers["Content-Length"]
+                data = compressor.compress(body, final=not more_body)
+                if not more_body:
+                    headers["Content-Length"] = str(len(data))
+                await send(start)
+                start = None
+            else:
+                data = compressor.compress(body, final=not more_body)
+            bytes_out += len(data)
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+            if not more_body:
+                self.stats.record(route_template(scope), encoding, bytes_in, bytes_out)
+
+        await self.app(scope, receive, wrapped_send)
@@ -22,3 +22,127 @@ REFRESH_TOKEN_EXPIRE_MINUTES = cfg.get("refresh_token_expires_minutes")
 
 DATABASE_URL = os.getenv("DATABASE_URL", cfg.get("database_url"))
 REDIS_URL = os.getenv("REDIS_URL", cfg.get("redis_url", "redis://localhost:6379/0"))
+
+# CODEX: Named database engine profiles (pool sizing, timeouts, SQL logging)
+DATABASE = cfg.get("database") or {}
+DATABASE_PROFILES = DATABASE.get("profiles") or {}
+DATABASE_PROFILE = os.getenv("DATABASE_PROFILE", DATABASE.get("profile", "prod"))
+
+# CODEX: Shared Ollama connection pool settings
+OLLAMA_POOL = cfg.get("ollama_pool") or {}
+OLLAMA_MAX_CONNECTIONS = OLLAMA_POOL.get("max_connections", 64)
+OLLAMA_MAX_KEEPALIVE_CONNECTIONS = OLLAMA_POOL.get("max_keepalive_connections", 32)
+OLLAMA_KEEPALIVE_EXPIRY = OLLAMA_POOL.get("keepalive_expiry", 30)
+OLLAMA_CONNECT_TIMEOUT = OLLAMA_POOL.get("connect_timeout", 5)
+OLLAMA_READ_TIMEOUT = OLLAMA_POOL.get("read_timeout", 120)
+OLLAMA_POOL_TIMEOUT = OLLAMA_POOL.get("pool_timeout", 10)
+OLLAMA_RETRIES = OLLAMA_POOL.get("retries", 3)
+
+# CODEX: Two-tier AI response cache settings
+AI_CACHE = cfg.get("ai_cache") or {}
+AI_CACHE_BACKEND = os.getenv("AI_CACHE_BACKEND", AI_CACHE.get("backend", "redis"))
+AI_CACHE_TTL = AI_CACHE.get("ttl", 3600)
+AI_CACHE_L1_MAX_ENTRIES = AI_CACHE.get("l1_max_entries", 512)
+AI_CACHE_L1_MAX_BYTES = AI_CACHE.get("l1_max_bytes", 16 * 1024 * 1024)
+AI_CACHE_L1_TTL = AI_CACHE.get("l1_ttl", 300)
+AI_CACHE_COMPRESS_MIN_BYTES = AI_CACHE.get("compress_min_bytes", 1024)
+AI_CACHE_REDIS_TIMEOUT = AI_CACHE.get("redis_timeout", 0.5)
+
+# CODEX: Admission control in front of Ollama (concurrency cap, bounded priority queue)
+OLLAMA_ADMISSION = cfg.get("ollama_admission") or {}
+OLLAMA_MAX_CONCURRENCY = OLLAMA_ADMISSION.get("max_concurrency", 8)
+OLLAMA_MAX_QUEUE = OLLAMA_ADMISSION.get("max_queue", 64)
+OLLAMA_RETRY_AFTER = OLLAMA_ADMISSION.get("retry_after", 5)
+OLLAMA_MAX_WAIT = OLLAMA_ADMISSION.get("max_wait") or {}
+
+# CODEX: Ollama backend pool (falls back to the single ollama_host/ollama_port)
+OLLAMA_BACKENDS = cfg.get("ollama_backends") or [{"host": OLLAMA_HOST, "port": OLLAMA_PORT}]
+OLLAMA_HEALTH = cfg.get("ollama_health") or {}
+OLLAMA_HEALTH_INTERVAL = OLLAMA_HEALTH.get("interval", 15)
+OLLAMA_HEALTH_TIMEOUT = OLLAMA_HEALTH.get("timeout", 2)
+OLLAMA_FAILURE_THRESHOLD = OLLAMA_HEALTH.get("failure_threshold", 3)
+OLLAMA_EJECT_SECONDS = OLLAMA_HEALTH.get("eject_seconds", 30)
+
+# CODEX: Write-behind persistence queue for post-stream inserts
+WRITE_BEHIND = cfg.get("write_behind") or {}
+WRITE_BEHIND_MAX_BATCH = WRITE_BEHIND.get("max_batch", 200)
+WRITE_BEHIND_FLUSH_INTERVAL = WRITE_BEHIND.get("flush_interval", 0.5)
+WRITE_BEHIND_MAX_PENDING = WRITE_BEHIND.get("max_pending", 10000)
+
+# CODEX: Token-budgeted tutor context and rolling session summaries
+TUTOR_CONTEXT = cfg.get("tutor_context") or {}
+TUTOR_CONTEXT_TOKEN_BUDGET = TUTOR_CONTEXT.get("token_budget", 1536)
+TUTOR_CONTEXT_MAX_MESSAGES = TUTOR_CONTEXT.get("max_messages", 32)
+TUTOR_SUMMARY_MAX_TOKENS = TUTOR_CONTEXT.get("summary_max_tokens", 256)
+TUTOR_SUMMARY_PROMPT = TUTOR_CONTEXT.get("summary_prompt", "Summarize this tutoring conversation briefly.")
+
+# CODEX: Model preload and keep-alive warming during school hours
+DEFAULT_TIMEZONE = cfg.get("default_timezone", "UTC")
+OLLAMA_WARMUP = cfg.get("ollama_warmup") or {}
+OLLAMA_WARMUP_MODELS = OLLAMA_WARMUP.get("models") or [OLLAMA_MODEL]
+OLLAMA_KEEP_ALIVE = OLLAMA_WARMUP.get("keep_alive", "30m")
+OLLAMA_WARMUP_INTERVAL = OLLAMA_WARMUP.get("interval", 600)
+OLLAMA_PRELOAD_TIMEOUT = OLLAMA_WARMUP.get("preload_timeout", 120)
+OLLAMA_SCHOOL_HOURS = OLLAMA_WARMUP.get("school_hours") or {}
+
+# CODEX: Framing of AI responses streamed as SSE / NDJSON
+AI_STREAMING = cfg.get("ai_streaming") or {}
+STREAM_COALESCE_MAX_CHARS = AI_STREAMING.get("coalesce_max_chars", 48)
+STREAM_COALESCE_MAX_DELAY = AI_STREAMING.get("coalesce_max_delay", 0.05)
+
+# CODEX: Background batch lesson generation
+LESSON_JOBS = cfg.get("lesson_jobs") or {}
+LESSON_JOB_WORKERS = LESSON_JOBS.get("workers", 4)
+LESSON_JOB_MAX_PROMPTS = LESSON_JOBS.get("max_prompts", 100)
+LESSON_JOB_MAX_ATTEMPTS = LESSON_JOBS.get("max_attempts", 3)
+LESSON_JOB_PROGRESS_INTERVAL = LESSON_JOBS.get("progress_interval", 2)
+
+# CODEX: Classroom material retrieved into tutor prompts (BM25 over lessons and assignments)
+TUTOR_RETRIEVAL = cfg.get("tutor_retrieval") or {}
+RETRIEVAL_TOP_K = TUTOR_RETRIEVAL.get("top_k", 4)
+RETRIEVAL_TOKEN_BUDGET = TUTOR_RETRIEVAL.get("token_budget", 256)
+RETRIEVAL_SNIPPET_MAX_TOKENS = TUTOR_RETRIEVAL.get("snippet_max_tokens", 96)
+RETRIEVAL_REBUILD_SECONDS = TUTOR_RETRIEVAL.get("rebuild_seconds", 300)
+RETRIEVAL_K1 = TUTOR_RETRIEVAL.get("k1", 1.2)
+RETRIEVAL_B = TUTOR_RETRIEVAL.get("b", 0.75)
+
+# CODEX: Negotiated HTTP response compression
+COMPRESSION = cfg.get("compression") or {}
+COMPRESSION_MINIMUM_SIZE = COMPRESSION.get("minimum_size", 1024)
+COMPRESSION_GZIP_LEVEL = COMPRESSION.get("gzip_level", 6)
+COMPRESSION_BROTLI_QUALITY = COMPRESSION.get("brotli_quality", 5)
+COMPRESSION_ZSTD_LEVEL = COMPRESSION.get("zstd_level", 3)
+COMPRESSION_EXCLUDE_PATHS = COMPRESSION.get("exclude_paths") or []
+
+# CODEX: Keyset pagination of list endpoints
+PAGINATION = cfg.get("pagination") or {}
+PAGINATION_DEFAULT_LIMIT = PAGINATION.get("default_limit", 100)
+PAGINATION_MAX_LIMIT = PAGINATION.get("max_limit", 500)
+
+# CODEX: Cached per-student advisor snapshots
+ADVISOR = cfg.get("advisor") or {}
+ADVISOR_LOW_GRADE_THRESHOLD = ADVISOR.get("low_grade_threshold", 70)
+ADVISOR_CACHE_MAX_ENTRIES = ADVISOR.get("cache_max_entries", 10000)
+ADVISOR_CACHE_TTL = ADVISOR.get("cache_ttl", 600)
+
+# CODEX: Per-user classroom membership cache for authorization checks
+AUTHZ = cfg.get("authz") or {}
+AUTHZ_CACHE_TTL = AUTHZ.get("cache_ttl", 60)
+AUTHZ_CACHE_MAX_USERS = AUTHZ.get("cache_max_users", 10000)
+
+# CODEX: Cached principal resolution for authenticated requests
+PRINCIPAL_CACHE = cfg.get("principal_cache") or {}
+PRINCIPAL_CACHE_BACKEND = os.getenv("PRINCIPAL_CACHE_BACKEND", PRINCIPAL_CACHE.get("backend", "memory"))
+PRINCIPAL_CACHE_TTL = PRINCIPAL_CACHE.get("ttl", 60)
+PRINCIPAL_CACHE_MAX_ENTRIES = PRINCIPAL_CACHE.get("max_entries", 10000)
+PRINCIPAL_CACHE_REDIS_TIMEOUT = PRINCIPAL_CACHE.get("redis_timeout", 0.5)
+PRINCIPAL_TOKEN_CLAIMS = PRINCIPAL_CACHE.get("token_claims", False)
+
+# CODEX: bcrypt hashing on a dedicated process pool
+PASSWORD_HASHING = cfg.get("password_hashing") or {}
+PASSWORD_HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", PASSWORD_HASHING.get("rounds", 12)))
+PASSWORD_HASH_WORKERS = PASSWORD_HASHING.get("workers", 2)
+PASSWORD_HASH_MAX_QUEUE = PASSWORD_HASHING.get("max_queue", 64)
+PASSWORD_HASH_RETRY_AFTER = PASSWORD_HASHING.get("retry_after", 2)
+# "process" (spawned workers) or "thread", which avoids process start-up where that dominates, e.g. in tests
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", PASSWORD_HASHING.get("executor", "process"))
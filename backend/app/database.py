@@ -1,11 +1,18 @@
 # CODEX: Database configuration and session management
 import os
 import sys
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool
 import yaml
 from dotenv import load_dotenv
 
+from app.config import DATABASE_PROFILE, DATABASE_PROFILES
+
 # load config.yaml from project root
 config_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'config.yaml'))
 with open(config_path) as f:
@@ -16,8 +23,141 @@ load_dotenv()
 
 DATABASE_URL = os.getenv('DATABASE_URL', cfg['database_url'])
 
+
+class PoolStats:
+    """Checkout wait times, overflow connections and timeouts of the engine's connection pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.engine = None
+        self.checkouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.connections_opened = 0
+        self.overflow_events = 0
+        self.timeouts = 0
+        self.invalidated = 0
+
+    def record_checkout(self, waited: float):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def stats(self) -> dict:
+        pool = self.engine.pool if self.engine is not None else None  # dispose() swaps the pool
+        current = {}
+        if isinstance(pool, QueuePool):
+            current = {"size": pool.size(), "checked_in": pool.checkedin(), "checked_out": pool.checkedout(),
+                       "overflow": max(pool.overflow(), 0)}
+        with self._lock:
+            return {
+                "pool": type(pool).__name__ if pool is not None else None,
+                **current,
+                "checkouts": self.checkouts,
+                "avg_wait_ms": round(self.wait_seconds / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait_seconds * 1000, 3),
+                "connections_opened": self.connections_opened,
+                "overflow_events": self.overflow_events,
+                "timeouts": self.timeouts,
+                "invalidated": self.invalidated,
+            }
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that times every checkout, including waiting for a free slot and opening a connection."""
+
+    stats = pool_stats
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            with self.stats._lock:
+                self.stats.timeouts += 1
+            raise
+        finally:
+            self.stats.record_checkout(time.perf_counter() - started)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+def engine_options(url: str, profile: dict) -> dict:
+    """create_engine() keyword arguments for a profile, adapted to the database behind url."""
+    url = make_url(url)
+    options = {"echo": bool(profile.get("echo", False)), "connect_args": {}}
+    statement_timeout = profile.get("statement_timeout") or 0
+    if url.get_backend_name() == "sqlite":
+        # sessions are handed across FastAPI's threadpool, so the same-thread check has to go
+        options["connect_args"]["check_same_thread"] = False
+        if url.database in (None, "", ":memory:"):
+            # an in-memory database lives and dies with its single connection: no pool to tune
+            return options
+    elif statement_timeout:
+        options["connect_args"]["options"] = f"-c statement_timeout={int(statement_timeout)}"
+    options.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=profile.get("pool_size", 5),
+        max_overflow=profile.get("max_overflow", 10),
+        pool_timeout=profile.get("pool_timeout", 30),
+        pool_recycle=profile.get("pool_recycle", -1),
+        pool_pre_ping=bool(profile.get("pool_pre_ping", False)),
+    )
+    return options
+
+
+def instrument_engine(engine, profile: dict, stats: PoolStats = pool_stats):
+    """Hook pool events into stats and, on SQLite, enforce statement_timeout with a progress handler."""
+    stats.engine = engine
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        engine.pool.stats = stats
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        with stats._lock:
+            stats.connections_opened += 1
+            if isinstance(engine.pool, QueuePool) and engine.pool.overflow() > 0:
+                stats.overflow_events += 1
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        with stats._lock:
+            stats.invalidated += 1
+
+    timeout = (profile.get("statement_timeout") or 0) / 1000
+    if engine.dialect.name != "sqlite" or not timeout:
+        return
+    # CODEX: SQLite has no server-side statement_timeout; abort long statements from the VM progress hook
+
+    @event.listens_for(engine, "connect")
+    def install_progress_handler(dbapi_connection, connection_record):
+        info = connection_record.info
+        dbapi_connection.set_progress_handler(
+            lambda: int(time.monotonic() > info.get("statement_deadline", float("inf"))), 10000)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_deadline(conn, cursor, statement, parameters, context, executemany):
+        conn.info["statement_deadline"] = time.monotonic() + timeout
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def clear_deadline(conn, cursor, statement, parameters, context, executemany):
+        conn.info.pop("statement_deadline", None)
+
+
+if DATABASE_PROFILE not in DATABASE_PROFILES:
+    raise RuntimeError(f"Unknown database profile {DATABASE_PROFILE!r}; expected one of {sorted(DATABASE_PROFILES)}")
+DATABASE_ENGINE_PROFILE = DATABASE_PROFILES[DATABASE_PROFILE]
+
 # SQLAlchemy engine and session
-engine = create_engine(DATABASE_URL, echo=True)
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL, DATABASE_ENGINE_PROFILE))
+instrument_engine(engine, DATABASE_ENGINE_PROFILE)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
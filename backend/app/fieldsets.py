@@ -0,0 +1,147 @@
+# CODEX: Sparse fieldsets (?fields= / ?include=) pushed down into the SQL SELECT
+from copy import deepcopy
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Union, get_args, get_origin
+
+from fastapi import HTTPException, Query, Response, status
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ConfigDict, create_model
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only, selectinload
+
+# {"id": {}, "students": {"id": {}, "email": {}}}: requested fields, nested for relationships
+Tree = Dict[str, dict]
+
+
+def _nested_schema(annotation) -> Tuple[Optional[type], Any]:
+    """(schema, rebuild) for Model, List[Model] or Optional[list[Model]] annotations; (None, None) otherwise."""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, lambda model: model
+    origin, args = get_origin(annotation), get_args(annotation)
+    if origin in (list, List) and args:
+        schema, rebuild = _nested_schema(args[0])
+        return schema, schema and (lambda model: List[rebuild(model)])
+    if origin is Union:
+        present = [a for a in args if a is not type(None)]
+        if len(present) == 1:
+            schema, rebuild = _nested_schema(present[0])
+            return schema, schema and (lambda model: Optional[rebuild(model)])
+    return None, None
+
+
+def _full_tree(schema: type) -> Tree:
+    tree = {}
+    for name, field in schema.model_fields.items():
+        nested, _ = _nested_schema(field.annotation)
+        tree[name] = _full_tree(nested) if nested else {}
+    return tree
+
+
+def _freeze(tree: Tree) -> tuple:
+    return tuple(sorted((name, _freeze(sub)) for name, sub in tree.items()))
+
+
+@lru_cache(maxsize=256)
+def _partial_schema(schema: type, frozen: tuple) -> type:
+    definitions = {}
+    for name, sub in frozen:
+        field = schema.model_fields[name]
+        nested, rebuild = _nested_schema(field.annotation)
+        annotation = rebuild(_partial_schema(nested, sub)) if nested else field.annotation
+        definitions[name] = (annotation, field)
+    return create_model(f"{schema.__name__}Fields", __config__=ConfigDict(from_attributes=True), **definitions)
+
+
+def _loader_options(model: type, tree: Tree, relationship=None) -> list:
+    """load_only() for the requested columns and selectinload() for the requested relationships."""
+    mapper = inspect(model)
+    columns = [getattr(model, name) for name in tree if name in mapper.column_attrs]
+    columns += [getattr(model, c.key) for c in mapper.primary_key if c.key not in tree]
+    nested = [_loader_options(mapper.relationships[name].mapper.class_, sub, getattr(model, name))
+              for name, sub in tree.items() if name in mapper.relationships]
+    if relationship is None:
+        return [load_only(*columns), *nested]
+    return selectinload(relationship).options(load_only(*columns), *nested)
+
+
+class Projection:
+    """The fieldset of one request: loader options for the query, and a renderer for its result."""
+
+    def __init__(self, schema: type, tree: Optional[Tree], options):
+        self.schema = schema
+        self.tree = tree
+        self.options = tuple(options)
+
+    @property
+    def partial(self) -> bool:
+        return self.tree is not None
+
+    def render(self, data: Any, response: Optional[Response] = None) -> Any:
+        """data unchanged for full responses; otherwise only the requested fields, as JSON."""
+        if not self.partial:
+            return data
+        partial = _partial_schema(self.schema, _freeze(self.tree))
+        dump = lambda obj: partial.model_validate(obj).model_dump(mode="json")
+        content = [dump(obj) for obj in data] if isinstance(data, list) else dump(data)
+        # a returned Response skips response_model, so headers such as X-Next-Cursor are carried over
+        headers = dict(response.headers) if response is not None else None
+        return JSONResponse(content=content, headers=headers)
+
+
+class Fieldset:
+    """Dependency parsing ?fields=id,name,students.email and ?include=students for one response schema.
+
+    Without either parameter the endpoint behaves as before (default_options, full schema).
+    fields limits the response to the listed fields, dotted names select inside a relationship;
+    include lists the relationships to embed, so ?include= alone keeps every column and no
+    relationship. Unrequested columns are deferred with load_only() and unrequested
+    relationships are never loaded, so neither is read from the database nor serialized.
+    """
+
+    def __init__(self, model: type, schema: type, default_options=()):
+        self.model = model
+        self.schema = schema
+        self.default_options = tuple(default_options)
+        self.full_tree = _full_tree(schema)
+        self.relationships = set(inspect(model).relationships.keys()) & set(self.full_tree)
+
+    def parse(self, fields: Optional[str], include: Optional[str]) -> Optional[Tree]:
+        if fields is None and include is None:
+            return None
+        tree: Tree = {}
+        if fields is None:
+            tree = {name: {} for name in self.full_tree if name not in self.relationships}
+        else:
+            for path in filter(None, (p.strip() for p in fields.split(","))):
+                self._add(tree, path.split("."), path)
+        for name in filter(None, (p.strip() for p in (include or "").split(","))):
+            if name not in self.relationships:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                    detail=f"Unknown include '{name}'; expected one of {sorted(self.relationships)}")
+            tree[name] = deepcopy(self.full_tree[name])
+        if not tree:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty fieldset")
+        return tree
+
+    def _add(self, tree: Tree, parts: List[str], path: str):
+        level, full = tree, self.full_tree
+        for depth, part in enumerate(parts):
+            if part not in full:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                    detail=f"Unknown field '{path}'; expected one of {sorted(full)}")
+            if depth == len(parts) - 1:
+                # a bare relationship name means the whole nested record
+                level[part] = deepcopy(full[part])
+            else:
+                level = level.setdefault(part, {})
+                full = full[part]
+                if not full:
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                        detail=f"Field '{part}' has no subfields")
+
+    def __call__(self, fields: Optional[str] = Query(None, description="Comma-separated fields to return; dotted names select inside a relationship"),
+                 include: Optional[str] = Query(None, description="Comma-separated relationships to embed")) -> Projection:
+        tree = self.parse(fields, include)
+        if tree is None:
+            return Projection(self.schema, None, self.default_options)
+        return Projection(self.schema, tree, _loader_options(self.model, tree))
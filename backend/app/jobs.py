@@ -0,0 +1,215 @@
+# CODEX: Background worker pool for batch lesson-generation jobs
+import asyncio
+import logging
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import case, literal, update
+
+from app.admission import AdmissionRejected
+from app.cache import ai_cache
+from app.config import LESSON_JOB_WORKERS, LESSON_JOB_MAX_ATTEMPTS
+from app.database import SessionLocal
+from app.models import JobStatus, LessonJob, LessonJobItem
+from app.ollama_pool import NoBackendAvailable
+
+logger = logging.getLogger(__name__)
+
+# generate(prompt, model, style, pre_prompt) -> stream of text chunks
+Generator = Callable[[str, str, Optional[str], Optional[str]], AsyncIterator[str]]
+
+
+class LessonJobRunner:
+    """Runs queued lesson-job items on a fixed number of workers.
+
+    Items are durable rows: the in-memory queue only holds their ids, and items that were
+    queued or running when the process stopped are queued again on start. Results are
+    shared with /ai/lesson through the AI response cache. Workers ask for admission at the
+    lowest priority, so interactive requests always go first; when admission or the backend
+    pool turns a worker away it waits and retries without using up an attempt.
+    """
+
+    def __init__(self, session_factory: Callable = SessionLocal, workers: int = LESSON_JOB_WORKERS,
+                 max_attempts: int = LESSON_JOB_MAX_ATTEMPTS, generate: Optional[Generator] = None):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.generate = generate
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._waiters: Dict[int, Set[asyncio.Event]] = {}  # job id -> one event per waiting client
+        self.busy = 0
+        self.generated = 0
+        self.cache_hits = 0
+        self.failures = 0
+        self.retries = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self, generate: Optional[Generator] = None):
+        if self.running:
+            return
+        if generate is not None:
+            self.generate = generate
+        if self.generate is None:
+            raise RuntimeError("LessonJobRunner needs a generator to run jobs")
+        self._queue = asyncio.Queue()
+        for item_id in await asyncio.to_thread(self._requeue):
+            self._queue.put_nowait(item_id)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def close(self):
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        # interrupted items stay 'running' in the DB and are picked up again on the next start
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def enqueue(self, item_ids: Iterable[int]):
+        """Queue items for the workers; call from the event loop, asyncio.Queue is not thread-safe."""
+        if not self.running:
+            return  # picked up from the DB by the next start()
+        for item_id in item_ids:
+            self._queue.put_nowait(item_id)
+
+    async def wait(self, job_id: int, timeout: float) -> bool:
+        """Wait up to timeout seconds for progress on a job; True if something changed."""
+        event = asyncio.Event()
+        self._waiters.setdefault(job_id, set()).add(event)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            # a client that timed out or went away must not leave its job behind
+            waiters = self._waiters.get(job_id)
+            if waiters is not None:
+                waiters.discard(event)
+                if not waiters:
+                    del self._waiters[job_id]
+
+    def _notify(self, job_id: int):
+        for event in self._waiters.pop(job_id, ()):
+            event.set()
+
+    def _requeue(self) -> List[int]:
+        db = self.session_factory()
+        try:
+            db.execute(update(LessonJobItem).where(LessonJobItem.status == JobStatus.running)
+                       .values(status=JobStatus.queued))
+            db.commit()
+            rows = db.query(LessonJobItem.id).filter(LessonJobItem.status == JobStatus.queued)\
+                .order_by(LessonJobItem.job_id, LessonJobItem.position).all()
+            return [row.id for row in rows]
+        finally:
+            db.close()
+
+    def _claim(self, item_id: int) -> Optional[dict]:
+        db = self.session_factory()
+        try:
+            claimed = db.execute(update(LessonJobItem)
+                                 .where(LessonJobItem.id == item_id, LessonJobItem.status == JobStatus.queued)
+                                 .values(status=JobStatus.running, started_at=datetime.utcnow())).rowcount
+            if not claimed:
+                return None
+            item = db.get(LessonJobItem, item_id)
+            job = item.job
+            if job.status == JobStatus.queued:
+                job.status = JobStatus.running
+            db.commit()
+            return {"job_id": job.id, "teacher_id": job.teacher_id, "model": job.model, "style": job.style,
+                    "pre_prompt": job.pre_prompt, "prompt": item.prompt}
+        finally:
+            db.close()
+
+    def _finish(self, item_id: int, job_id: int, result: Optional[str], error: Optional[str], cached: bool,
+                attempts: int):
+        db = self.session_factory()
+        try:
+            ok = error is None
+            db.execute(update(LessonJobItem).where(LessonJobItem.id == item_id).values(
+                status=JobStatus.completed if ok else JobStatus.failed, result=result, error=error,
+                cached=cached, attempts=attempts, finished_at=datetime.utcnow()))
+            # CODEX: counters move in SQL so concurrent workers never lose an increment
+            counter = LessonJob.completed if ok else LessonJob.failed
+            db.execute(update(LessonJob).where(LessonJob.id == job_id).values({counter: counter + 1}))
+            status_type = LessonJob.__table__.c.status.type
+            final_status = case((LessonJob.completed == 0, literal(JobStatus.failed, status_type)),
+                                else_=literal(JobStatus.completed, status_type))
+            db.execute(update(LessonJob)
+                       .where(LessonJob.id == job_id, LessonJob.finished_at.is_(None),
+                              LessonJob.completed + LessonJob.failed >= LessonJob.total)
+                       .values(status=final_status, finished_at=datetime.utcnow()))
+            db.commit()
+        finally:
+            db.close()
+
+    async def _generate(self, job: dict) -> Tuple[str, int]:
+        attempts = 0
+        while True:
+            try:
+                attempts += 1
+                text = "".join([chunk async for chunk in
+                                self.generate(job["prompt"], job["model"], job["style"], job["pre_prompt"])])
+                return text, attempts
+            except (AdmissionRejected, NoBackendAvailable) as exc:
+                # capacity, not the prompt, is the problem: back off without spending an attempt
+                attempts -= 1
+                self.retries += 1
+                await asyncio.sleep(exc.retry_after)
+            except Exception:
+                if attempts >= self.max_attempts:
+                    raise
+                self.retries += 1
+                await asyncio.sleep(min(30, 2 ** attempts))
+
+    async def _process(self, item_id: int):
+        job = await asyncio.to_thread(self._claim, item_id)
+        if job is None:
+            return
+        cache_key = ai_cache.make_key("ai_lesson", job["teacher_id"], job["model"], job["prompt"])
+        result, error, cached, attempts = await ai_cache.get(cache_key), None, False, 0
+        if result:
+            cached = True
+            self.cache_hits += 1
+        else:
+            try:
+                result, attempts = await self._generate(job)
+                self.generated += 1
+                await ai_cache.set(cache_key, result)
+            except Exception as exc:
+                self.failures += 1
+                logger.warning("Lesson job %s item %s failed: %s", job["job_id"], item_id, exc)
+                result, error, attempts = None, str(exc) or type(exc).__name__, self.max_attempts
+        await asyncio.to_thread(self._finish, item_id, job["job_id"], result, error, cached, attempts)
+        self._notify(job["job_id"])
+
+    async def _worker(self):
+        while True:
+            item_id = await self._queue.get()
+            self.busy += 1
+            try:
+                await self._process(item_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Lesson job item %s could not be processed", item_id)
+            finally:
+                self.busy -= 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._tasks),
+            "busy": self.busy,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "generated": self.generated,
+            "cache_hits": self.cache_hits,
+            "failures": self.failures,
+            "retries": self.retries,
+        }
+
+
+lesson_jobs = LessonJobRunner()
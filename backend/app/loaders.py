@@ -0,0 +1,25 @@
+# CODEX: Eager-loading strategies matched to the response schemas that serialize the rows
+from sqlalchemy.orm import selectinload
+
+from app.fieldsets import Fieldset
+from app.models import Analytics, Classroom, User
+from app.schemas import AnalyticsRead, ClassroomRead, UserRead
+
+# selectin rather than joined loading: one "WHERE id IN (...)" query per relationship keeps
+# LIMIT/keyset pagination on the parent rows correct and never multiplies result rows.
+
+# UserRead: the user plus ClassroomBrief lists of taught and enrolled classrooms
+USER_READ = (
+    selectinload(User.taught_classrooms),
+    selectinload(User.classrooms),
+)
+
+# ClassroomRead: the classroom plus a full UserRead for every student
+CLASSROOM_READ = (
+    selectinload(Classroom.students).options(*USER_READ),
+)
+
+# ?fields= / ?include= projections of the same schemas; the defaults above apply without them
+USER_FIELDS = Fieldset(User, UserRead, USER_READ)
+CLASSROOM_FIELDS = Fieldset(Classroom, ClassroomRead, CLASSROOM_READ)
+ANALYTICS_FIELDS = Fieldset(Analytics, AnalyticsRead)
@@ -1,11 +1,19 @@
 # CODEX: Main FastAPI application for FeverDucation
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from app.compression import CompressionMiddleware
 
 from app.database import Base, engine, SessionLocal
 import os
+from app.ollama_pool import ollama_pool, ollama_backends
+from app.cache import ai_cache
+from app.write_behind import write_behind
+from app.tutor_context import session_summarizer
+from app.warmup import model_warmer
+from app.jobs import lesson_jobs
 from app.models import User, UserRole
-from app.security import get_password_hash
+from app.passwords import password_hasher
 from app.routers.auth import router as auth_router
 from app.routers.users import router as users_router
 from app.routers.classrooms import router as classrooms_router
@@ -13,17 +21,47 @@ from app.routers.assignments import router as assignments_router
 from app.routers.grades import router as grades_router
 from app.routers.analytics import router as analytics_router
 from app.routers.audit_logs import router as audit_logs_router
-from app.routers.ai import router as ai_router
+from app.routers.ai import router as ai_router, generate_batch_lesson
 from app.routers.lessons import router as lessons_router
 from app.routers.advisor import router as advisor_router
 from app.routers.preferences import router as preferences_router
 from app.routers.chat import router as chat_router
+from app.routers.metrics import router as metrics_router
+from app.routers.lesson_jobs import router as lesson_jobs_router
+from app.routers.students import router as students_router
+from app.routers.subjects import router as subjects_router
+from app.pagination import NEXT_CURSOR_HEADER
+
+# CODEX: open shared Ollama connections and health probes on startup, close them on shutdown
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await ollama_pool.start([(b.host, b.port) for b in ollama_backends.backends])
+    await ollama_backends.start()
+    await write_behind.start()
+    # CODEX: load configured models before serving so the first tutor request does not pay for it
+    await model_warmer.start()
+    # CODEX: resume batch lesson jobs interrupted by the last shutdown
+    await lesson_jobs.start(generate=generate_batch_lesson)
+    await create_default_admin()
+    try:
+        yield
+    finally:
+        # CODEX: drain queued writes before the DB and HTTP pools go away
+        await lesson_jobs.close()
+        await model_warmer.close()
+        await session_summarizer.close()
+        await write_behind.close()
+        await ollama_backends.close()
+        await ollama_pool.close()
+        await ai_cache.close()
+        password_hasher.close()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="FeverDucation API",
     description="AI-powered educational platform backend",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # CORS configuration
@@ -33,41 +71,55 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
+# CODEX: gzip/brotli/zstd by Accept-Encoding for large JSON; AI token streams opt out per route
+app.add_middleware(CompressionMiddleware)
 # CODEX: Create DB tables on startup (development only)
 Base.metadata.create_all(bind=engine)
 
-# CODEX: Auto-create default admin user on startup
-def create_default_admin():
+# CODEX: Auto-create default admin user on startup (hashed on the password pool)
+async def create_default_admin():
     admin_email = os.getenv("ADMIN_EMAIL")
     admin_password = os.getenv("ADMIN_PASSWORD")
     if admin_email and admin_password:
         db = SessionLocal()
         try:
             if not db.query(User).filter(User.email == admin_email).first():
-                hashed = get_password_hash(admin_password)
+                hashed = await password_hasher.hash(admin_password)
                 admin = User(email=admin_email, password_hash=hashed, role=UserRole.admin)
                 db.add(admin)
                 db.commit()
         finally:
             db.close()
-create_default_admin()
 
 # Include routers
 app.include_router(auth_router, prefix="/api")
 app.include_router(users_router, prefix="/api")
+app.include_router(students_router, prefix="/api")
 app.include_router(classrooms_router, prefix="/api")
 app.include_router(assignments_router, prefix="/api")
+app.include_router(subjects_router, prefix="/api")
 app.include_router(grades_router, prefix="/api")
 app.include_router(analytics_router, prefix="/api")
 app.include_router(audit_logs_router, prefix="/api")
 app.include_router(ai_router, prefix="/api")
+app.include_router(lesson_jobs_router, prefix="/api")
 app.include_router(lessons_router, prefix="/api")
 app.include_router(advisor_router, prefix="/api")
 app.include_router(chat_router, prefix="/api")
+app.include_router(metrics_router, prefix="/api")
 app.include_router(preferences_router, prefix="/api/user")
 
 # Root endpoint
 @app.get("/")
 def read_root():
     return {"message": "Welcome to FeverDucation API"}
+
+# CODEX: Readiness probe reporting Ollama backend health and which models are warm
+@app.get("/health/ready")
+def readiness():
+    warm_models = model_warmer.status()
+    backends = {name: stats["healthy"] for name, stats in ollama_backends.stats().items()}
+    ready = any(backends.values()) and all(warm_models.values())
+    return {"status": "ready" if ready else "degraded", "warm_models": warm_models, "backends": backends}
@@ -1,7 +1,7 @@
 # CODEX: SQLAlchemy models defining the database schema for FeverDucation
 import enum
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Enum, ForeignKey, DateTime, Table, JSON, Date
+from sqlalchemy import Column, Integer, String, Boolean, Enum, ForeignKey, DateTime, Table, JSON, Date, Index, false as sa_false
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -11,11 +11,20 @@ class UserRole(enum.Enum):
     teacher = "teacher"
     admin = "admin"
 
+# CODEX: Lifecycle of background AI jobs and their items
+class JobStatus(enum.Enum):
+    queued = "queued"
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
 # CODEX: Association table for many-to-many relation between classrooms and students
 classroom_students = Table(
     'classroom_students', Base.metadata,
     Column('classroom_id', Integer, ForeignKey('classrooms.id'), primary_key=True),
-    Column('student_id', Integer, ForeignKey('users.id'), primary_key=True)
+    Column('student_id', Integer, ForeignKey('users.id'), primary_key=True),
+    # CODEX: the primary key serves roster lookups; this serves "classrooms of a student"
+    Index('ix_classroom_students_student_id', 'student_id', 'classroom_id'),
 )
 
 # CODEX: User model storing credentials and role information
@@ -44,6 +53,7 @@ class User(Base):
 # CODEX: Classroom model with a teacher and student roster
 class Classroom(Base):
     __tablename__ = "classrooms"
+    __table_args__ = (Index("ix_classrooms_teacher_id", "teacher_id"),)
     id = Column(Integer, primary_key=True, index=True)
     # CODEX: Unique join code for classroom enrollment
     join_code = Column(String, unique=True, index=True, nullable=False)
@@ -63,6 +73,7 @@ class Classroom(Base):
 # CODEX: Assignment model for classroom tasks
 class Assignment(Base):
     __tablename__ = "assignments"
+    __table_args__ = (Index("ix_assignments_classroom_id", "classroom_id"),)
     id = Column(Integer, primary_key=True, index=True)
     classroom_id = Column(Integer, ForeignKey("classrooms.id"), nullable=False)
     subject_id = Column(Integer, ForeignKey("subjects.id"), nullable=True)
@@ -78,6 +89,11 @@ class Assignment(Base):
 # CODEX: Grade model linking students to assignment results
 class Grade(Base):
     __tablename__ = "grades"
+    __table_args__ = (
+        # CODEX: a student's grades, and the advisor's "graded yet?" anti-join on (student, assignment)
+        Index("ix_grades_student_id_assignment_id", "student_id", "assignment_id"),
+        Index("ix_grades_assignment_id", "assignment_id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     assignment_id = Column(Integer, ForeignKey("assignments.id"), nullable=False)
@@ -90,6 +106,10 @@ class Grade(Base):
 # CODEX: Analytics model for storing precomputed insights
 class Analytics(Base):
     __tablename__ = "analytics"
+    __table_args__ = (
+        Index("ix_analytics_teacher_id", "teacher_id"),
+        Index("ix_analytics_student_id", "student_id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     teacher_id = Column(Integer, ForeignKey("users.id"), nullable=True)
@@ -99,6 +119,11 @@ class Analytics(Base):
 # CODEX: Audit log model for tracking admin actions
 class AuditLog(Base):
     __tablename__ = "audit_logs"
+    __table_args__ = (
+        # CODEX: since/until filters on the log time
+        Index("ix_audit_logs_timestamp_id", "timestamp", "id"),
+        Index("ix_audit_logs_user_id", "user_id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     action = Column(String, nullable=False)
@@ -109,23 +134,38 @@ class AuditLog(Base):
 # CODEX: Chat sessions and messages for AI chat history
 class ChatSession(Base):
     __tablename__ = "chat_sessions"
+    # CODEX: ids grow monotonically, so (user_id, id) doubles as the per-user session sequence
+    __table_args__ = (Index("ix_chat_sessions_user_id_id", "user_id", "id"),)
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
-    messages = relationship("ChatMessage", back_populates="session", cascade="all, delete-orphan")
+    # CODEX: last sequence number handed out to a message of this session
+    last_seq = Column(Integer, default=0, server_default="0", nullable=False)
+    # CODEX: rolling summary of every message with seq <= summary_seq
+    summary = Column(String, nullable=True)
+    summary_seq = Column(Integer, default=0, server_default="0", nullable=False)
+    messages = relationship("ChatMessage", back_populates="session", cascade="all, delete-orphan", order_by="ChatMessage.seq")
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (Index("ix_chat_messages_session_id_seq", "session_id", "seq"),)
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(Integer, ForeignKey("chat_sessions.id"), nullable=False)
+    # CODEX: per-session monotonically increasing position, used for ordering and capping
+    seq = Column(Integer, nullable=False)
     sender = Column(String, nullable=False)
     text = Column(String, nullable=False)
+    # CODEX: estimated prompt tokens, so context building never has to measure text
+    token_count = Column(Integer, default=0, server_default="0", nullable=False)
+    # CODEX: set when the client disconnected before the assistant reply finished streaming
+    truncated = Column(Boolean, default=False, server_default=sa_false(), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     session = relationship("ChatSession", back_populates="messages")
 
 # CODEX: Lesson model for scheduled classroom content
 class Lesson(Base):
     __tablename__ = "lessons"
+    __table_args__ = (Index("ix_lessons_classroom_id_scheduled_date", "classroom_id", "scheduled_date"),)
     id = Column(Integer, primary_key=True, index=True)
     classroom_id = Column(Integer, ForeignKey("classrooms.id"), nullable=False)
     title = Column(String, nullable=False)
@@ -138,6 +178,7 @@ class Lesson(Base):
 # CODEX: Subject model for course modules
 class Subject(Base):
     __tablename__ = "subjects"
+    __table_args__ = (Index("ix_subjects_classroom_id", "classroom_id"),)
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
     classroom_id = Column(Integer, ForeignKey("classrooms.id"), nullable=False)
@@ -145,3 +186,39 @@ class Subject(Base):
 
     classroom = relationship("Classroom", back_populates="subjects")
     assignments = relationship("Assignment", back_populates="subject")
+
+# CODEX: Batch lesson-generation jobs; every prompt is an item whose result is stored durably
+class LessonJob(Base):
+    __tablename__ = "lesson_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    teacher_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    status = Column(Enum(JobStatus), default=JobStatus.queued, nullable=False)
+    model = Column(String, nullable=False)
+    style = Column(String, nullable=True)
+    pre_prompt = Column(String, nullable=True)
+    total = Column(Integer, nullable=False)
+    completed = Column(Integer, default=0, server_default="0", nullable=False)
+    failed = Column(Integer, default=0, server_default="0", nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+    items = relationship("LessonJobItem", back_populates="job", cascade="all, delete-orphan", order_by="LessonJobItem.position")
+
+class LessonJobItem(Base):
+    __tablename__ = "lesson_job_items"
+    __table_args__ = (
+        Index("ix_lesson_job_items_job_id_position", "job_id", "position"),
+        # CODEX: startup requeue looks items up by status
+        Index("ix_lesson_job_items_status", "status"),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("lesson_jobs.id"), nullable=False)
+    position = Column(Integer, nullable=False)
+    prompt = Column(String, nullable=False)
+    status = Column(Enum(JobStatus), default=JobStatus.queued, nullable=False)
+    result = Column(String, nullable=True)
+    error = Column(String, nullable=True)
+    cached = Column(Boolean, default=False, server_default=sa_false(), nullable=False)
+    attempts = Column(Integer, default=0, server_default="0", nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    job = relationship("LessonJob", back_populates="items")
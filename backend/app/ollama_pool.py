@@ -0,0 +1,313 @@
+# CODEX: App-wide httpx connection pools and backend routing for Ollama endpoints
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import httpx
+
+from app.config import (
+    OLLAMA_BACKENDS,
+    OLLAMA_HEALTH_INTERVAL,
+    OLLAMA_HEALTH_TIMEOUT,
+    OLLAMA_FAILURE_THRESHOLD,
+    OLLAMA_EJECT_SECONDS,
+    OLLAMA_MAX_CONNECTIONS,
+    OLLAMA_MAX_KEEPALIVE_CONNECTIONS,
+    OLLAMA_KEEPALIVE_EXPIRY,
+    OLLAMA_CONNECT_TIMEOUT,
+    OLLAMA_READ_TIMEOUT,
+    OLLAMA_POOL_TIMEOUT,
+    OLLAMA_RETRIES,
+)
+
+logger = logging.getLogger(__name__)
+
+Endpoint = Tuple[str, int]
+
+
+class OllamaClientPool:
+    """One keep-alive httpx.AsyncClient per Ollama endpoint, shared by all requests."""
+
+    def __init__(
+        self,
+        max_connections: int = OLLAMA_MAX_CONNECTIONS,
+        max_keepalive_connections: int = OLLAMA_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = OLLAMA_KEEPALIVE_EXPIRY,
+        connect_timeout: float = OLLAMA_CONNECT_TIMEOUT,
+        read_timeout: float = OLLAMA_READ_TIMEOUT,
+        pool_timeout: float = OLLAMA_POOL_TIMEOUT,
+        retries: int = OLLAMA_RETRIES,
+    ):
+        self.max_connections = max_connections
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(
+            connect=connect_timeout,
+            read=read_timeout,
+            write=connect_timeout,
+            pool=pool_timeout,
+        )
+        self.retries = retries
+        # CODEX: tests and the fake server swap this to route requests in-process
+        self.transport_factory: Optional[Callable[[str, int], httpx.AsyncBaseTransport]] = None
+        self._clients: Dict[Endpoint, httpx.AsyncClient] = {}
+        self._transports: Dict[Endpoint, httpx.AsyncBaseTransport] = {}
+        self._stats: Dict[Endpoint, dict] = {}
+
+    def _build_client(self, host: str, port: int) -> httpx.AsyncClient:
+        if self.transport_factory is not None:
+            transport = self.transport_factory(host, port)
+        else:
+            # retries only cover connection failures; HTTP errors are surfaced to the caller
+            transport = httpx.AsyncHTTPTransport(retries=self.retries, limits=self.limits)
+        self._transports[(host, port)] = transport
+        return httpx.AsyncClient(base_url=f"http://{host}:{port}", timeout=self.timeout, transport=transport)
+
+    def connections(self, host: str, port: int) -> Optional[Tuple[int, int]]:
+        """(open, busy) connections of an endpoint's httpx pool; None for transports without one."""
+        pool = getattr(self._transports.get((host, int(port))), "_pool", None)
+        if pool is None:
+            return None
+        open_connections = [c for c in pool.connections if not c.is_closed()]
+        return len(open_connections), sum(1 for c in open_connections if not c.is_idle())
+
+    def client(self, host: str, port: int) -> httpx.AsyncClient:
+        key = (host, int(port))
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            client = self._build_client(host, int(port))
+            self._clients[key] = client
+            self._stats.setdefault(key, {
+                "requests": 0,
+                "in_flight": 0,
+                "peak_in_flight": 0,
+                "saturated": 0,
+                "pool_timeouts": 0,
+                "errors": 0,
+            })
+        return client
+
+    @asynccontextmanager
+    async def stream(self, method: str, host: str, port: int, path: str, **kwargs):
+        client = self.client(host, port)
+        stats = self._stats[(host, int(port))]
+        stats["requests"] += 1
+        usage = self.connections(host, port)
+        if usage is not None and usage[1] >= self.max_connections:
+            # every pooled connection is busy: this request queues inside httpx until one frees up
+            stats["saturated"] += 1
+        stats["in_flight"] += 1
+        stats["peak_in_flight"] = max(stats["peak_in_flight"], stats["in_flight"])
+        try:
+            async with client.stream(method, path, **kwargs) as resp:
+                yield resp
+        except httpx.PoolTimeout:
+            stats["pool_timeouts"] += 1
+            raise
+        except httpx.HTTPError:
+            stats["errors"] += 1
+            raise
+        finally:
+            stats["in_flight"] -= 1
+
+    async def start(self, endpoints):
+        for host, port in endpoints:
+            self.client(host, port)
+
+    async def close(self):
+        clients, self._clients, self._transports = list(self._clients.values()), {}, {}
+        for client in clients:
+            await client.aclose()
+
+    def _endpoint_stats(self, host: str, port: int) -> dict:
+        usage = self.connections(host, port)
+        open_connections, busy = usage if usage is not None else (None, None)
+        return {
+            **self._stats[(host, port)],
+            "connections_open": open_connections,
+            "connections_busy": busy,
+            # share of max_connections in use right now, read from the pool itself
+            "saturation": busy / self.max_connections if busy is not None else None,
+        }
+
+    def stats(self) -> dict:
+        return {
+            "max_connections": self.max_connections,
+            "endpoints": {f"{host}:{port}": self._endpoint_stats(host, port) for host, port in self._stats},
+        }
+
+
+ollama_pool = OllamaClientPool()
+
+
+def _model_name(name: str) -> str:
+    return name[:-len(":latest")] if name.endswith(":latest") else name
+
+
+class NoBackendAvailable(Exception):
+    status_code = 503
+
+    def __init__(self, model: str, retry_after: int = OLLAMA_EJECT_SECONDS):
+        self.detail = f"No healthy Ollama backend serves model '{model}'"
+        super().__init__(self.detail)
+        self.model = model
+        self.retry_after = retry_after
+
+
+class UnknownBackend(Exception):
+    """A request named an Ollama endpoint that is not one of the configured backends."""
+    status_code = 400
+    retry_after = None
+
+    def __init__(self, host: str, port: int):
+        self.detail = f"Ollama endpoint {host}:{port} is not a configured backend"
+        super().__init__(self.detail)
+
+
+class OllamaBackend:
+    def __init__(self, host: str, port: int, models: Optional[Iterable[str]] = None, weight: float = 1):
+        self.host = host
+        self.port = int(port)
+        # None means "any model"; narrowed by health probes once /api/tags answers
+        self.models: Optional[Set[str]] = {_model_name(m) for m in models} if models else None
+        self.available_models: Optional[Set[str]] = None
+        self.weight = weight if weight and weight > 0 else 1
+        self.outstanding = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+
+    @property
+    def name(self) -> str:
+        return f"{self.host}:{self.port}"
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+    def serves(self, model: str) -> bool:
+        model = _model_name(model)
+        if self.models is not None and model not in self.models:
+            return False
+        if self.available_models is not None and model not in self.available_models:
+            return False
+        return True
+
+    def stats(self, now: float) -> dict:
+        return {
+            "models": sorted(self.models) if self.models is not None else None,
+            "available_models": sorted(self.available_models) if self.available_models is not None else None,
+            "weight": self.weight,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "healthy": self.healthy(now),
+        }
+
+
+class OllamaBackendPool:
+    """Routes each generation to the least-loaded healthy backend that serves the model."""
+
+    def __init__(self, backends: List[OllamaBackend], clients: "OllamaClientPool",
+                 probe_interval: float = OLLAMA_HEALTH_INTERVAL, probe_timeout: float = OLLAMA_HEALTH_TIMEOUT,
+                 failure_threshold: int = OLLAMA_FAILURE_THRESHOLD, eject_seconds: float = OLLAMA_EJECT_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.backends = backends
+        self.clients = clients
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.failure_threshold = failure_threshold
+        self.eject_seconds = eject_seconds
+        self._clock = clock
+        self._probe_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_config(cls, entries: List[dict], clients: "OllamaClientPool", **kwargs):
+        backends = [OllamaBackend(e["host"], e.get("port", 11434), e.get("models"), e.get("weight", 1)) for e in entries]
+        return cls(backends, clients, **kwargs)
+
+    def pick(self, model: str) -> OllamaBackend:
+        now = self._clock()
+        candidates = [b for b in self.backends if b.healthy(now) and b.serves(model)]
+        if not candidates:
+            raise NoBackendAvailable(model)
+        # least outstanding requests, scaled by weight; ties go to the least used backend
+        return min(candidates, key=lambda b: ((b.outstanding + 1) / b.weight, b.requests))
+
+    def find(self, host: str, port: Optional[int] = None) -> OllamaBackend:
+        for backend in self.backends:
+            if backend.host == host and (port is None or backend.port == int(port)):
+                return backend
+        raise UnknownBackend(host, port)
+
+    def record_failure(self, backend: OllamaBackend):
+        backend.failures += 1
+        if backend.failures >= self.failure_threshold:
+            if backend.healthy(self._clock()):
+                logger.warning("Ejecting Ollama backend %s after %d failures", backend.name, backend.failures)
+            backend.ejected_until = self._clock() + self.eject_seconds
+
+    def record_success(self, backend: OllamaBackend):
+        backend.failures = 0
+        backend.ejected_until = 0.0
+
+    @asynccontextmanager
+    async def lease(self, model: str, host: Optional[str] = None, port: Optional[int] = None):
+        # an explicit host from the request bypasses routing, but only to a configured backend:
+        # arbitrary hosts would each get a pooled client that is never released
+        backend = self.find(host, port) if host else self.pick(model)
+        backend.outstanding += 1
+        backend.requests += 1
+        try:
+            yield backend
+        except httpx.TransportError:
+            self.record_failure(backend)
+            raise
+        finally:
+            backend.outstanding -= 1
+
+    async def probe(self, backend: OllamaBackend):
+        try:
+            client = self.clients.client(backend.host, backend.port)
+            resp = await client.get("/api/tags", timeout=self.probe_timeout)
+            resp.raise_for_status()
+            models = resp.json().get("models")
+        except Exception as exc:
+            logger.info("Ollama health probe failed for %s: %s", backend.name, exc)
+            self.record_failure(backend)
+            return
+        if isinstance(models, list):
+            backend.available_models = {_model_name(m.get("name", "")) for m in models if isinstance(m, dict)}
+        self.record_success(backend)
+
+    async def probe_all(self):
+        await asyncio.gather(*(self.probe(b) for b in self.backends))
+
+    async def _probe_loop(self):
+        while True:
+            await self.probe_all()
+            await asyncio.sleep(self.probe_interval)
+
+    async def start(self):
+        if self._probe_task is None and self.probe_interval:
+            self._probe_task = asyncio.create_task(self._probe_loop())
+
+    async def close(self):
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+            self._probe_task = None
+
+    def stats(self) -> dict:
+        now = self._clock()
+        return {b.name: b.stats(now) for b in self.backends}
+
+
+ollama_backends = OllamaBackendPool.from_config(OLLAMA_BACKENDS, ollama_pool)
@@ -0,0 +1,106 @@
+# CODEX: Keyset (cursor) pagination for list endpoints
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException, Query, Response, status
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query as SAQuery
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import UnaryExpression
+
+from app.config import PAGINATION_DEFAULT_LIMIT, PAGINATION_MAX_LIMIT
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class Page:
+    """Query parameters of a paginated listing: page size and the cursor returned by the previous page.
+
+    Paging is opt-in: without limit or cursor the whole listing is returned, as before pagination
+    existed; a cursor without a limit continues with pages of PAGINATION_DEFAULT_LIMIT rows.
+    """
+
+    def __init__(self, limit: Optional[int] = Query(None, ge=1, le=PAGINATION_MAX_LIMIT, description="Page size; omit both limit and cursor for the full listing"),
+                 cursor: Optional[str] = Query(None, description=f"Opaque cursor from the {NEXT_CURSOR_HEADER} header of the previous page")):
+        self.limit = limit if limit is not None or cursor is None else PAGINATION_DEFAULT_LIMIT
+        self.cursor = cursor
+
+
+def _sort_keys(order) -> Tuple[list, bool]:
+    columns, directions = [], set()
+    for expr in order:
+        if isinstance(expr, UnaryExpression) and expr.modifier in (operators.desc_op, operators.asc_op):
+            directions.add(expr.modifier is operators.desc_op)
+            columns.append(expr.element)
+        else:
+            directions.add(False)
+            columns.append(expr)
+    if len(directions) != 1:
+        raise ValueError("keyset pagination needs every sort key in the same direction")
+    return columns, directions.pop()
+
+
+def _encode(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+def _decode(column, value: Any) -> Any:
+    python_type = column.type.python_type
+    if value is not None and python_type in (date, datetime):
+        return python_type.fromisoformat(value)
+    return value
+
+
+def encode_cursor(columns, row) -> str:
+    payload = {"k": [c.key for c in columns], "v": [_encode(getattr(row, c.key)) for c in columns]}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(columns, cursor: str) -> list:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if payload["k"] != [c.key for c in columns] or len(payload["v"]) != len(columns):
+            raise ValueError(cursor)
+        return [_decode(c, v) for c, v in zip(columns, payload["v"])]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def _after(columns, values, descending: bool):
+    if len(columns) == 1:
+        return columns[0] < values[0] if descending else columns[0] > values[0]
+    left, right = tuple_(*columns), tuple_(*values)
+    return left < right if descending else left > right
+
+
+def paginate(query: SAQuery, page: Page, response: Response, *order) -> List[Any]:
+    """One page of query in the given order, which must end in a unique column (usually the id).
+
+    Sort keys must not be nullable: "(keys) > (last keys)" is never true for a NULL key, so such
+    rows would silently drop out of every page after the first.
+
+    Rows are fetched with "WHERE (sort keys) > (last keys) ORDER BY ... LIMIT n + 1", so every
+    page costs the same index range scan however deep it is. When more rows follow, the
+    cursor for the next page is returned in the X-Next-Cursor header; the body stays a plain list.
+    """
+    columns, descending = _sort_keys(order)
+    if page.cursor:
+        query = query.filter(_after(columns, decode_cursor(columns, page.cursor), descending))
+    if page.limit is None:
+        return query.order_by(*order).all()
+    rows = query.order_by(*order).limit(page.limit + 1).all()
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(columns, rows[-1])
+    return rows
+
+
+def date_range(query: SAQuery, column, since: Optional[date] = None, until: Optional[date] = None) -> SAQuery:
+    """Restrict query to since <= column < until (either bound optional)."""
+    if since is not None:
+        query = query.filter(column >= since)
+    if until is not None:
+        query = query.filter(column < until)
+    return query
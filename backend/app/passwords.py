@@ -0,0 +1,136 @@
+# CODEX: bcrypt hashing and verification on a dedicated, size-limited process pool
+import asyncio
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from app.config import (PASSWORD_HASH_ROUNDS, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE, PASSWORD_HASH_RETRY_AFTER,
+                        PASSWORD_HASH_EXECUTOR)
+from app.security import hash_with_rounds, verify_and_update
+
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    return fn(*args), time.perf_counter() - started
+
+
+class PasswordHasher:
+    """Runs bcrypt in worker processes so a login burst cannot starve the request threadpool.
+
+    At most `workers` hashes run at once and up to `max_queue` more wait for a worker;
+    beyond that callers get a 503 with Retry-After. Processes are spawned on first use,
+    never forked from the threaded server; with executor="thread" the workers are threads.
+    close() shuts the workers down and the next hash starts new ones.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_MAX_QUEUE,
+                 rounds: int = PASSWORD_HASH_ROUNDS, retry_after: int = PASSWORD_HASH_RETRY_AFTER,
+                 executor: str = PASSWORD_HASH_EXECUTOR):
+        if executor not in ("process", "thread"):
+            raise ValueError(f"Unknown password hash executor {executor!r}; expected 'process' or 'thread'")
+        self.workers = workers
+        self.max_queue = max_queue
+        self.rounds = rounds
+        self.retry_after = retry_after
+        self.executor = executor
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._wait_samples = deque(maxlen=1024)
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.total_wait = 0.0
+        self.total_run = 0.0
+        self.max_queue_seen = 0
+
+    def _pool(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.executor == "thread":
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+                else:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                         mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def _admit(self):
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                    detail="Too many sign-ins in progress, please retry shortly",
+                                    headers={"Retry-After": str(self.retry_after)})
+            self._pending += 1
+            self.max_queue_seen = max(self.max_queue_seen, self._pending - self.workers)
+
+    def _finished(self, submitted: float, future):
+        # runs when the worker is done, even if the awaiting request was cancelled
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled() or future.exception() is not None:
+                return
+            waited = time.perf_counter() - submitted - future.result()[1]
+            self.completed += 1
+            self.total_run += future.result()[1]
+            self.total_wait += waited
+            self._wait_samples.append(waited)
+
+    async def _run(self, fn, *args):
+        self._admit()
+        submitted = time.perf_counter()
+        try:
+            future = self._pool().submit(_timed, fn, *args)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+        future.add_done_callback(lambda f: self._finished(submitted, f))
+        result, _ = await asyncio.wrap_future(future)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_with_rounds, password, self.rounds)
+
+    async def verify(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """(matches, replacement hash when the stored one uses a different cost)"""
+        ok, new_hash = await self._run(verify_and_update, password, hashed, self.rounds)
+        if new_hash is not None:
+            self.rehashed += 1
+        return ok, new_hash
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        samples = sorted(self._wait_samples)
+
+        def pct(p):
+            return samples[min(len(samples) - 1, int(p * len(samples)))] if samples else 0.0
+
+        return {
+            "workers": self.workers,
+            "executor": self.executor,
+            "rounds": self.rounds,
+            "in_flight": self._pending,
+            "queue_depth": max(0, self._pending - self.workers),
+            "max_queue": self.max_queue,
+            "max_queue_seen": self.max_queue_seen,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "avg_wait_seconds": self.total_wait / self.completed if self.completed else 0.0,
+            "p95_wait_seconds": pct(0.95),
+            "avg_hash_seconds": self.total_run / self.completed if self.completed else 0.0,
+        }
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,208 @@
+# CODEX: Cached principal resolution for authenticated requests
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Callable, Optional
+
+from sqlalchemy import Date, DateTime, Enum
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.cache import LRUCache
+from app.config import (
+    REDIS_URL,
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    PRINCIPAL_CACHE_BACKEND,
+    PRINCIPAL_CACHE_TTL,
+    PRINCIPAL_CACHE_MAX_ENTRIES,
+    PRINCIPAL_CACHE_REDIS_TIMEOUT,
+)
+from app.models import User, UserRole
+
+logger = logging.getLogger(__name__)
+
+# the credential never leaves the database; everything else a route may read is cached
+PRINCIPAL_COLUMNS = [c for c in User.__table__.columns if c.name != "password_hash"]
+
+
+def _dump(user: User) -> dict:
+    data = {}
+    for column in PRINCIPAL_COLUMNS:
+        value = getattr(user, column.name)
+        if isinstance(value, UserRole):
+            value = value.value
+        elif isinstance(value, (date, datetime)):
+            value = value.isoformat()
+        data[column.name] = value
+    return data
+
+
+def _load(data: dict) -> dict:
+    values = {}
+    for column in PRINCIPAL_COLUMNS:
+        value = data.get(column.name)
+        if value is not None:
+            if isinstance(column.type, Enum):
+                value = UserRole(value)
+            elif isinstance(column.type, DateTime):
+                value = datetime.fromisoformat(value)
+            elif isinstance(column.type, Date):
+                value = date.fromisoformat(value)
+        values[column.name] = value
+    return values
+
+
+def attach(db: Session, values: dict) -> User:
+    """A persistent User for values, without a SELECT.
+
+    Columns missing from values stay expired and load on first access, so a route that
+    touches a relationship or mutates the user behaves exactly as with a queried row.
+    """
+    existing = db.identity_map.get(db.identity_key(User, values["id"]))
+    if existing is not None:
+        return existing
+    user = User(**values)
+    make_transient_to_detached(user)
+    db.add(user)
+    return user
+
+
+class RedisTier:
+    """Blocking Redis client for the sync auth dependencies; while Redis is unreachable it is skipped."""
+
+    def __init__(self, client, retry_after: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        self._client = client
+        self._retry_after = retry_after
+        self._clock = clock
+        self._down_until = 0.0
+        self.errors = 0
+
+    @classmethod
+    def from_url(cls, url: str, timeout: float = PRINCIPAL_CACHE_REDIS_TIMEOUT):
+        import redis
+        return cls(redis.Redis.from_url(url, socket_connect_timeout=timeout, socket_timeout=timeout))
+
+    def _call(self, op: str, *args, **kwargs):
+        if self._clock() < self._down_until:
+            return None
+        try:
+            return getattr(self._client, op)(*args, **kwargs)
+        except Exception as exc:
+            self.errors += 1
+            self._down_until = self._clock() + self._retry_after
+            logger.warning("Principal cache %s failed, bypassing Redis for %ss: %s", op, self._retry_after, exc)
+            return None
+
+    def get(self, key: str) -> Optional[dict]:
+        stored = self._call("get", key)
+        return json.loads(stored) if stored else None
+
+    def set(self, key: str, value: dict, ttl: float):
+        self._call("set", key, json.dumps(value), ex=max(1, int(ttl)))
+
+    def delete(self, key: str):
+        self._call("delete", key)
+
+
+class PrincipalCache:
+    """Resolves the user behind an access token without a database round trip per request.
+
+    Column values (never the password hash) are kept in a bounded TTL LRU keyed by user id,
+    optionally behind a shared Redis tier. User updates, deletes and role changes invalidate
+    the entry and record when they happened, so tokens carrying role claims issued before
+    the change are no longer trusted. Role claims only stand in for a user that is already
+    cached, so they are never staler than a cached entry: without Redis, writes made through
+    other workers show up once their entries expire after `ttl` seconds.
+    """
+
+    def __init__(self, shared: Optional[RedisTier] = None, ttl: float = PRINCIPAL_CACHE_TTL,
+                 max_entries: int = PRINCIPAL_CACHE_MAX_ENTRIES,
+                 claims_ttl: float = ACCESS_TOKEN_EXPIRE_MINUTES * 60, clock: Callable[[], float] = time.time):
+        self.shared = shared
+        self.ttl = ttl
+        self.claims_ttl = claims_ttl
+        self._clock = clock
+        self._l1 = LRUCache(max_entries, ttl=ttl)
+        # user_id -> time of the last change; never evicted early, or a demoted user's old token would pass again
+        self._changed: "OrderedDict[int, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._epoch = 0
+        self.loads = 0
+        self.claims_used = 0
+
+    def _cached(self, user_id: int) -> Optional[dict]:
+        data = self._l1.get(user_id)
+        if data is None and self.shared is not None:
+            data = self.shared.get(f"principal:{user_id}")
+            if data is not None:
+                self._l1.set(user_id, data)
+        return data
+
+    def resolve(self, db: Session, user_id: int) -> Optional[User]:
+        data = self._cached(user_id)
+        if data is not None:
+            return attach(db, _load(data))
+        with self._lock:
+            epoch = self._epoch
+        user = db.get(User, user_id)
+        if user is None:
+            return None
+        self.loads += 1
+        data = _dump(user)
+        with self._lock:
+            # a user changed while we were reading it may already be stale: don't keep it
+            if epoch != self._epoch:
+                return user
+            self._l1.set(user_id, data)
+        if self.shared is not None:
+            self.shared.set(f"principal:{user_id}", data, self.ttl)
+        return user
+
+    def from_claims(self, db: Session, claims: dict) -> Optional[User]:
+        """The user described by a token's role claim, or None when the claim can't be trusted."""
+        role, issued_at = claims.get("role"), claims.get("iat")
+        if role is None or issued_at is None:
+            return None
+        user_id = int(claims["sub"])
+        # a partial User would lazy-load its columns anyway, and a deleted one has no entry: let the caller load it
+        data = self._l1.get(user_id)
+        if data is None or data["role"] != role:
+            return None
+        with self._lock:
+            changed_at = self._changed.get(user_id)
+        if changed_at is None and self.shared is not None:
+            changed_at = (self.shared.get(f"principal:changed:{user_id}") or {}).get("at")
+        if changed_at is not None and issued_at <= changed_at:
+            return None
+        self.claims_used += 1
+        return attach(db, _load(data))
+
+    def invalidate(self, user_id: int):
+        now = self._clock()
+        with self._lock:
+            self._epoch += 1
+            self._l1.delete(user_id)
+            self._changed.pop(user_id, None)
+            self._changed[user_id] = now
+            # markers are kept in change order; only those older than any live token can go
+            while self._changed and next(iter(self._changed.values())) <= now - self.claims_ttl:
+                self._changed.popitem(last=False)
+        if self.shared is not None:
+            self.shared.delete(f"principal:{user_id}")
+            self.shared.set(f"principal:changed:{user_id}", {"at": now}, self.claims_ttl)
+
+    def stats(self) -> dict:
+        return {"backend": "redis" if self.shared is not None else "memory", "l1": self._l1.stats(),
+                "loads": self.loads, "claims_used": self.claims_used,
+                "backend_errors": getattr(self.shared, "errors", 0)}
+
+
+def build_principal_cache() -> PrincipalCache:
+    if PRINCIPAL_CACHE_BACKEND == "redis":
+        return PrincipalCache(RedisTier.from_url(REDIS_URL))
+    return PrincipalCache()
+
+
+principal_cache = build_principal_cache()
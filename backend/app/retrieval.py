@@ -0,0 +1,200 @@
+# CODEX: Per-classroom BM25 index over lesson and assignment text to ground tutor prompts
+import math
+import re
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import (
+    RETRIEVAL_TOP_K,
+    RETRIEVAL_TOKEN_BUDGET,
+    RETRIEVAL_SNIPPET_MAX_TOKENS,
+    RETRIEVAL_REBUILD_SECONDS,
+    RETRIEVAL_K1,
+    RETRIEVAL_B,
+)
+from app.models import Assignment, Lesson
+from app.tutor_context import estimate_tokens
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+# CODEX: only the most frequent function words of the supported languages; BM25's idf handles the rest
+_STOPWORDS = frozenset("""
+a an and are as at be by for from how i in is it of on or that the this to was what when where which who why with you
+de da do das dos e em na no nas nos o os para por que um uma com se
+el la los las del y en es un una con por
+""".split())
+
+DocKey = Tuple[str, int]  # ("lesson" | "assignment", id)
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return [w for w in _WORD.findall(text.lower()) if w not in _STOPWORDS and (len(w) > 1 or not w.isascii())]
+
+
+class BM25Index:
+    """Incremental Okapi BM25 over a small document set (one classroom).
+
+    Postings map term -> {doc: term frequency}, so adding, replacing or removing a document
+    only touches that document's terms, and a query only visits documents sharing a term.
+    """
+
+    def __init__(self, k1: float = RETRIEVAL_K1, b: float = RETRIEVAL_B):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[DocKey, int]] = {}
+        self.lengths: Dict[DocKey, int] = {}
+        self.doc_terms: Dict[DocKey, Tuple[str, ...]] = {}
+        self.snippets: Dict[DocKey, str] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def upsert(self, key: DocKey, text: str, snippet: Optional[str] = None):
+        self.remove(key)
+        terms = Counter(tokenize(text))
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[key] = tf
+        length = sum(terms.values())
+        self.doc_terms[key] = tuple(terms)
+        self.lengths[key] = length
+        self.total_length += length
+        self.snippets[key] = snippet if snippet is not None else text
+
+    def remove(self, key: DocKey):
+        length = self.lengths.pop(key, None)
+        if length is None:
+            return
+        self.total_length -= length
+        self.snippets.pop(key, None)
+        for term in self.doc_terms.pop(key):
+            docs = self.postings[term]
+            del docs[key]
+            if not docs:
+                del self.postings[term]
+
+    def search(self, query: str, k: int) -> List[Tuple[float, DocKey]]:
+        count = len(self.lengths)
+        if not count:
+            return []
+        avg_length = self.total_length / count or 1.0
+        scores: Dict[DocKey, float] = {}
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for key, tf in docs.items():
+                norm = tf + self.k1 * (1 - self.b + self.b * self.lengths[key] / avg_length)
+                scores[key] = scores.get(key, 0.0) + idf * tf * (self.k1 + 1) / norm
+        ranked = sorted(((score, key) for key, score in scores.items()), key=lambda item: (-item[0], item[1]))
+        return ranked[:k]
+
+
+def make_document(kind: str, title: str, description: Optional[str]) -> Tuple[str, str]:
+    text = f"{title}\n{description}" if description else title
+    label = "Lesson" if kind == "lesson" else "Assignment"
+    snippet = f"{label}: {title}" + (f" - {description}" if description else "")
+    return text, snippet
+
+
+class ClassroomRetrieval:
+    """One BM25 index per classroom, built lazily from the database and then kept current.
+
+    The lesson and assignment routes push every create, edit and delete into the index of
+    this process; indexes are also rebuilt after rebuild_seconds so changes made through
+    other workers show up eventually.
+    """
+
+    def __init__(self, top_k: int = RETRIEVAL_TOP_K, token_budget: int = RETRIEVAL_TOKEN_BUDGET,
+                 snippet_max_tokens: int = RETRIEVAL_SNIPPET_MAX_TOKENS,
+                 rebuild_seconds: float = RETRIEVAL_REBUILD_SECONDS, clock: Callable[[], float] = time.monotonic):
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.snippet_max_tokens = snippet_max_tokens
+        self.rebuild_seconds = rebuild_seconds
+        self._clock = clock
+        self._indexes: Dict[int, Tuple[BM25Index, float]] = {}
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.queries = 0
+
+    def _build(self, db: Session, classroom_id: int) -> BM25Index:
+        index = BM25Index()
+        lessons = db.query(Lesson.id, Lesson.title, Lesson.description).filter(Lesson.classroom_id == classroom_id)
+        assignments = db.query(Assignment.id, Assignment.title, Assignment.description)\
+            .filter(Assignment.classroom_id == classroom_id)
+        for kind, rows in (("lesson", lessons), ("assignment", assignments)):
+            for row in rows:
+                index.upsert((kind, row.id), *make_document(kind, row.title, row.description))
+        self.builds += 1
+        return index
+
+    def index_for(self, db: Session, classroom_id: int) -> BM25Index:
+        with self._lock:
+            entry = self._indexes.get(classroom_id)
+            if entry is not None and self._clock() - entry[1] < self.rebuild_seconds:
+                return entry[0]
+        index = self._build(db, classroom_id)
+        with self._lock:
+            self._indexes[classroom_id] = (index, self._clock())
+        return index
+
+    def upsert(self, classroom_id: int, kind: str, doc_id: int, title: str, description: Optional[str]):
+        """Update an already-built index in place; unbuilt classrooms pick the row up when first queried."""
+        with self._lock:
+            entry = self._indexes.get(classroom_id)
+            if entry is not None:
+                entry[0].upsert((kind, doc_id), *make_document(kind, title, description))
+
+    def remove(self, classroom_id: int, kind: str, doc_id: int):
+        with self._lock:
+            entry = self._indexes.get(classroom_id)
+            if entry is not None:
+                entry[0].remove((kind, doc_id))
+
+    def drop(self, classroom_id: int):
+        with self._lock:
+            self._indexes.pop(classroom_id, None)
+
+    def snippets(self, db: Session, classroom_ids: Iterable[int], query: str,
+                 k: Optional[int] = None, token_budget: Optional[int] = None) -> List[str]:
+        """Best-matching snippets across the classrooms, best first, within the token budget."""
+        k = self.top_k if k is None else k
+        budget = self.token_budget if token_budget is None else token_budget
+        self.queries += 1
+        ranked = []
+        for classroom_id in classroom_ids:
+            index = self.index_for(db, classroom_id)
+            with self._lock:
+                ranked.extend((score, index.snippets[key]) for score, key in index.search(query, k))
+        ranked.sort(key=lambda item: -item[0])
+        picked = []
+        max_chars = self.snippet_max_tokens * 4
+        for _, snippet in ranked[:k]:
+            if len(snippet) > max_chars:
+                snippet = snippet[:max_chars].rsplit(" ", 1)[0] + "..."
+            cost = estimate_tokens(snippet)
+            if cost > budget:
+                continue
+            budget -= cost
+            picked.append(snippet)
+        return picked
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "classrooms": len(self._indexes),
+                "documents": sum(len(index) for index, _ in self._indexes.values()),
+                "terms": sum(len(index.postings) for index, _ in self._indexes.values()),
+                "builds": self.builds,
+                "queries": self.queries,
+            }
+
+
+classroom_retrieval = ClassroomRetrieval()
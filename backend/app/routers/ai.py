@@ -1,21 +1,26 @@
 # CODEX: AI-powered endpoints calling Ollama for tutor, lesson, and analytics
-from fastapi import APIRouter, Depends, HTTPException, status, Header
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Query, Request
 from pydantic import BaseModel
 from typing import Optional, List
-import httpx
 import json
+import time
 from sqlalchemy.orm import Session
 
-from app.config import OLLAMA_HOST, OLLAMA_PORT, OLLAMA_MODEL, OLLAMA_STYLE, OLLAMA_PRE_PROMPT, REDIS_URL
+from app.config import OLLAMA_PORT, OLLAMA_MODEL, OLLAMA_STYLE, OLLAMA_PRE_PROMPT, OLLAMA_KEEP_ALIVE, TUTOR_CONTEXT_TOKEN_BUDGET
+from app.cache import ai_cache
+from app.singleflight import generation_flights
+from app.admission import ollama_admission, AdmissionRejected, Priority
+from app.write_behind import write_behind
+from app.compression import no_compression
+from app.streaming import relay, negotiate_format, stream_response, text_response, error_response
+from app.chat_history import append_messages, sequence_pending_messages, trim_sessions
+from app.tutor_context import build_context, estimate_tokens, session_summarizer
+from app.retrieval import classroom_retrieval
 from app.database import get_db
-from app.models import Analytics, UserRole, ChatSession, ChatMessage
+from app.ollama_pool import ollama_pool, ollama_backends, NoBackendAvailable, UnknownBackend
+from app.models import Analytics, UserRole, ChatSession, ChatMessage, classroom_students
 from app.schemas import AnalyticsRead
 from app.routers.auth import require_role
-import redis.asyncio as aioredis
-
-# Initialize Redis client for caching
-redis_client = aioredis.from_url(REDIS_URL, encoding="utf-8", decode_responses=True)
 
 router = APIRouter(prefix="/ai", tags=["ai"])
 
@@ -42,28 +47,36 @@ _error_messages = {
     }
 }
 
-async def _stream_ollama(prompt: str, host: str, port: int, model: str, style: Optional[str], pre_prompt: Optional[str], history: Optional[List[dict]] = None):
+# CODEX: queued assistant messages get their sequence numbers (and cap the ring) at flush time
+write_behind.add_flush_hook(sequence_pending_messages)
+
+def _admission_error(exc) -> HTTPException:
+    # CODEX: shed load fast with a retry hint instead of piling more work onto Ollama
+    headers = {"Retry-After": str(exc.retry_after)} if exc.retry_after is not None else None
+    return HTTPException(status_code=exc.status_code, detail=exc.detail, headers=headers)
+
+async def _stream_ollama(prompt: str, host: Optional[str], port: int, model: str, style: Optional[str], pre_prompt: Optional[str], history: Optional[List[dict]] = None, priority: Priority = Priority.tutor):
     # CODEX: Use OpenAI-compatible streaming endpoint
-    url = f"http://{host}:{port}/v1/chat/completions"
     system_content = pre_prompt or OLLAMA_PRE_PROMPT
     messages = [{"role": "system", "content": system_content}]
     if history:
         messages.extend(history)
     messages.append({"role": "user", "content": prompt})
-    payload = {"model": model, "messages": messages, "stream": True}
-    # CODEX: add retry/backoff for resilient Ollama calls
-    transport = httpx.RetryTransport(retries=3, backoff_factor=0.5, status_forcelist=[502,503,504])
-    async with httpx.AsyncClient(timeout=None, transport=transport) as client:
-        async with client.stream("POST", url, json=payload) as resp:
+    # CODEX: ask Ollama to keep the model resident between requests
+    payload = {"model": model, "messages": messages, "stream": True, "keep_alive": OLLAMA_KEEP_ALIVE}
+    # CODEX: wait for an admission slot; it is held until the stream finishes or is closed
+    async with ollama_admission.slot(priority):
+        # CODEX: route to the least-loaded healthy backend serving this model over its keep-alive pool
+        async with ollama_backends.lease(model, host, port) as backend, \
+                ollama_pool.stream("POST", backend.host, backend.port, "/v1/chat/completions", json=payload) as resp:
             if resp.status_code != 200:
+                if resp.status_code >= 500:
+                    ollama_backends.record_failure(backend)
                 # fully read error body
                 try:
-                    body = await resp.read()
+                    body = await resp.aread()
                 except Exception:
-                    try:
-                        body = await resp.aread()
-                    except Exception:
-                        body = b""
+                    body = b""
                 detail = body.decode(errors="ignore") if body else resp.reason_phrase
                 raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"Ollama error: {detail}")
             # parse SSE data frames
@@ -81,9 +94,16 @@ async def _stream_ollama(prompt: str, host: str, port: int, model: str, style: O
                 if content_chunk:
                     yield content_chunk
 
-@router.post("/tutor")
-async def ai_tutor(request: Prompt, current_student=Depends(require_role(UserRole.student)), db: Session = Depends(get_db), accept_language: Optional[str] = Header(None)):
-    host = request.host or OLLAMA_HOST
+# CODEX: batch lesson jobs generate through the same admission, routing and pooling path, at the lowest priority
+def generate_batch_lesson(prompt: str, model: str, style: Optional[str], pre_prompt: Optional[str]):
+    return _stream_ollama(prompt, None, OLLAMA_PORT, model, style, pre_prompt, priority=Priority.batch)
+
+@router.post("/tutor", dependencies=[Depends(no_compression)])
+async def ai_tutor(request: Prompt, http_request: Request, current_student=Depends(require_role(UserRole.student)), db: Session = Depends(get_db), accept_language: Optional[str] = Header(None), accept: Optional[str] = Header(None), stream_format: Optional[str] = Query(None, alias="format")):
+    started = time.perf_counter()
+    # CODEX: plain text by default; SSE or NDJSON frames when asked for via Accept or ?format=
+    fmt = negotiate_format(accept, stream_format)
+    host = request.host  # None lets the backend pool choose
     port = request.port or OLLAMA_PORT
     model = request.model or OLLAMA_MODEL
     style = request.style or OLLAMA_STYLE
@@ -92,63 +112,68 @@ async def ai_tutor(request: Prompt, current_student=Depends(require_role(UserRol
     lang = accept_language.split(",")[0].split("-")[0] if accept_language else "en"
     if lang not in _error_messages['stream_error']:
         lang = "en"
+    # CODEX: ground answers in the student's own classroom material: top-k lesson/assignment snippets within a fixed budget
+    classroom_ids = [row.classroom_id for row in db.query(classroom_students.c.classroom_id)
+                     .filter(classroom_students.c.student_id == current_student.id)]
+    snippets = classroom_retrieval.snippets(db, classroom_ids, request.prompt) if classroom_ids else []
+    grounding = [{"role": "system", "content": "Relevant classroom material:\n" + "\n".join(f"- {s}" for s in snippets)}] if snippets else []
     # CODEX: handle chat session and user message history
     history_msgs: List[dict] = []  # default empty history
     if request.session_id is not None:
         session = db.query(ChatSession).filter_by(id=request.session_id, user_id=current_student.id).first()
         if not session:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=_error_messages['session_not_found'][lang])
-        # prune oldest if exceed 128
-        count = db.query(ChatMessage).filter_by(session_id=session.id).count()
-        if count >= 128:
-            oldest = db.query(ChatMessage).filter_by(session_id=session.id).order_by(ChatMessage.created_at.asc()).first()
-            db.delete(oldest); db.commit()
-        # build last 4 user & assistant messages as history
-        user_msgs = db.query(ChatMessage).filter_by(session_id=session.id, sender="user").order_by(ChatMessage.created_at.desc()).limit(4).all()[::-1]
-        assistant_msgs = db.query(ChatMessage).filter_by(session_id=session.id, sender="assistant").order_by(ChatMessage.created_at.desc()).limit(4).all()[::-1]
-        combined = sorted(user_msgs + assistant_msgs, key=lambda m: m.created_at)
-        history_msgs = [{"role": m.sender, "content": m.text} for m in combined]
-    else:
-        # create new session for first-time chat
-        session = ChatSession(user_id=current_student.id)
-        db.add(session); db.commit(); db.refresh(session)
-    # record user prompt
-    user_msg = ChatMessage(session_id=session.id, sender="user", text=request.prompt)
-    db.add(user_msg); db.commit()
-    # CODEX: initialize streaming with history and peek first chunk
-    stream = _stream_ollama(request.prompt, host, port, model, style, pre_prompt, history_msgs)
+        # CODEX: newest turns that fit what is left of the token budget, plus the rolling summary of older ones
+        context_budget = TUTOR_CONTEXT_TOKEN_BUDGET - sum(estimate_tokens(m["content"]) for m in grounding)
+        history_msgs, fold_upto = build_context(db, session, request.prompt, token_budget=context_budget)
+        if fold_upto is not None:
+            session_summarizer.schedule(
+                session.id, fold_upto,
+                lambda text, instructions: _stream_ollama(text, host, port, model, None, instructions, priority=Priority.summary),
+            )
+    # CODEX: initialize streaming with grounding and history and peek first chunk
+    stream = _stream_ollama(request.prompt, host, port, model, style, pre_prompt, grounding + history_msgs, priority=Priority.tutor)
     try:
         first_chunk = await stream.__anext__()
+    except (AdmissionRejected, NoBackendAvailable, UnknownBackend) as exc:
+        raise _admission_error(exc)
     except Exception:
-        async def event_stream_error():
-            yield _error_messages['stream_error'][lang]
-        return StreamingResponse(event_stream_error(), media_type="text/plain")
-    response_buffer = first_chunk
-    async def event_stream():
-        nonlocal response_buffer
-        # yield initial chunk
-        yield first_chunk
-        # stream remaining chunks
-        async for chunk in stream:
-            response_buffer += chunk
-            yield chunk
-        # record analytics after full response
-        record = Analytics(student_id=current_student.id, data={"prompt": request.prompt, "response": response_buffer})
-        db.add(record); db.commit(); db.refresh(record)
-        # CODEX: record assistant message and prune if needed
-        assistant_msg = ChatMessage(session_id=session.id, sender="assistant", text=response_buffer)
-        db.add(assistant_msg); db.commit()
-        # prune history to 128 by deleting oldest
-        count2 = db.query(ChatMessage).filter_by(session_id=session.id).count()
-        while count2 > 128:
-            old = db.query(ChatMessage).filter_by(session_id=session.id).order_by(ChatMessage.created_at.asc()).first()
-            db.delete(old); db.commit()
-            count2 -= 1
-    return StreamingResponse(event_stream(), media_type="text/plain")
+        return error_response(_error_messages['stream_error'][lang], fmt)
+    # CODEX: nothing is written until generation has started, so a shed or failed request leaves no orphan turn to retry into
+    try:
+        if request.session_id is None:
+            # create new session for first-time chat
+            session = ChatSession(user_id=current_student.id)
+            db.add(session); db.flush()
+            trim_sessions(db, current_student.id)
+            db.commit(); db.refresh(session)
+        # CODEX: record user prompt; appending past 128 messages drops the oldest in one range delete
+        append_messages(db, session.id, [ChatMessage(sender="user", text=request.prompt)])
+        db.commit()
+    except BaseException:
+        await stream.aclose()  # give the admission slot back
+        raise
+    student_id, session_id = current_student.id, session.id
+    async def persist(text: str, truncated: bool):
+        # CODEX: hand analytics and the assistant reply to the write-behind queue; history is capped on flush.
+        # A reply cut short by a disconnect is still kept, flagged as truncated.
+        data = {"prompt": request.prompt, "response": text}
+        if truncated:
+            data["truncated"] = True
+        await write_behind.submit(
+            Analytics(student_id=student_id, data=data),
+            ChatMessage(session_id=session_id, sender="assistant", text=text, truncated=truncated),
+        )
+    # CODEX: stop generating as soon as the student closes the tab
+    return stream_response(relay(http_request, "tutor", first_chunk, stream, persist), fmt, started,
+                           {"model": model, "session_id": session_id})
 
-@router.post("/lesson")
-async def ai_lesson(request: Prompt, current_teacher=Depends(require_role(UserRole.teacher)), db: Session = Depends(get_db), accept_language: Optional[str] = Header(None)):
-    host = request.host or OLLAMA_HOST
+@router.post("/lesson", dependencies=[Depends(no_compression)])
+async def ai_lesson(request: Prompt, http_request: Request, current_teacher=Depends(require_role(UserRole.teacher)), accept_language: Optional[str] = Header(None), accept: Optional[str] = Header(None), stream_format: Optional[str] = Query(None, alias="format")):
+    started = time.perf_counter()
+    # CODEX: plain text by default; SSE or NDJSON frames when asked for via Accept or ?format=
+    fmt = negotiate_format(accept, stream_format)
+    host = request.host  # None lets the backend pool choose
     port = request.port or OLLAMA_PORT
     model = request.model or OLLAMA_MODEL
     style = request.style or OLLAMA_STYLE
@@ -157,40 +182,42 @@ async def ai_lesson(request: Prompt, current_teacher=Depends(require_role(UserRo
     lang = accept_language.split(",")[0].split("-")[0] if accept_language else "en"
     if lang not in _error_messages['stream_error']:
         lang = "en"
-    # Redis caching for AI lesson responses
-    cache_key = f"ai_lesson:{current_teacher.id}:{model}:{request.prompt}"
-    cached = await redis_client.get(cache_key)
+    # CODEX: two-tier (L1 LRU + Redis) caching for AI lesson responses, keyed by a prompt hash
+    cache_key = ai_cache.make_key("ai_lesson", current_teacher.id, model, request.prompt)
+    cached = await ai_cache.get(cache_key)
     if cached:
-        async def replay():
-            yield cached
-        return StreamingResponse(replay(), media_type="text/plain")
-    # CODEX: initialize streaming and peek first chunk to handle HTTP errors before response start
-    stream = _stream_ollama(request.prompt, host, port, model, style, pre_prompt)
+        return text_response(cached, fmt, started, {"model": model, "cached": True})
+    # CODEX: attach to an identical in-flight generation (from any teacher) instead of starting another one
+    flight_key = ai_cache.make_key("ai_lesson_flight", host, port, model, style, pre_prompt, request.prompt)
+    stream = generation_flights.stream(
+        flight_key,
+        lambda: _stream_ollama(request.prompt, host, port, model, style, pre_prompt, priority=Priority.lesson),
+    )
     try:
         first_chunk = await stream.__anext__()
+    except (AdmissionRejected, NoBackendAvailable, UnknownBackend) as exc:
+        raise _admission_error(exc)
     except Exception:
-        async def event_stream_error():
-            yield _error_messages['stream_error'][lang]
-        return StreamingResponse(event_stream_error(), media_type="text/plain")
-    response_buffer = first_chunk
-    async def event_stream():
-        nonlocal response_buffer
-        # yield initial chunk
-        yield first_chunk
-        # stream remaining chunks
-        async for chunk in stream:
-            response_buffer += chunk
-            yield chunk
-        # record analytics after full response
-        record = Analytics(teacher_id=current_teacher.id, data={"prompt": request.prompt, "response": response_buffer})
-        db.add(record); db.commit(); db.refresh(record)
-        # Cache the lesson response in Redis (1h expiration)
-        await redis_client.set(cache_key, response_buffer, ex=3600)
-    return StreamingResponse(event_stream(), media_type="text/plain")
+        return error_response(_error_messages['stream_error'][lang], fmt)
+    teacher_id = current_teacher.id
+    async def persist(text: str, truncated: bool):
+        # record analytics after the response (batched by the write-behind queue)
+        data = {"prompt": request.prompt, "response": text}
+        if truncated:
+            data["truncated"] = True
+        await write_behind.submit(Analytics(teacher_id=teacher_id, data=data))
+        # Cache only complete lesson responses (L1 + shared backend, ai_cache.ttl expiration)
+        if not truncated:
+            await ai_cache.set(cache_key, text)
+    # CODEX: leaving the flight on disconnect cancels the upstream once no other teacher is following it
+    return stream_response(relay(http_request, "lesson", first_chunk, stream, persist), fmt, started, {"model": model})
 
-@router.post("/analytics")
-async def ai_generate_analytics(request: Prompt, current_teacher=Depends(require_role(UserRole.teacher)), db: Session = Depends(get_db), accept_language: Optional[str] = Header(None)):
-    host = request.host or OLLAMA_HOST
+@router.post("/analytics", dependencies=[Depends(no_compression)])
+async def ai_generate_analytics(request: Prompt, http_request: Request, current_teacher=Depends(require_role(UserRole.teacher)), accept_language: Optional[str] = Header(None), accept: Optional[str] = Header(None), stream_format: Optional[str] = Query(None, alias="format")):
+    started = time.perf_counter()
+    # CODEX: plain text by default; SSE or NDJSON frames when asked for via Accept or ?format=
+    fmt = negotiate_format(accept, stream_format)
+    host = request.host  # None lets the backend pool choose
     port = request.port or OLLAMA_PORT
     model = request.model or OLLAMA_MODEL
     style = request.style or OLLAMA_STYLE
@@ -199,33 +226,32 @@ async def ai_generate_analytics(request: Prompt, current_teacher=Depends(require
     lang = accept_language.split(",")[0].split("-")[0] if accept_language else "en"
     if lang not in _error_messages['stream_error']:
         lang = "en"
-    # Redis caching for AI analytics responses
-    cache_key = f"ai_analytics:{current_teacher.id}:{model}:{request.prompt}"
-    cached = await redis_client.get(cache_key)
+    # CODEX: two-tier (L1 LRU + Redis) caching for AI analytics responses, keyed by a prompt hash
+    cache_key = ai_cache.make_key("ai_analytics", current_teacher.id, model, request.prompt)
+    cached = await ai_cache.get(cache_key)
     if cached:
-        async def replay():
-            yield cached
-        return StreamingResponse(replay(), media_type="text/plain")
-    # CODEX: initialize streaming and peek first chunk to handle HTTP errors before response start
-    stream = _stream_ollama(request.prompt, host, port, model, style, pre_prompt)
+        return text_response(cached, fmt, started, {"model": model, "cached": True})
+    # CODEX: attach to an identical in-flight generation (from any teacher) instead of starting another one
+    flight_key = ai_cache.make_key("ai_analytics_flight", host, port, model, style, pre_prompt, request.prompt)
+    stream = generation_flights.stream(
+        flight_key,
+        lambda: _stream_ollama(request.prompt, host, port, model, style, pre_prompt, priority=Priority.analytics),
+    )
     try:
         first_chunk = await stream.__anext__()
+    except (AdmissionRejected, NoBackendAvailable, UnknownBackend) as exc:
+        raise _admission_error(exc)
     except Exception:
-        async def event_stream_error():
-            yield _error_messages['stream_error'][lang]
-        return StreamingResponse(event_stream_error(), media_type="text/plain")
-    response_buffer = first_chunk
-    async def event_stream():
-        nonlocal response_buffer
-        # yield initial chunk
-        yield first_chunk
-        # stream remaining chunks
-        async for chunk in stream:
-            response_buffer += chunk
-            yield chunk
-        # record analytics after full response
-        record = Analytics(teacher_id=current_teacher.id, data={"prompt": request.prompt, "response": response_buffer})
-        db.add(record); db.commit(); db.refresh(record)
-        # Cache the analytics response in Redis (1h expiration)
-        await redis_client.set(cache_key, response_buffer, ex=3600)
-    return StreamingResponse(event_stream(), media_type="text/plain")
+        return error_response(_error_messages['stream_error'][lang], fmt)
+    teacher_id = current_teacher.id
+    async def persist(text: str, truncated: bool):
+        # record analytics after the response (batched by the write-behind queue)
+        data = {"prompt": request.prompt, "response": text}
+        if truncated:
+            data["truncated"] = True
+        await write_behind.submit(Analytics(teacher_id=teacher_id, data=data))
+        # Cache only complete analytics responses (L1 + shared backend, ai_cache.ttl expiration)
+        if not truncated:
+            await ai_cache.set(cache_key, text)
+    # CODEX: leaving the flight on disconnect cancels the upstream once no other teacher is following it
+    return stream_response(relay(http_request, "analytics", first_chunk, stream, persist), fmt, started, {"model": model})
@@ -1,8 +1,12 @@
 # CODEX: CRUD routes for analytics
-from fastapi import APIRouter, Depends
-from typing import List
+from fastapi import APIRouter, Depends, Query, Response
+from typing import List, Optional
+from datetime import datetime
 from sqlalchemy.orm import Session
 from app.database import get_db
+from app.pagination import Page, paginate, date_range
+from app.loaders import ANALYTICS_FIELDS
+from app.fieldsets import Projection
 from app.models import Analytics, UserRole
 from app.schemas import AnalyticsRead
 from app.routers.auth import get_current_active_user
@@ -10,10 +14,17 @@ from app.routers.auth import get_current_active_user
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
 @router.get("/", response_model=List[AnalyticsRead])
-def read_analytics(current_user=Depends(get_current_active_user), db: Session = Depends(get_db)):
-    if current_user.role == UserRole.admin:
-        return db.query(Analytics).all()
+def read_analytics(response: Response, page: Page = Depends(), fields: Projection = Depends(ANALYTICS_FIELDS), student_id: Optional[int] = None,
+                   since: Optional[datetime] = Query(None, description="Created at or after"),
+                   until: Optional[datetime] = Query(None, description="Created before"),
+                   current_user=Depends(get_current_active_user), db: Session = Depends(get_db)):
+    query = db.query(Analytics).options(*fields.options)
     if current_user.role == UserRole.teacher:
-        return db.query(Analytics).filter(Analytics.teacher_id == current_user.id).all()
-    # Student
-    return db.query(Analytics).filter(Analytics.student_id == current_user.id).all()
+        query = query.filter(Analytics.teacher_id == current_user.id)
+    elif current_user.role != UserRole.admin:
+        # Student
+        query = query.filter(Analytics.student_id == current_user.id)
+    if student_id is not None:
+        query = query.filter(Analytics.student_id == student_id)
+    query = date_range(query, Analytics.created_at, since, until)
+    return fields.render(paginate(query, page, response, Analytics.id), response)
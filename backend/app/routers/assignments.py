@@ -1,11 +1,16 @@
 # CODEX: CRUD routes for assignments
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from typing import List, Optional
+from datetime import datetime
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models import Assignment, Classroom, UserRole
+from app.authz import classroom_access, scope_to_classrooms
+from app.pagination import Page, paginate, date_range
 from app.schemas import AssignmentCreate, AssignmentRead
 from app.routers.auth import get_current_active_user, require_role
+from app.retrieval import classroom_retrieval
+from app.advisor import advisor_snapshots
 
 router = APIRouter(prefix="/assignments", tags=["assignments"])
 
@@ -18,26 +23,32 @@ def create_assignment(assignment_in: AssignmentCreate, current_teacher=Depends(r
     db.add(assignment)
     db.commit()
     db.refresh(assignment)
+    # CODEX: keep the tutor's classroom index current
+    classroom_retrieval.upsert(assignment.classroom_id, "assignment", assignment.id, assignment.title, assignment.description)
+    advisor_snapshots.invalidate_classroom(db, assignment.classroom_id)
     return assignment
 
 @router.get("/", response_model=List[AssignmentRead])
-def read_assignments(current_user=Depends(get_current_active_user), db: Session = Depends(get_db)):
-    if current_user.role == UserRole.admin:
-        return db.query(Assignment).all()
-    if current_user.role == UserRole.teacher:
-        return db.query(Assignment).join(Classroom).filter(Classroom.teacher_id == current_user.id).all()
-    # Student: assignments in their classrooms
-    assignments = []
-    for classroom in current_user.classrooms:
-        assignments.extend(classroom.assignments)
-    return assignments
+def read_assignments(response: Response, page: Page = Depends(),
+                     classroom_id: Optional[int] = None, subject_id: Optional[int] = None,
+                     since: Optional[datetime] = Query(None, description="Due at or after"),
+                     until: Optional[datetime] = Query(None, description="Due before"),
+                     current_user=Depends(get_current_active_user), db: Session = Depends(get_db)):
+    # teachers: their classrooms; students: enrolled classrooms; admins: everything
+    query = scope_to_classrooms(db.query(Assignment), Assignment.classroom_id, current_user)
+    if classroom_id is not None:
+        query = query.filter(Assignment.classroom_id == classroom_id)
+    if subject_id is not None:
+        query = query.filter(Assignment.subject_id == subject_id)
+    query = date_range(query, Assignment.due_date, since, until)
+    return paginate(query, page, response, Assignment.id)
 
 @router.get("/{assignment_id}", response_model=AssignmentRead)
 def read_assignment(assignment_id: int, current_user=Depends(get_current_active_user), db: Session = Depends(get_db)):
     assignment = db.get(Assignment, assignment_id)
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
-    if current_user.role == UserRole.admin or (current_user.role == UserRole.teacher and assignment.classroom.teacher_id == current_user.id) or (current_user.role == UserRole.student and assignment in [a for c in current_user.classrooms for a in c.assignments]):
+    if classroom_access.can_view(db, current_user, assignment.classroom_id):
         return assignment
     raise HTTPException(status_code=403, detail="Insufficient permissions")
 
@@ -51,6 +62,8 @@ def update_assignment(assignment_id: int, assignment_in: AssignmentCreate, curre
     assignment.due_date = assignment_in.due_date
     db.commit()
     db.refresh(assignment)
+    classroom_retrieval.upsert(assignment.classroom_id, "assignment", assignment.id, assignment.title, assignment.description)
+    advisor_snapshots.invalidate_classroom(db, assignment.classroom_id)
     return assignment
 
 @router.delete("/{assignment_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -60,3 +73,5 @@ def delete_assignment(assignment_id: int, current_teacher=Depends(require_role(U
         raise HTTPException(status_code=404 if not assignment else 403, detail="Not allowed")
     db.delete(assignment)
     db.commit()
+    classroom_retrieval.remove(assignment.classroom_id, "assignment", assignment_id)
+    advisor_snapshots.invalidate_classroom(db, assignment.classroom_id)
@@ -1,8 +1,10 @@
 # CODEX: CRUD routes for audit logs
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from typing import List, Optional
+from datetime import datetime
 from sqlalchemy.orm import Session
 from app.database import get_db
+from app.pagination import Page, paginate, date_range
 from app.models import AuditLog, UserRole
 from app.schemas import AuditLogRead
 from app.routers.auth import require_role
@@ -10,9 +12,17 @@ from app.routers.auth import require_role
 router = APIRouter(prefix="/audit_logs", tags=["audit_logs"])
 
 @router.get("/", response_model=List[AuditLogRead])
-def read_audit_logs(current_admin=Depends(require_role(UserRole.admin)), db: Session = Depends(get_db)):
-    """Admin-only: retrieve all audit logs"""
-    return db.query(AuditLog).order_by(AuditLog.timestamp.desc()).all()
+def read_audit_logs(response: Response, page: Page = Depends(), user_id: Optional[int] = None,
+                    since: Optional[datetime] = Query(None, description="Logged at or after"),
+                    until: Optional[datetime] = Query(None, description="Logged before"),
+                    current_admin=Depends(require_role(UserRole.admin)), db: Session = Depends(get_db)):
+    """Admin-only: retrieve audit logs, newest first"""
+    query = db.query(AuditLog)
+    if user_id is not None:
+        query = query.filter(AuditLog.user_id == user_id)
+    query = date_range(query, AuditLog.timestamp, since, until)
+    # CODEX: keyed on the id alone: timestamp is nullable, and ids grow in logging order
+    return paginate(query, page, response, AuditLog.id.desc())
 
 @router.get("/{log_id}", response_model=AuditLogRead)
 def read_audit_log(log_id: int, current_admin=Depends(require_role(UserRole.admin)), db: Session = Depends(get_db)):
@@ -1,14 +1,18 @@
 # CODEX: Authentication and authorization routes
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from datetime import datetime
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from jose import JWTError, jwt
 
 from app.database import get_db
 from app.models import User, UserRole
-from app.security import verify_password, create_access_token, create_refresh_token, get_password_hash
-from app.config import JWT_SECRET_KEY, JWT_ALGORITHM
+from app.security import create_access_token, create_refresh_token
+from app.passwords import password_hasher
+from app.config import JWT_SECRET_KEY, JWT_ALGORITHM, PRINCIPAL_TOKEN_CLAIMS
+from app.principals import principal_cache
 from app.schemas import UserRead
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -18,20 +22,24 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 class TokenRefresh(BaseModel):
     refresh_token: str
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+def get_token_claims(token: str = Depends(oauth2_scheme)) -> dict:
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    if payload.get("sub") is None:
+        raise credentials_exception
+    return payload
+
+def get_current_user(claims: dict = Depends(get_token_claims), db: Session = Depends(get_db)):
+    # CODEX: served from the principal cache; the database is only read on a miss
+    user = principal_cache.resolve(db, int(claims["sub"]))
     if user is None:
         raise credentials_exception
     return user
@@ -39,24 +47,42 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
 def get_current_active_user(current_user: User = Depends(get_current_user)):
     return current_user
 
+def access_token_for(user: User) -> str:
+    claims = {"sub": str(user.id)}
+    if PRINCIPAL_TOKEN_CLAIMS:
+        claims.update(role=user.role.value, iat=datetime.utcnow())
+    return create_access_token(claims)
+
 def require_role(role: UserRole):
-    def role_checker(user: User = Depends(get_current_active_user)):
+    def role_checker(claims: dict = Depends(get_token_claims), db: Session = Depends(get_db)):
+        # CODEX: with role claims in the token, authorize without resolving the user
+        user = principal_cache.from_claims(db, claims) if PRINCIPAL_TOKEN_CLAIMS else None
+        if user is None:
+            user = get_current_active_user(get_current_user(claims, db))
         if user.role != role:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions")
         return user
     return role_checker
 
 @router.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.password_hash):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    # CODEX: bcrypt runs on the hashing pool; database calls stay on the threadpool, off the event loop
+    user = await run_in_threadpool(lambda: db.query(User).filter(User.email == form_data.username).first())
+    valid, new_hash = await password_hasher.verify(form_data.password, user.password_hash) if user else (False, None)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token = create_access_token({"sub": str(user.id)})
+    access_token = access_token_for(user)
     refresh_token = create_refresh_token({"sub": str(user.id)})
+    if new_hash is not None:
+        # the stored hash used another work factor: upgrade it while we know the password
+        def upgrade():
+            user.password_hash = new_hash
+            db.commit()
+        await run_in_threadpool(upgrade)
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 @router.post("/refresh")
@@ -76,7 +102,7 @@ def refresh_token(data: TokenRefresh, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.id == int(user_id)).first()
     if not user:
         raise credentials_exception
-    access_token = create_access_token({"sub": str(user.id)})
+    access_token = access_token_for(user)
     return {"access_token": access_token, "token_type": "bearer"}
 
 # CODEX: Public registration endpoint
@@ -86,15 +112,18 @@ class RegisterModel(BaseModel):
     role: UserRole
 
 @router.post("/register", response_model=UserRead, status_code=status.HTTP_201_CREATED)
-def register(data: RegisterModel, db: Session = Depends(get_db)):
-    if db.query(User).filter(User.email == data.email).first():
+async def register(data: RegisterModel, db: Session = Depends(get_db)):
+    if await run_in_threadpool(lambda: db.query(User).filter(User.email == data.email).first()):
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already registered")
-    hashed = get_password_hash(data.password)
-    user = User(email=data.email, password_hash=hashed, role=data.role)
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-    return user
+    hashed = await password_hasher.hash(data.password)
+    def insert() -> UserRead:
+        user = User(email=data.email, password_hash=hashed, role=data.role)
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        # serialize here: reading the relationships is database I/O too
+        return UserRead.model_validate(user)
+    return await run_in_threadpool(insert)
 
 @router.get("/me", response_model=UserRead)
 def read_users_me(current_user: User = Depends(get_current_active_user)):
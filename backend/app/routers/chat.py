@@ -6,6 +6,7 @@ from app.database import get_db
 from app.routers.auth import require_role
 from app.models import ChatSession, ChatMessage, UserRole
 from app.schemas import ChatSessionRead, ChatMessageRead
+from app.chat_history import trim_sessions, MAX_MESSAGES_PER_SESSION, MAX_SESSIONS_PER_USER
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
@@ -13,20 +14,16 @@ router = APIRouter(prefix="/chat", tags=["chat"])
 def list_sessions(current_user=Depends(require_role(UserRole.student)), db: Session = Depends(get_db)):
     # get up to last 32 sessions
     sessions = db.query(ChatSession).filter_by(user_id=current_user.id)\
-        .order_by(ChatSession.created_at.desc()).limit(32).all()
+        .order_by(ChatSession.id.desc()).limit(MAX_SESSIONS_PER_USER).all()
     return sessions
 
 @router.post("/sessions", response_model=ChatSessionRead)
 def create_session(current_user=Depends(require_role(UserRole.student)), db: Session = Depends(get_db)):
-    # prune oldest if exceed 32
-    count = db.query(ChatSession).filter_by(user_id=current_user.id).count()
-    if count >= 32:
-        oldest = db.query(ChatSession).filter_by(user_id=current_user.id)\
-            .order_by(ChatSession.created_at.asc()).first()
-        db.delete(oldest)
-        db.commit()
     new = ChatSession(user_id=current_user.id)
     db.add(new)
+    db.flush()
+    # CODEX: keep the newest 32 sessions with one delete below the (user_id, id) watermark
+    trim_sessions(db, current_user.id)
     db.commit()
     db.refresh(new)
     return new
@@ -37,7 +34,7 @@ def get_messages(session_id: int, current_user=Depends(require_role(UserRole.stu
     if not session:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
     messages = db.query(ChatMessage).filter_by(session_id=session.id)\
-        .order_by(ChatMessage.created_at.asc()).limit(128).all()
+        .order_by(ChatMessage.seq.asc()).limit(MAX_MESSAGES_PER_SESSION).all()
     return messages
 
 @router.delete("/sessions/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
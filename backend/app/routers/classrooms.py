@@ -4,8 +4,13 @@ from typing import List
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models import Classroom, UserRole
+from app.authz import classroom_access, scope_to_classrooms
+from app.loaders import CLASSROOM_READ, CLASSROOM_FIELDS
+from app.fieldsets import Projection
 from app.schemas import ClassroomCreate, ClassroomRead, JoinModel
 from app.routers.auth import get_current_active_user, require_role
+from app.retrieval import classroom_retrieval
+from app.advisor import advisor_snapshots
 import uuid
 
 router = APIRouter(prefix="/classrooms", tags=["classrooms"])
@@ -21,20 +26,21 @@ def create_classroom(classroom_in: ClassroomCreate, current_teacher=Depends(requ
     return classroom
 
 @router.get("/", response_model=List[ClassroomRead])
-def read_classrooms(current_user=Depends(get_current_active_user), db: Session = Depends(get_db)):
-    if current_user.role == UserRole.admin:
-        return db.query(Classroom).all()
-    if current_user.role == UserRole.teacher:
-        return db.query(Classroom).filter(Classroom.teacher_id == current_user.id).all()
-    return current_user.classrooms
+def read_classrooms(fields: Projection = Depends(CLASSROOM_FIELDS), current_user=Depends(get_current_active_user), db: Session = Depends(get_db)):
+    query = scope_to_classrooms(db.query(Classroom).options(*fields.options), Classroom.id, current_user)
+    return fields.render(query.order_by(Classroom.id).all())
+
+def _reload(db: Session, classroom_id: int) -> Classroom:
+    # after a commit every attribute is expired; reload the roster in bulk instead of per student
+    return db.get(Classroom, classroom_id, options=CLASSROOM_READ, populate_existing=True)
 
 @router.get("/{classroom_id}", response_model=ClassroomRead)
-def read_classroom(classroom_id: int, current_user=Depends(get_current_active_user), db: Session = Depends(get_db)):
-    classroom = db.get(Classroom, classroom_id)
+def read_classroom(classroom_id: int, fields: Projection = Depends(CLASSROOM_FIELDS), current_user=Depends(get_current_active_user), db: Session = Depends(get_db)):
+    classroom = db.get(Classroom, classroom_id, options=fields.options)
     if not classroom:
         raise HTTPException(status_code=404, detail="Classroom not found")
-    if current_user.role == UserRole.admin or (current_user.role == UserRole.teacher and classroom.teacher_id == current_user.id) or (current_user.role == UserRole.student and current_user in classroom.students):
-        return classroom
+    if classroom_access.can_view(db, current_user, classroom_id):
+        return fields.render(classroom)
     raise HTTPException(status_code=403, detail="Insufficient permissions")
 
 @router.put("/{classroom_id}", response_model=ClassroomRead)
@@ -44,16 +50,20 @@ def update_classroom(classroom_id: int, classroom_in: ClassroomCreate, current_t
         raise HTTPException(status_code=404 if not classroom else 403, detail="Not allowed")
     classroom.name = classroom_in.name
     db.commit()
-    db.refresh(classroom)
-    return classroom
+    return _reload(db, classroom_id)
 
 @router.delete("/{classroom_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_classroom(classroom_id: int, current_teacher=Depends(require_role(UserRole.teacher)), db: Session = Depends(get_db)):
     classroom = db.get(Classroom, classroom_id)
     if not classroom or classroom.teacher_id != current_teacher.id:
         raise HTTPException(status_code=404 if not classroom else 403, detail="Not allowed")
+    # enrollments go with the classroom, so collect its students first and invalidate once it is gone
+    students = advisor_snapshots.enrolled_students(db, classroom_id)
     db.delete(classroom)
     db.commit()
+    advisor_snapshots.invalidate_students(students)
+    classroom_retrieval.drop(classroom_id)
+    classroom_access.invalidate_classroom(classroom_id)
 
 @router.post("/join", response_model=ClassroomRead)
 def join_classroom(join_in: JoinModel, current_student=Depends(require_role(UserRole.student)), db: Session = Depends(get_db)):
@@ -62,8 +72,9 @@ def join_classroom(join_in: JoinModel, current_student=Depends(require_role(User
     if not classroom:
         raise HTTPException(status_code=404, detail="Classroom not found")
     if current_student in classroom.students:
-        return classroom
+        return _reload(db, classroom.id)
     classroom.students.append(current_student)
     db.commit()
-    db.refresh(classroom)
-    return classroom
+    advisor_snapshots.invalidate_students([current_student.id])
+    classroom_access.invalidate_user(current_student.id)
+    return _reload(db, classroom.id)
@@ -1,11 +1,14 @@
 # CODEX: CRUD routes for grade management
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from typing import List, Optional
+from datetime import datetime
 from sqlalchemy.orm import Session
 from app.database import get_db
+from app.pagination import Page, paginate, date_range
 from app.models import Grade, Assignment, Classroom, UserRole
 from app.schemas import GradeCreate, GradeRead
 from app.routers.auth import get_current_active_user, require_role
+from app.advisor import advisor_snapshots
 
 router = APIRouter(prefix="/grades", tags=["grades"])
 
@@ -18,15 +21,30 @@ def create_grade(grade_in: GradeCreate, current_teacher=Depends(require_role(Use
     db.add(grade)
     db.commit()
     db.refresh(grade)
+    advisor_snapshots.invalidate_students([grade.student_id])
     return grade
 
 @router.get("/", response_model=List[GradeRead])
-def read_grades(current_user=Depends(get_current_active_user), db: Session = Depends(get_db)):
-    if current_user.role == UserRole.admin:
-        return db.query(Grade).all()
+def read_grades(response: Response, page: Page = Depends(),
+                classroom_id: Optional[int] = None, student_id: Optional[int] = None, assignment_id: Optional[int] = None,
+                since: Optional[datetime] = Query(None, description="Graded at or after"),
+                until: Optional[datetime] = Query(None, description="Graded before"),
+                current_user=Depends(get_current_active_user), db: Session = Depends(get_db)):
+    query = db.query(Grade)
     if current_user.role == UserRole.teacher:
-        return db.query(Grade).join(Assignment).join(Classroom).filter(Classroom.teacher_id == current_user.id).all()
-    return db.query(Grade).filter(Grade.student_id == current_user.id).all()
+        query = query.join(Assignment).join(Classroom).filter(Classroom.teacher_id == current_user.id)
+    elif current_user.role != UserRole.admin:
+        query = query.filter(Grade.student_id == current_user.id)
+    if classroom_id is not None:
+        if current_user.role != UserRole.teacher:
+            query = query.join(Assignment)
+        query = query.filter(Assignment.classroom_id == classroom_id)
+    if student_id is not None:
+        query = query.filter(Grade.student_id == student_id)
+    if assignment_id is not None:
+        query = query.filter(Grade.assignment_id == assignment_id)
+    query = date_range(query, Grade.created_at, since, until)
+    return paginate(query, page, response, Grade.id)
 
 @router.get("/{grade_id}", response_model=GradeRead)
 def read_grade(grade_id: int, current_user=Depends(get_current_active_user), db: Session = Depends(get_db)):
@@ -45,6 +63,7 @@ def update_grade(grade_id: int, grade_in: GradeCreate, current_teacher=Depends(r
     grade.score = grade_in.score
     db.commit()
     db.refresh(grade)
+    advisor_snapshots.invalidate_students([grade.student_id])
     return grade
 
 @router.delete("/{grade_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -52,5 +71,7 @@ def delete_grade(grade_id: int, current_teacher=Depends(require_role(UserRole.te
     grade = db.get(Grade, grade_id)
     if not grade or grade.assignment.classroom.teacher_id != current_teacher.id:
         raise HTTPException(status_code=404 if not grade else 403, detail="Not allowed")
+    student_id = grade.student_id
     db.delete(grade)
     db.commit()
+    advisor_snapshots.invalidate_students([student_id])
@@ -0,0 +1,91 @@
+# CODEX: Batch lesson-generation job endpoints (submit, progress, results)
+import asyncio
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.config import OLLAMA_MODEL, OLLAMA_STYLE, OLLAMA_PRE_PROMPT, LESSON_JOB_MAX_PROMPTS, LESSON_JOB_PROGRESS_INTERVAL
+from app.database import get_db
+from app.jobs import lesson_jobs
+from app.models import JobStatus, LessonJob, LessonJobItem, UserRole
+from app.schemas import LessonJobCreate, LessonJobRead, LessonJobResults
+from app.pagination import Page, paginate
+from app.streaming import format_frame
+from app.routers.auth import require_role
+
+router = APIRouter(prefix="/ai/lesson-jobs", tags=["ai"])
+
+_FINISHED = (JobStatus.completed, JobStatus.failed)
+
+def _own_job(db: Session, job_id: int, teacher_id: int) -> LessonJob:
+    job = db.query(LessonJob).filter_by(id=job_id, teacher_id=teacher_id).first()
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
+
+@router.post("/", response_model=LessonJobRead, status_code=status.HTTP_202_ACCEPTED)
+async def create_lesson_job(job_in: LessonJobCreate, current_teacher=Depends(require_role(UserRole.teacher)), db: Session = Depends(get_db)):
+    """Queue one lesson draft per prompt and return immediately; poll or stream progress by job id"""
+    if len(job_in.prompts) > LESSON_JOB_MAX_PROMPTS:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"At most {LESSON_JOB_MAX_PROMPTS} prompts per job")
+    teacher_id = current_teacher.id
+    def insert():
+        job = LessonJob(
+            teacher_id=teacher_id,
+            model=job_in.model or OLLAMA_MODEL,
+            style=job_in.style or OLLAMA_STYLE,
+            pre_prompt=job_in.pre_prompt or OLLAMA_PRE_PROMPT,
+            total=len(job_in.prompts),
+            items=[LessonJobItem(position=i, prompt=prompt) for i, prompt in enumerate(job_in.prompts)],
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return LessonJobRead.model_validate(job), [item.id for item in job.items]
+    created, item_ids = await run_in_threadpool(insert)
+    # CODEX: the runner's asyncio.Queue is only touched from the event loop, so idle workers wake up
+    lesson_jobs.enqueue(item_ids)
+    return created
+
+@router.get("/", response_model=List[LessonJobRead])
+def read_lesson_jobs(response: Response, page: Page = Depends(), current_teacher=Depends(require_role(UserRole.teacher)), db: Session = Depends(get_db)):
+    return paginate(db.query(LessonJob).filter_by(teacher_id=current_teacher.id), page, response, LessonJob.id.desc())
+
+@router.get("/{job_id}", response_model=LessonJobRead)
+def read_lesson_job(job_id: int, current_teacher=Depends(require_role(UserRole.teacher)), db: Session = Depends(get_db)):
+    return _own_job(db, job_id, current_teacher.id)
+
+@router.get("/{job_id}/results", response_model=LessonJobResults)
+def read_lesson_job_results(job_id: int, current_teacher=Depends(require_role(UserRole.teacher)), db: Session = Depends(get_db)):
+    """Job status plus every item; items still in progress have no result yet"""
+    return _own_job(db, job_id, current_teacher.id)
+
+@router.get("/{job_id}/events")
+async def stream_lesson_job(job_id: int, current_teacher=Depends(require_role(UserRole.teacher)), db: Session = Depends(get_db)):
+    """Server-sent "progress" events as items finish, then one "done" event"""
+    _own_job(db, job_id, current_teacher.id)
+    session_factory = lesson_jobs.session_factory
+    def load() -> dict:
+        session = session_factory()
+        try:
+            return LessonJobRead.model_validate(session.get(LessonJob, job_id)).model_dump(mode="json")
+        finally:
+            session.close()
+    async def events():
+        event_id = 0
+        last: Optional[dict] = None
+        while True:
+            snapshot = await asyncio.to_thread(load)
+            finished = snapshot["status"] in {s.value for s in _FINISHED}
+            if snapshot != last or finished:
+                event_id += 1
+                yield format_frame("sse", event_id, "done" if finished else "progress", snapshot)
+                last = snapshot
+            if finished:
+                return
+            # CODEX: wake up on in-process progress, re-check the DB periodically for other workers
+            await lesson_jobs.wait(job_id, LESSON_JOB_PROGRESS_INTERVAL)
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -1,13 +1,17 @@
 # CODEX: Lesson scheduling endpoints
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from typing import List, Optional
 from sqlalchemy.orm import Session
 from datetime import date
 
 from app.database import get_db
 from app.models import Lesson, Classroom, UserRole
+from app.authz import classroom_access, scope_to_classrooms
+from app.pagination import Page, paginate, date_range
 from app.schemas import LessonCreate, LessonRead
 from app.routers.auth import get_current_active_user, require_role
+from app.retrieval import classroom_retrieval
+from app.advisor import advisor_snapshots
 
 router = APIRouter(prefix="/lessons", tags=["lessons"]);
 
@@ -20,28 +24,30 @@ def create_lesson(lesson_in: LessonCreate, current_teacher=Depends(require_role(
     db.add(lesson)
     db.commit()
     db.refresh(lesson)
+    # CODEX: keep the tutor's classroom index current
+    classroom_retrieval.upsert(lesson.classroom_id, "lesson", lesson.id, lesson.title, lesson.description)
+    advisor_snapshots.invalidate_classroom(db, lesson.classroom_id)
     return lesson
 
 @router.get("/", response_model=List[LessonRead])
-def read_lessons(current_user=Depends(get_current_active_user), db: Session = Depends(get_db)):
-    if current_user.role == UserRole.admin:
-        return db.query(Lesson).all()
-    if current_user.role == UserRole.teacher:
-        return db.query(Lesson).join(Classroom).filter(Classroom.teacher_id == current_user.id).all()
-    # student: lessons in enrolled classrooms
-    lessons = []
-    for c in current_user.classrooms:
-        lessons.extend(c.lessons)
-    return lessons
+def read_lessons(response: Response, page: Page = Depends(), classroom_id: Optional[int] = None,
+                 since: Optional[date] = Query(None, description="Scheduled on or after"),
+                 until: Optional[date] = Query(None, description="Scheduled before"),
+                 current_user=Depends(get_current_active_user), db: Session = Depends(get_db)):
+    # teachers: their classrooms; students: enrolled classrooms; admins: everything
+    query = scope_to_classrooms(db.query(Lesson), Lesson.classroom_id, current_user)
+    if classroom_id is not None:
+        query = query.filter(Lesson.classroom_id == classroom_id)
+    query = date_range(query, Lesson.scheduled_date, since, until)
+    # calendar order: by date, with the id breaking ties between lessons on the same day
+    return paginate(query, page, response, Lesson.scheduled_date, Lesson.id)
 
 @router.get("/{lesson_id}", response_model=LessonRead)
 def read_lesson(lesson_id: int, current_user=Depends(get_current_active_user), db: Session = Depends(get_db)):
     lesson = db.get(Lesson, lesson_id)
     if not lesson:
         raise HTTPException(status_code=404, detail="Lesson not found")
-    if current_user.role == UserRole.admin or \
-       (current_user.role == UserRole.teacher and lesson.classroom.teacher_id == current_user.id) or \
-       (current_user.role == UserRole.student and lesson.classroom in current_user.classrooms):
+    if classroom_access.can_view(db, current_user, lesson.classroom_id):
         return lesson
     raise HTTPException(status_code=403, detail="Insufficient permissions")
 
@@ -55,6 +61,8 @@ def update_lesson(lesson_id: int, lesson_in: LessonCreate, current_teacher=Depen
     lesson.scheduled_date = lesson_in.scheduled_date
     db.commit()
     db.refresh(lesson)
+    classroom_retrieval.upsert(lesson.classroom_id, "lesson", lesson.id, lesson.title, lesson.description)
+    advisor_snapshots.invalidate_classroom(db, lesson.classroom_id)
     return lesson
 
 @router.delete("/{lesson_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -64,3 +72,5 @@ def delete_lesson(lesson_id: int, current_teacher=Depends(require_role(UserRole.
         raise HTTPException(status_code=404 if not lesson else 403, detail="Not allowed")
     db.delete(lesson)
     db.commit()
+    classroom_retrieval.remove(lesson.classroom_id, "lesson", lesson_id)
+    advisor_snapshots.invalidate_classroom(db, lesson.classroom_id)
@@ -0,0 +1,92 @@
+# CODEX: Admin-only runtime metrics for performance monitoring
+from fastapi import APIRouter, Depends
+
+from app.admission import ollama_admission
+from app.advisor import advisor_snapshots
+from app.authz import classroom_access
+from app.cache import ai_cache
+from app.compression import compression_stats
+from app.config import DATABASE_PROFILE
+from app.database import pool_stats
+from app.jobs import lesson_jobs
+from app.retrieval import classroom_retrieval
+from app.models import UserRole
+from app.ollama_pool import ollama_pool, ollama_backends
+from app.passwords import password_hasher
+from app.principals import principal_cache
+from app.routers.auth import require_role
+from app.singleflight import generation_flights
+from app.streaming import generation_stats
+from app.write_behind import write_behind
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+@router.get("/ollama")
+def ollama_metrics(current_admin=Depends(require_role(UserRole.admin))):
+    """Admin-only: connection pool usage per endpoint and backend routing/health state"""
+    return {**ollama_pool.stats(), "backends": ollama_backends.stats()}
+
+@router.get("/ai-cache")
+def ai_cache_metrics(current_admin=Depends(require_role(UserRole.admin))):
+    """Admin-only: hit/miss/eviction counters for the AI response cache"""
+    return ai_cache.stats()
+
+@router.get("/ai-flights")
+def ai_flight_metrics(current_admin=Depends(require_role(UserRole.admin))):
+    """Admin-only: how many identical AI generations were coalesced onto one upstream stream"""
+    return generation_flights.stats()
+
+@router.get("/admission")
+def admission_metrics(current_admin=Depends(require_role(UserRole.admin))):
+    """Admin-only: Ollama admission queue depth, rejections and wait times"""
+    return ollama_admission.stats()
+
+@router.get("/write-behind")
+def write_behind_metrics(current_admin=Depends(require_role(UserRole.admin))):
+    """Admin-only: pending and flushed rows of the post-stream write-behind queue"""
+    return write_behind.stats()
+
+@router.get("/ai-generations")
+def ai_generation_metrics(current_admin=Depends(require_role(UserRole.admin))):
+    """Admin-only: AI generations abandoned by disconnecting clients and the tokens that saved"""
+    return generation_stats.stats()
+
+@router.get("/lesson-jobs")
+def lesson_job_metrics(current_admin=Depends(require_role(UserRole.admin))):
+    """Admin-only: batch lesson worker utilization, cache reuse and retries"""
+    return lesson_jobs.stats()
+
+@router.get("/retrieval")
+def retrieval_metrics(current_admin=Depends(require_role(UserRole.admin))):
+    """Admin-only: size of the in-memory classroom retrieval indexes used to ground the tutor"""
+    return classroom_retrieval.stats()
+
+@router.get("/compression")
+def compression_metrics(current_admin=Depends(require_role(UserRole.admin))):
+    """Admin-only: response bytes before and after compression per route"""
+    return compression_stats.stats()
+
+@router.get("/db")
+def db_metrics(current_admin=Depends(require_role(UserRole.admin))):
+    """Admin-only: engine profile and connection pool checkouts, wait times, overflow and timeouts"""
+    return {"profile": DATABASE_PROFILE, **pool_stats.stats()}
+
+@router.get("/advisor")
+def advisor_metrics(current_admin=Depends(require_role(UserRole.admin))):
+    """Admin-only: advisor snapshot cache hits, recomputations and invalidations"""
+    return advisor_snapshots.stats()
+
+@router.get("/authz")
+def authz_metrics(current_admin=Depends(require_role(UserRole.admin))):
+    """Admin-only: classroom membership checks and how many needed a database query"""
+    return classroom_access.stats()
+
+@router.get("/principals")
+def principal_metrics(current_admin=Depends(require_role(UserRole.admin))):
+    """Admin-only: principal cache hits, database loads and requests authorized from token claims"""
+    return principal_cache.stats()
+
+@router.get("/password-hashing")
+def password_hashing_metrics(current_admin=Depends(require_role(UserRole.admin))):
+    """Admin-only: bcrypt pool queue depth, wait and hash times, rejections and rehashes"""
+    return password_hasher.stats()
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from app.database import get_db
+from app.principals import principal_cache
 from app.routers.auth import get_current_active_user
 from app.schemas import PreferencesRead, PreferencesUpdate
 
@@ -19,5 +20,6 @@ def update_user_preferences(prefs: PreferencesUpdate, current_user = Depends(get
     if prefs.language is not None:
         current_user.language = prefs.language
     db.commit()
+    principal_cache.invalidate(current_user.id)
     db.refresh(current_user)
     return {"theme": current_user.theme, "language": current_user.language}
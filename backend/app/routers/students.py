@@ -1,23 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Response
+from typing import List, Optional
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.models import User, UserRole
+from app.models import User, UserRole, classroom_students
+from app.authz import visible_classrooms
+from app.pagination import Page, paginate
+from app.loaders import USER_FIELDS
+from app.fieldsets import Projection
 from app.routers.auth import get_current_active_user
 from app.schemas import UserRead
 
 router = APIRouter(prefix="/students", tags=["students"])
 
 @router.get("/", response_model=List[UserRead])
-def read_students(current_user=Depends(get_current_active_user), db: Session = Depends(get_db)):
-    if current_user.role == UserRole.teacher:
-        # collect students from teacher's classrooms
-        students = []
-        for classroom in current_user.taught_classrooms:
-            students.extend(classroom.students)
-        # remove duplicates
-        unique_students = {student.id: student for student in students}.values()
-        return list(unique_students)
-    if current_user.role == UserRole.admin:
-        return db.query(User).filter(User.role == UserRole.student).all()
-    raise HTTPException(status_code=403, detail="Insufficient permissions")
+def read_students(response: Response, page: Page = Depends(), fields: Projection = Depends(USER_FIELDS), classroom_id: Optional[int] = None,
+                  current_user=Depends(get_current_active_user), db: Session = Depends(get_db)):
+    if current_user.role not in (UserRole.teacher, UserRole.admin):
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    query = db.query(User).options(*fields.options).filter(User.role == UserRole.student)
+    # semi-joins driven from the enrollment index: students of any of the teacher's classrooms, each once
+    enrolled = select(classroom_students.c.student_id)
+    scope = visible_classrooms(current_user)
+    if scope is not None:
+        query = query.filter(User.id.in_(enrolled.where(classroom_students.c.classroom_id.in_(scope))))
+    if classroom_id is not None:
+        query = query.filter(User.id.in_(enrolled.where(classroom_students.c.classroom_id == classroom_id)))
+    return fields.render(paginate(query, page, response, User.id), response)
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from typing import List, Optional
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models import Subject, Classroom, UserRole
+from app.authz import classroom_access, scope_to_classrooms
+from app.pagination import Page, paginate
 from app.schemas import SubjectCreate, SubjectRead
 from app.routers.auth import get_current_active_user, require_role
 
@@ -20,22 +22,19 @@ def create_subject(subject_in: SubjectCreate, current_teacher=Depends(require_ro
     return subject
 
 @router.get("/", response_model=List[SubjectRead])
-def read_subjects(current_user=Depends(get_current_active_user), db: Session = Depends(get_db)):
-    if current_user.role == UserRole.admin:
-        return db.query(Subject).all()
-    if current_user.role == UserRole.teacher:
-        return db.query(Subject).join(Classroom).filter(Classroom.teacher_id == current_user.id).all()
-    subjects = []
-    for classroom in current_user.classrooms:
-        subjects.extend(classroom.subjects)
-    return subjects
+def read_subjects(response: Response, page: Page = Depends(), classroom_id: Optional[int] = None,
+                  current_user=Depends(get_current_active_user), db: Session = Depends(get_db)):
+    query = scope_to_classrooms(db.query(Subject), Subject.classroom_id, current_user)
+    if classroom_id is not None:
+        query = query.filter(Subject.classroom_id == classroom_id)
+    return paginate(query, page, response, Subject.id)
 
 @router.get("/{subject_id}", response_model=SubjectRead)
 def read_subject(subject_id: int, current_user=Depends(get_current_active_user), db: Session = Depends(get_db)):
     subject = db.get(Subject, subject_id)
     if not subject:
         raise HTTPException(status_code=404, detail="Subject not found")
-    if current_user.role == UserRole.admin or (current_user.role == UserRole.teacher and subject.classroom.teacher_id == current_user.id) or (current_user.role == UserRole.student and subject in subject.classroom.students):
+    if classroom_access.can_view(db, current_user, subject.classroom_id):
         return subject
     raise HTTPException(status_code=403, detail="Insufficient permissions")
 
@@ -1,8 +1,8 @@
 # CODEX: Pydantic schemas for FeverDucation
 from datetime import datetime, date
 from typing import List, Optional
-from pydantic import BaseModel, ConfigDict
-from app.models import UserRole
+from pydantic import BaseModel, ConfigDict, Field
+from app.models import UserRole, JobStatus
 
 # User schemas
 class UserBase(BaseModel):
@@ -157,6 +157,7 @@ class ChatMessageRead(BaseModel):
     session_id: int
     sender: str
     text: str
+    truncated: bool = False
     created_at: datetime
     model_config = ConfigDict(from_attributes=True)
 
@@ -166,3 +167,33 @@ class ChatSessionRead(BaseModel):
     created_at: datetime
     messages: list[ChatMessageRead] = []
     model_config = ConfigDict(from_attributes=True)
+
+# Batch lesson job schemas
+class LessonJobCreate(BaseModel):
+    prompts: List[str] = Field(..., min_length=1)
+    model: Optional[str] = None
+    style: Optional[str] = None
+    pre_prompt: Optional[str] = None
+
+class LessonJobRead(BaseModel):
+    id: int
+    status: JobStatus
+    model: str
+    total: int
+    completed: int
+    failed: int
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    model_config = ConfigDict(from_attributes=True, protected_namespaces=())
+
+class LessonJobItemRead(BaseModel):
+    position: int
+    prompt: str
+    status: JobStatus
+    result: Optional[str] = None
+    error: Optional[str] = None
+    cached: bool = False
+    model_config = ConfigDict(from_attributes=True)
+
+class LessonJobResults(LessonJobRead):
+    items: List[LessonJobItemRead] = []
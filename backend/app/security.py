@@ -1,11 +1,18 @@
 # CODEX: Security utilities for password hashing and JWT operations
 from datetime import datetime, timedelta
-from typing import Optional
+from functools import lru_cache
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from app.config import JWT_SECRET_KEY, JWT_ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_MINUTES
+from app.config import JWT_SECRET_KEY, JWT_ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_MINUTES, PASSWORD_HASH_ROUNDS
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+@lru_cache(maxsize=None)
+def crypt_context(rounds: int) -> CryptContext:
+    # CODEX: pinning min and max rounds to the target makes needs_update() flag hashes of any other cost
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__default_rounds=rounds,
+                        bcrypt__min_rounds=rounds, bcrypt__max_rounds=rounds)
+
+pwd_context = crypt_context(PASSWORD_HASH_ROUNDS)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -13,6 +20,14 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+# CODEX: picklable entry points for the hashing process pool (see app.passwords)
+def hash_with_rounds(password: str, rounds: int) -> str:
+    return crypt_context(rounds).hash(password)
+
+def verify_and_update(password: str, hashed: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    """(matches, new hash at the configured cost or None if the stored one is current)"""
+    return crypt_context(rounds).verify_and_update(password, hashed)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
@@ -0,0 +1,93 @@
+# CODEX: Coalesce identical in-flight AI generations onto one upstream stream
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+
+class _Flight:
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.event = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def notify(self):
+        event, self.event = self.event, asyncio.Event()
+        event.set()
+
+
+class SingleFlight:
+    """Runs one upstream generator per key and fans its chunks out to every concurrent subscriber.
+
+    Late subscribers first replay the chunks already produced, then follow the live stream.
+    The upstream task is cancelled once its last subscriber goes away.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.started = 0
+        self.coalesced = 0
+        self.cancelled = 0
+
+    def stream(self, key: str, factory: Callable[[], AsyncIterator[str]],
+               on_complete: Optional[Callable[[str], Awaitable[None]]] = None) -> AsyncIterator[str]:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(self._run(key, flight, factory, on_complete))
+            self.started += 1
+        else:
+            self.coalesced += 1
+        flight.subscribers += 1
+        return self._subscribe(key, flight)
+
+    async def _run(self, key: str, flight: _Flight, factory, on_complete):
+        try:
+            async for chunk in factory():
+                flight.chunks.append(chunk)
+                flight.notify()
+            if on_complete is not None:
+                await on_complete("".join(flight.chunks))
+        except asyncio.CancelledError as exc:
+            flight.error = exc
+            raise
+        except Exception as exc:
+            flight.error = exc
+        finally:
+            flight.done = True
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            flight.notify()
+
+    async def _subscribe(self, key: str, flight: _Flight):
+        index = 0
+        try:
+            while True:
+                while index < len(flight.chunks):
+                    yield flight.chunks[index]
+                    index += 1
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                await flight.event.wait()
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # nobody is listening any more: stop generating
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+                self.cancelled += 1
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._flights), "started": self.started,
+                "coalesced": self.coalesced, "cancelled": self.cancelled}
+
+
+generation_flights = SingleFlight()
@@ -0,0 +1,197 @@
+# CODEX: Relay AI token streams to the client, framed as text, SSE or NDJSON, and stop on disconnect
+import json
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+import anyio
+from starlette.requests import Request
+from starlette.responses import StreamingResponse
+
+from app.config import STREAM_COALESCE_MAX_CHARS, STREAM_COALESCE_MAX_DELAY
+from app.tutor_context import estimate_tokens
+
+# CODEX: output modes of the AI routes; plain text stays the default for existing clients
+STREAM_FORMATS = {"text": "text/plain", "sse": "text/event-stream", "ndjson": "application/x-ndjson"}
+
+
+class GenerationStats:
+    """Counts completed and abandoned generations per route.
+
+    Tokens saved by a cancellation are estimated as the route's typical completed length
+    (an exponentially weighted moving average) minus the tokens already produced.
+    """
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self._routes: Dict[str, dict] = {}
+
+    def _route(self, route: str) -> dict:
+        return self._routes.setdefault(route, {"completed": 0, "cancelled": 0, "tokens_streamed": 0,
+                                               "tokens_saved": 0, "avg_tokens": 0.0})
+
+    def completed(self, route: str, text: str):
+        entry = self._route(route)
+        tokens = estimate_tokens(text)
+        entry["completed"] += 1
+        entry["tokens_streamed"] += tokens
+        if entry["completed"] == 1:
+            entry["avg_tokens"] = float(tokens)
+        else:
+            entry["avg_tokens"] += self.alpha * (tokens - entry["avg_tokens"])
+
+    def cancelled(self, route: str, text: str):
+        entry = self._route(route)
+        tokens = estimate_tokens(text)
+        entry["cancelled"] += 1
+        entry["tokens_streamed"] += tokens
+        entry["tokens_saved"] += max(0, round(entry["avg_tokens"]) - tokens)
+
+    def stats(self) -> dict:
+        routes = {name: {**entry, "avg_tokens": round(entry["avg_tokens"], 1)} for name, entry in self._routes.items()}
+        return {
+            "cancelled": sum(e["cancelled"] for e in self._routes.values()),
+            "tokens_saved": sum(e["tokens_saved"] for e in self._routes.values()),
+            "routes": routes,
+        }
+
+
+async def relay(request: Request, route: str, first_chunk: str, stream: AsyncIterator[str],
+                on_finish: Callable[[str, bool], Awaitable[None]]) -> AsyncIterator[str]:
+    """Yield first_chunk and the rest of stream until it ends or the client disconnects.
+
+    A disconnect is noticed at the next upstream token at the latest (servers that cancel the
+    response task on disconnect abort it immediately); the upstream generator is then closed,
+    which aborts the Ollama request and releases its admission slot. on_finish(text, truncated) always runs exactly once with
+    whatever was produced, so partial answers can still be persisted.
+    """
+    parts = [first_chunk]
+    outcome = "cancelled"
+    try:
+        yield first_chunk
+        async for chunk in stream:
+            # CODEX: a non-blocking poll; a second task reading request.receive() would race the response's own listener
+            if await request.is_disconnected():
+                break
+            parts.append(chunk)
+            yield chunk
+        else:
+            outcome = "completed"
+    except Exception:
+        outcome = "failed"
+        raise
+    finally:
+        # also runs when the response task itself is cancelled; shield the cleanup from that
+        with anyio.CancelScope(shield=True):
+            await stream.aclose()
+            text = "".join(parts)
+            if outcome == "completed":
+                generation_stats.completed(route, text)
+            elif outcome == "cancelled":
+                generation_stats.cancelled(route, text)
+            await on_finish(text, outcome != "completed")
+
+
+def negotiate_format(accept: Optional[str], requested: Optional[str] = None) -> str:
+    """Pick the output mode from ?format= or, failing that, the Accept header."""
+    if requested in STREAM_FORMATS:
+        return requested
+    if accept:
+        if "text/event-stream" in accept:
+            return "sse"
+        if "application/x-ndjson" in accept:
+            return "ndjson"
+    return "text"
+
+
+async def coalesce(chunks: AsyncIterator[str], max_chars: int = STREAM_COALESCE_MAX_CHARS,
+                   max_delay: float = STREAM_COALESCE_MAX_DELAY,
+                   clock: Callable[[], float] = time.monotonic) -> AsyncIterator[List[str]]:
+    """Group upstream deltas into batches of at least max_chars or max_delay seconds.
+
+    The first delta is passed through alone to keep time-to-first-token unchanged. The window
+    is checked as deltas arrive, so a batch is never held back longer than one inter-token gap.
+    """
+    batch: List[str] = []
+    size = 0
+    opened = 0.0
+    first = True
+    try:
+        async for chunk in chunks:
+            if not batch:
+                opened = clock()
+            batch.append(chunk)
+            size += len(chunk)
+            if first or size >= max_chars or clock() - opened >= max_delay:
+                yield batch
+                batch, size, first = [], 0, False
+        if batch:
+            yield batch
+    finally:
+        await chunks.aclose()
+
+
+def format_frame(fmt: str, event_id: int, event: str, payload: dict) -> str:
+    if fmt == "sse":
+        return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+    return json.dumps({"id": event_id, "event": event, **payload}, ensure_ascii=False) + "\n"
+
+
+async def encode_frames(chunks: AsyncIterator[str], fmt: str, started: float, meta: Optional[dict] = None,
+                        clock: Callable[[], float] = time.perf_counter, **window) -> AsyncIterator[str]:
+    """Frame a chunk stream as SSE or NDJSON: numbered "delta" events, then one "done" event.
+
+    The done event carries token counts and timings (ms since `started`) plus any meta fields.
+    """
+    event_id = deltas = chars = 0
+    first_at = None
+    batches = coalesce(chunks, **window)
+    try:
+        async for batch in batches:
+            if first_at is None:
+                first_at = clock()
+            text = "".join(batch)
+            deltas += len(batch)
+            chars += len(text)
+            event_id += 1
+            yield format_frame(fmt, event_id, "delta", {"text": text})
+    finally:
+        await batches.aclose()
+    finished = clock()
+    summary = {
+        # Ollama emits one token per delta
+        "completion_tokens": deltas,
+        "chars": chars,
+        "frames": event_id,
+        "ttft_ms": round(((first_at or finished) - started) * 1000, 1),
+        "duration_ms": round((finished - started) * 1000, 1),
+        **(meta or {}),
+    }
+    yield format_frame(fmt, event_id + 1, "done", summary)
+
+
+async def _single(text: str) -> AsyncIterator[str]:
+    yield text
+
+
+def stream_response(chunks: AsyncIterator[str], fmt: str, started: float, meta: Optional[dict] = None) -> StreamingResponse:
+    """StreamingResponse for an AI answer in the negotiated output mode."""
+    if fmt == "text":
+        return StreamingResponse(chunks, media_type=STREAM_FORMATS["text"])
+    # disable proxy buffering so frames reach the browser as they are produced
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(encode_frames(chunks, fmt, started, meta), media_type=STREAM_FORMATS[fmt], headers=headers)
+
+
+def text_response(text: str, fmt: str, started: float, meta: Optional[dict] = None) -> StreamingResponse:
+    """A complete answer (e.g. a cache hit) in the negotiated output mode."""
+    return stream_response(_single(text), fmt, started, meta)
+
+
+def error_response(message: str, fmt: str) -> StreamingResponse:
+    """Report a failed generation: the message as text, or a single "error" event."""
+    if fmt == "text":
+        return StreamingResponse(_single(message), media_type=STREAM_FORMATS["text"])
+    return StreamingResponse(_single(format_frame(fmt, 1, "error", {"message": message.strip()})), media_type=STREAM_FORMATS[fmt])
+
+
+generation_stats = GenerationStats()
@@ -0,0 +1,128 @@
+# CODEX: Token-budgeted tutor context with rolling per-session summaries
+import asyncio
+import logging
+from typing import AsyncIterator, Callable, List, Optional, Set, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.config import (
+    TUTOR_CONTEXT_TOKEN_BUDGET,
+    TUTOR_CONTEXT_MAX_MESSAGES,
+    TUTOR_SUMMARY_MAX_TOKENS,
+    TUTOR_SUMMARY_PROMPT,
+)
+from app.database import SessionLocal
+from app.models import ChatSession, ChatMessage
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Cheap tokenizer-free estimate (~4 characters per token for Latin-script text)."""
+    if not text:
+        return 0
+    return max(1, (len(text) + 3) // 4)
+
+
+def build_context(db: Session, session: ChatSession, prompt: str,
+                  token_budget: int = TUTOR_CONTEXT_TOKEN_BUDGET,
+                  max_messages: int = TUTOR_CONTEXT_MAX_MESSAGES) -> Tuple[List[dict], Optional[int]]:
+    """Fill the token budget newest-first from the unsummarized tail of a session.
+
+    Returns the history messages (oldest first, summary as a leading system message) and,
+    when older unsummarized turns did not fit, the seq up to which they should be folded
+    into the session summary.
+    """
+    budget = token_budget - estimate_tokens(prompt)
+    summary = session.summary
+    if summary:
+        budget -= estimate_tokens(summary)
+    rows = db.query(ChatMessage.seq, ChatMessage.sender, ChatMessage.text, ChatMessage.token_count)\
+        .filter(ChatMessage.session_id == session.id, ChatMessage.seq > session.summary_seq)\
+        .order_by(ChatMessage.seq.desc()).limit(max_messages + 1).all()
+    picked = []
+    fold_upto = None
+    for index, row in enumerate(rows):
+        if index >= max_messages or row.token_count > budget:
+            fold_upto = row.seq
+            break
+        budget -= row.token_count
+        picked.append(row)
+    history = [{"role": "system", "content": f"Summary of the earlier conversation: {summary}"}] if summary else []
+    history.extend({"role": row.sender, "content": row.text} for row in reversed(picked))
+    return history, fold_upto
+
+
+class SessionSummarizer:
+    """Folds turns that no longer fit the context budget into ChatSession.summary in the background."""
+
+    def __init__(self, session_factory: Callable = SessionLocal, max_tokens: int = TUTOR_SUMMARY_MAX_TOKENS,
+                 instructions: str = TUTOR_SUMMARY_PROMPT):
+        self.session_factory = session_factory
+        self.max_tokens = max_tokens
+        self.instructions = instructions
+        self._running: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.completed = 0
+        self.failures = 0
+
+    def schedule(self, session_id: int, upto_seq: int, generate: Callable[[str, str], AsyncIterator[str]]):
+        """Start a background refresh unless one is already running for this session."""
+        if session_id in self._running:
+            return
+        self._running.add(session_id)
+        task = asyncio.create_task(self._summarize(session_id, upto_seq, generate))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _load(self, session_id: int, upto_seq: int):
+        db = self.session_factory()
+        try:
+            session = db.get(ChatSession, session_id)
+            if session is None or session.summary_seq >= upto_seq:
+                return None
+            messages = db.query(ChatMessage.sender, ChatMessage.text)\
+                .filter(ChatMessage.session_id == session_id,
+                        ChatMessage.seq > session.summary_seq, ChatMessage.seq <= upto_seq)\
+                .order_by(ChatMessage.seq.asc()).all()
+            return session.summary, messages
+        finally:
+            db.close()
+
+    def _store(self, session_id: int, upto_seq: int, summary: str):
+        db = self.session_factory()
+        try:
+            # only ever move the watermark forward
+            db.execute(update(ChatSession)
+                       .where(ChatSession.id == session_id, ChatSession.summary_seq < upto_seq)
+                       .values(summary=summary, summary_seq=upto_seq))
+            db.commit()
+        finally:
+            db.close()
+
+    async def _summarize(self, session_id: int, upto_seq: int, generate):
+        try:
+            loaded = await asyncio.to_thread(self._load, session_id, upto_seq)
+            if loaded is None:
+                return
+            previous, messages = loaded
+            transcript = "\n".join(f"{m.sender}: {m.text}" for m in messages)
+            prompt = f"Previous summary:\n{previous or '(none)'}\n\nNew messages:\n{transcript}"
+            summary = "".join([chunk async for chunk in generate(prompt, self.instructions)]).strip()
+            if summary:
+                await asyncio.to_thread(self._store, session_id, upto_seq, summary[:self.max_tokens * 4])
+                self.completed += 1
+        except Exception as exc:
+            self.failures += 1
+            logger.warning("Chat summary refresh for session %s failed: %s", session_id, exc)
+        finally:
+            self._running.discard(session_id)
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+session_summarizer = SessionSummarizer()
@@ -0,0 +1,127 @@
+# CODEX: Preload Ollama models at startup and keep them resident during school hours
+import asyncio
+import logging
+import re
+import time
+from datetime import datetime, time as dt_time
+from typing import Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from app.config import (
+    DEFAULT_TIMEZONE,
+    OLLAMA_WARMUP_MODELS,
+    OLLAMA_KEEP_ALIVE,
+    OLLAMA_WARMUP_INTERVAL,
+    OLLAMA_PRELOAD_TIMEOUT,
+    OLLAMA_SCHOOL_HOURS,
+)
+from app.ollama_pool import OllamaBackendPool, ollama_backends
+
+logger = logging.getLogger(__name__)
+
+_DAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+_UNITS = {"s": 1, "m": 60, "h": 3600}
+
+
+def keep_alive_seconds(keep_alive) -> Optional[float]:
+    """Seconds Ollama keeps a model loaded for a keep_alive value; None means forever."""
+    if isinstance(keep_alive, (int, float)):
+        return None if keep_alive < 0 else float(keep_alive)
+    match = re.fullmatch(r"\s*(-?\d+(?:\.\d+)?)\s*([smh]?)\s*", str(keep_alive))
+    if not match:
+        return 300.0  # Ollama's default
+    value = float(match.group(1))
+    return None if value < 0 else value * _UNITS[match.group(2) or "s"]
+
+
+class SchoolHours:
+    def __init__(self, days: List[str], start: str, end: str, timezone: str = DEFAULT_TIMEZONE):
+        self.days = {_DAYS.index(d.lower()[:3]) for d in days}
+        self.start = dt_time.fromisoformat(start)
+        self.end = dt_time.fromisoformat(end)
+        self.tz = ZoneInfo(timezone)
+
+    @classmethod
+    def from_config(cls, entry: dict):
+        return cls(entry.get("days", _DAYS[:5]), entry.get("start", "07:00"), entry.get("end", "17:00"),
+                   entry.get("timezone", DEFAULT_TIMEZONE))
+
+    def contains(self, moment: datetime) -> bool:
+        local = moment.astimezone(self.tz)
+        return local.weekday() in self.days and self.start <= local.time() < self.end
+
+
+class ModelWarmer:
+    """Loads the configured models on every backend that serves them and refreshes their keep-alive."""
+
+    def __init__(self, backends: OllamaBackendPool, models: List[str] = OLLAMA_WARMUP_MODELS,
+                 keep_alive=OLLAMA_KEEP_ALIVE, interval: float = OLLAMA_WARMUP_INTERVAL,
+                 preload_timeout: float = OLLAMA_PRELOAD_TIMEOUT,
+                 school_hours: Optional[SchoolHours] = None,
+                 clock: Callable[[], float] = time.monotonic, now: Callable[[], datetime] = None):
+        self.backends = backends
+        self.models = list(models)
+        self.keep_alive = keep_alive
+        self.interval = interval
+        self.preload_timeout = preload_timeout
+        self.school_hours = school_hours or SchoolHours.from_config(OLLAMA_SCHOOL_HOURS)
+        self._clock = clock
+        self._now = now or (lambda: datetime.now().astimezone())
+        self._warmed_at: Dict[Tuple[str, str], float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def warm(self, backend, model: str) -> bool:
+        client = self.backends.clients.client(backend.host, backend.port)
+        try:
+            # an empty generate request loads the model and resets its keep-alive timer
+            resp = await client.post("/api/generate", json={"model": model, "keep_alive": self.keep_alive},
+                                     timeout=self.preload_timeout)
+            resp.raise_for_status()
+        except Exception as exc:
+            logger.warning("Warming %s on %s failed: %s", model, backend.name, exc)
+            self._warmed_at.pop((backend.name, model), None)
+            return False
+        self._warmed_at[(backend.name, model)] = self._clock()
+        return True
+
+    async def warm_all(self):
+        jobs = [self.warm(b, m) for b in self.backends.backends for m in self.models if b.serves(m)]
+        await asyncio.gather(*jobs)
+
+    def is_warm(self, backend_name: str, model: str) -> bool:
+        warmed_at = self._warmed_at.get((backend_name, model))
+        if warmed_at is None:
+            return False
+        lifetime = keep_alive_seconds(self.keep_alive)
+        return lifetime is None or self._clock() - warmed_at < lifetime
+
+    def status(self) -> Dict[str, List[str]]:
+        """Backends each configured model is currently believed to be resident on."""
+        return {m: [b.name for b in self.backends.backends if self.is_warm(b.name, m)] for m in self.models}
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if self.school_hours.contains(self._now()):
+                await self.warm_all()
+
+    async def start(self):
+        try:
+            await asyncio.wait_for(self.warm_all(), timeout=self.preload_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Model preload did not finish within %ss", self.preload_timeout)
+        logger.info("Warm Ollama models: %s", self.status())
+        if self._task is None and self.interval:
+            self._task = asyncio.create_task(self._loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+model_warmer = ModelWarmer(ollama_backends)
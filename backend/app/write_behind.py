@@ -0,0 +1,152 @@
+# CODEX: Write-behind queue that batches post-stream inserts into a few transactions
+import asyncio
+import logging
+import time
+from typing import Callable, List, Optional
+
+from sqlalchemy import inspect
+
+from app.config import WRITE_BEHIND_MAX_BATCH, WRITE_BEHIND_FLUSH_INTERVAL, WRITE_BEHIND_MAX_PENDING
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """Collects new ORM rows from many streams and persists them off the event loop.
+
+    A batch is flushed when it reaches max_batch rows or flush_interval seconds after its
+    first row, whichever comes first, in one transaction on a worker thread. Flush hooks run
+    inside that transaction (e.g. to cap chat history for the sessions touched by the batch).
+    If the batch fails, its rows are retried one per transaction so that a bad row only
+    loses itself.
+    """
+
+    def __init__(self, session_factory: Callable = SessionLocal, max_batch: int = WRITE_BEHIND_MAX_BATCH,
+                 flush_interval: float = WRITE_BEHIND_FLUSH_INTERVAL, max_pending: int = WRITE_BEHIND_MAX_PENDING):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._hooks: List[Callable] = []
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.enqueued = 0
+        self.flushed_rows = 0
+        self.batches = 0
+        self.dropped_rows = 0
+        self.inline_writes = 0
+
+    def add_flush_hook(self, hook: Callable):
+        """Register hook(db, rows), called after the batch is added to the session and before it is flushed."""
+        self._hooks.append(hook)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if not self.running:
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._task = asyncio.create_task(self._run())
+
+    async def submit(self, *rows):
+        self.enqueued += len(rows)
+        if self.running:
+            # all or nothing: a partly queued submit would have its queued rows written twice
+            if self.max_pending <= 0 or self.max_pending - self._queue.qsize() >= len(rows):
+                for row in rows:
+                    self._queue.put_nowait(row)
+                return
+            logger.warning("Write-behind queue full, writing %d rows inline", len(rows))
+        # not started (scripts, tests) or saturated: write straight away, still off the event loop
+        self.inline_writes += 1
+        await asyncio.to_thread(self._write, list(rows))
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            row = await self._queue.get()
+            if row is _STOP:
+                break
+            batch = [row]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is _STOP:
+                    stopping = True
+                    break
+                batch.append(row)
+            await asyncio.to_thread(self._write, batch)
+
+    def _commit(self, rows: list) -> int:
+        """Add rows, run the hooks and commit; returns how many rows were kept."""
+        db = self.session_factory()
+        try:
+            db.add_all(rows)
+            for hook in self._hooks:
+                hook(db, rows)
+            kept = sum(1 for row in rows if row in db)  # hooks may drop rows that can no longer be written
+            db.commit()
+            return kept
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _write(self, rows: list):
+        # what each row looked like before the attempt: ids, defaults and sequence numbers
+        # assigned by a rolled-back flush must not leak into the retry
+        saved = [dict(inspect(row).dict) for row in rows]
+        try:
+            kept = self._commit(rows)
+        except Exception:
+            logger.exception("Write-behind flush of %d rows failed, retrying row by row", len(rows))
+        else:
+            self.batches += 1
+            self.flushed_rows += kept
+            self.dropped_rows += len(rows) - kept
+            return
+        for row, before in zip(rows, saved):
+            state = inspect(row).dict
+            for key in [k for k in state if k not in before]:
+                del state[key]
+            state.update(before)
+            try:
+                kept = self._commit([row])
+            except Exception:
+                self.dropped_rows += 1
+                logger.exception("Write-behind dropped %r", row)
+            else:
+                self.flushed_rows += kept
+                self.dropped_rows += 1 - kept
+
+    async def close(self):
+        """Flush everything queued so far and stop the worker."""
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "pending": self._queue.qsize() if self.running else 0,
+            "enqueued": self.enqueued,
+            "flushed_rows": self.flushed_rows,
+            "batches": self.batches,
+            "dropped_rows": self.dropped_rows,
+            "inline_writes": self.inline_writes,
+        }
+
+
+write_behind = WriteBehindQueue()
@@ -1,17 +1,31 @@
 import os, sys
+from contextlib import contextmanager
+
+import httpx
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.pool import StaticPool
 from sqlalchemy.orm import sessionmaker
 
 # adjust path to import app modules
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# keep AI responses in process memory instead of Redis
+os.environ.setdefault("AI_CACHE_BACKEND", "memory")
+os.environ.setdefault("DATABASE_PROFILE", "test")
+# hash on worker threads: every TestClient runs the lifespan, which closes the pool
+os.environ.setdefault("PASSWORD_HASH_EXECUTOR", "thread")
 
 from app.database import Base, get_db
 from app.main import app
 from app.models import User, UserRole
 from app.security import get_password_hash
+from app.ollama_pool import ollama_pool
+from app.write_behind import write_behind
+from app.tutor_context import session_summarizer
+from app.jobs import lesson_jobs
+from app.passwords import password_hasher
+from tools.fake_ollama import create_app as create_fake_ollama
 
 # In-memory SQLite for testing
 SQLALCHEMY_TEST_DATABASE_URL = "sqlite:///:memory:"
@@ -22,6 +36,15 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# CODEX: every Ollama endpoint is served in-process by the fake server, and background writers use the test DB
+fake_ollama = create_fake_ollama(token_rate=0, latency=0, tokens=12, seed=0)
+ollama_pool.transport_factory = lambda host, port: httpx.ASGITransport(app=fake_ollama)
+write_behind.session_factory = TestingSessionLocal
+session_summarizer.session_factory = TestingSessionLocal
+lesson_jobs.session_factory = TestingSessionLocal
+# the single shared SQLite connection cannot interleave transactions from several worker threads
+lesson_jobs.workers = 1
+
 @pytest.fixture(scope="session", autouse=True)
 def init_db():
     # Create tables
@@ -33,6 +56,7 @@ def init_db():
     session.commit()
     session.close()
     yield
+    password_hasher.close()
     # Drop tables after tests
     Base.metadata.drop_all(bind=engine)
 
@@ -56,3 +80,23 @@ def client(db_session):
     with TestClient(app) as c:
         yield c
     app.dependency_overrides.clear()
+
+@pytest.fixture
+def sql_statements(db_session):
+    """sql_statements(keep=None, with_parameters=False) collects the SQL run inside its block.
+
+    keep(statement) narrows what is recorded; with_parameters records (statement, parameters).
+    """
+    @contextmanager
+    def capture(keep=None, with_parameters=False):
+        engine = db_session.get_bind()
+        statements = []
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if keep is None or keep(statement):
+                statements.append((statement, parameters) if with_parameters else statement)
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+    return capture
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from app.admission import AdmissionController, AdmissionRejected, Priority
+
+
+def test_waiters_are_admitted_by_priority():
+    async def run():
+        controller = AdmissionController(max_concurrency=1, max_queue=4, max_wait={})
+        order = []
+        await controller.acquire(Priority.tutor)
+
+        async def worker(priority, name):
+            async with controller.slot(priority):
+                order.append(name)
+
+        tasks = [asyncio.create_task(worker(Priority.tutor, "tutor")),
+                 asyncio.create_task(worker(Priority.lesson, "lesson"))]
+        await asyncio.sleep(0)
+        assert controller.stats()["queue_depth"] == 2
+        controller.release()
+        await asyncio.gather(*tasks)
+        assert order == ["lesson", "tutor"]
+        assert controller.stats()["active"] == 0
+
+    asyncio.run(run())
+
+
+def test_full_queue_rejects_with_retry_after():
+    async def run():
+        controller = AdmissionController(max_concurrency=1, max_queue=1, max_wait={}, retry_after=7)
+        await controller.acquire(Priority.tutor)
+        waiter = asyncio.create_task(controller.acquire(Priority.tutor))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as exc:
+            await controller.acquire(Priority.tutor)
+        assert exc.value.status_code == 429 and exc.value.retry_after == 7
+        # a higher-priority request displaces the queued tutor request instead
+        lesson = asyncio.create_task(controller.acquire(Priority.lesson))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as displaced:
+            await waiter
+        assert displaced.value.status_code == 503
+        controller.release()
+        await lesson
+        controller.release()
+        assert controller.stats()["active"] == 0
+
+    asyncio.run(run())
+
+
+def test_deadline_exceeded_returns_503_and_frees_queue():
+    async def run():
+        controller = AdmissionController(max_concurrency=1, max_queue=2, max_wait={"tutor": 0.01})
+        await controller.acquire(Priority.lesson)
+        with pytest.raises(AdmissionRejected) as exc:
+            await controller.acquire(Priority.tutor)
+        assert exc.value.status_code == 503
+        stats = controller.stats()
+        assert stats["queue_depth"] == 0 and stats["rejected_deadline"] == 1
+        controller.release()
+        assert controller.stats()["active"] == 0
+
+    asyncio.run(run())
@@ -0,0 +1,94 @@
+import threading
+from datetime import date, timedelta
+
+from app.advisor import advisor_snapshots
+from app.models import Assignment, Classroom, Lesson, User, UserRole
+from app.security import get_password_hash
+
+
+def get_auth_headers(client, username, password):
+    token = client.post("/api/auth/login", data={"username": username, "password": password}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def seed(db_session):
+    teacher = User(email="adv-teacher@test.com", password_hash=get_password_hash("pass"), role=UserRole.teacher)
+    student = User(email="adv-student@test.com", password_hash=get_password_hash("pass"), role=UserRole.student)
+    db_session.add_all([teacher, student])
+    db_session.flush()
+    room = Classroom(name="Advisor", join_code="advisor", teacher_id=teacher.id, students=[student])
+    room.assignments = [Assignment(title="Essay"), Assignment(title="Quiz")]
+    room.lessons = [Lesson(title="Past", scheduled_date=date.today() - timedelta(days=1)),
+                    Lesson(title="Next", scheduled_date=date.today() + timedelta(days=1))]
+    db_session.add(room)
+    db_session.commit()
+    return student.id, room.id, [a.id for a in room.assignments]
+
+
+def test_advisor_uses_an_anti_join_and_serves_snapshots_until_a_relevant_write(client, db_session):
+    student_id, room_id, (essay, quiz) = seed(db_session)
+    teacher = get_auth_headers(client, "adv-teacher@test.com", "pass")
+    student = get_auth_headers(client, "adv-student@test.com", "pass")
+
+    advice = client.get("/api/advisor/", headers=student).json()
+    assert [l["title"] for l in advice["upcoming_lessons"]] == ["Next"]
+    assert [a["title"] for a in advice["pending_assignments"]] == ["Essay", "Quiz"]
+    computed = advisor_snapshots.computed
+    client.get("/api/advisor/", headers=student)
+    assert advisor_snapshots.computed == computed  # served from the snapshot
+
+    # a grade for this student: the essay is done, and it is a low grade
+    r = client.post("/api/grades/", json={"student_id": student_id, "assignment_id": essay, "score": 50}, headers=teacher)
+    assert r.status_code == 200
+    advice = client.get("/api/advisor/", headers=student).json()
+    assert [a["title"] for a in advice["pending_assignments"]] == ["Quiz"]
+    assert [g["score"] for g in advice["low_grades"]] == [50]
+
+    # a new assignment in the classroom reaches every enrolled student's snapshot
+    client.post("/api/assignments/", json={"title": "Project", "classroom_id": room_id, "subject_id": None}, headers=teacher)
+    advice = client.get("/api/advisor/", headers=student).json()
+    assert [a["title"] for a in advice["pending_assignments"]] == ["Quiz", "Project"]
+    assert advisor_snapshots.computed == computed + 2
+
+
+def test_writes_elsewhere_keep_the_snapshot():
+    snapshots = advisor_snapshots.__class__(max_entries=10, ttl=60)
+    class Student:
+        id = 1
+        role = UserRole.student
+    calls = []
+    snapshots.compute = lambda db, student, today: calls.append(today) or {"day": today.isoformat()}
+    today = date(2030, 5, 1)
+    snapshots.get(None, Student, today)
+    snapshots.invalidate_students([2])
+    snapshots.get(None, Student, today)
+    assert len(calls) == 1
+    snapshots.get(None, Student, today + timedelta(days=1))  # a new day recomputes "upcoming"
+    assert len(calls) == 2
+    snapshots.invalidate_students([1])
+    snapshots.get(None, Student, today + timedelta(days=1))
+    assert len(calls) == 3
+
+
+def test_an_invalidation_racing_the_store_is_not_lost():
+    snapshots = advisor_snapshots.__class__(max_entries=10, ttl=60)
+    class Student:
+        id = 1
+        role = UserRole.student
+    calls = []
+    snapshots.compute = lambda db, student, today: calls.append(today) or {}
+    racers = []
+    forget = snapshots._forget
+    def forget_while_a_write_lands(student_id, marker):
+        racer = threading.Thread(target=snapshots.invalidate_students, args=([student_id],))
+        racer.start()
+        racer.join(0.05)  # blocks on the lock until the snapshot is stored (or rejected)
+        racers.append(racer)
+        forget(student_id, marker)
+    snapshots._forget = forget_while_a_write_lands
+    today = date(2030, 5, 1)
+    snapshots.get(None, Student, today)
+    racers[0].join()
+    snapshots._forget = forget
+    snapshots.get(None, Student, today)
+    assert len(calls) == 2  # the racing invalidation dropped the first snapshot
@@ -0,0 +1,112 @@
+import json
+
+import httpx
+
+from app.admission import AdmissionRejected, ollama_admission
+
+from app.models import Analytics, ChatMessage, ChatSession, User
+from app.ollama_pool import OllamaBackend, ollama_backends, ollama_pool
+from app.write_behind import write_behind
+from tests.conftest import fake_ollama
+from tools.fake_ollama import create_app as create_fake_ollama
+
+
+def get_auth_headers(client, username, password):
+    token = client.post("/api/auth/login", data={"username": username, "password": password}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def create_user(client, email, role):
+    admin_headers = get_auth_headers(client, "admin@test.com", "password")
+    client.post("/api/users/", json={"email": email, "password": "pass", "role": role, "timezone": "UTC"}, headers=admin_headers)
+    return get_auth_headers(client, email, "pass")
+
+
+def flush_writes(client):
+    # drain the write-behind queue, then keep it running for the rest of the test
+    client.portal.call(write_behind.close)
+    client.portal.call(write_behind.start)
+
+
+def test_tutor_streams_answer_and_records_history(client, db_session):
+    headers = create_user(client, "ai-student@test.com", "student")
+    r = client.post("/api/ai/tutor", json={"prompt": "What is photosynthesis?"}, headers=headers)
+    assert r.status_code == 200
+    assert r.text.startswith("Photosynthesis is how plants")
+    flush_writes(client)
+    session = db_session.query(ChatSession).order_by(ChatSession.id.desc()).first()
+    messages = db_session.query(ChatMessage).filter_by(session_id=session.id).order_by(ChatMessage.seq).all()
+    assert [(m.sender, m.seq) for m in messages] == [("user", 1), ("assistant", 2)]
+    assert messages[1].text == r.text and messages[1].truncated is False
+    # follow-up turns reuse the session
+    r = client.post("/api/ai/tutor", json={"prompt": "And the Calvin cycle?", "session_id": session.id}, headers=headers)
+    assert r.status_code == 200
+
+
+def test_tutor_sse_mode_frames_answer_with_metadata(client):
+    headers = create_user(client, "ai-sse@test.com", "student")
+    r = client.post("/api/ai/tutor", json={"prompt": "What is a cell?"}, headers={**headers, "Accept": "text/event-stream"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n") for block in r.text.strip().split("\n\n")]
+    assert [e[0] for e in events] == [f"id: {i}" for i in range(1, len(events) + 1)]
+    deltas = [json.loads(e[2][len("data: "):])["text"] for e in events if e[1] == "event: delta"]
+    assert "".join(deltas).startswith("Photosynthesis is how plants")
+    assert len(deltas) < 12  # twelve upstream tokens, coalesced into fewer frames
+    done = json.loads(events[-1][2][len("data: "):])
+    assert events[-1][1] == "event: done"
+    assert done["completion_tokens"] == 12 and done["session_id"] > 0
+
+
+def test_lesson_is_cached_after_first_generation(client, db_session):
+    headers = create_user(client, "ai-teacher@test.com", "teacher")
+    before = fake_ollama.state.stats.requests
+    first = client.post("/api/ai/lesson", json={"prompt": "Plan a lesson on fractions"}, headers=headers)
+    second = client.post("/api/ai/lesson", json={"prompt": "Plan a lesson on fractions"}, headers=headers)
+    assert first.status_code == second.status_code == 200
+    assert first.text == second.text
+    assert fake_ollama.state.stats.requests == before + 1
+    flush_writes(client)
+    rows = db_session.query(Analytics).filter(Analytics.teacher_id.isnot(None)).all()
+    assert any(row.data["prompt"] == "Plan a lesson on fractions" for row in rows)
+
+
+def test_upstream_error_returns_localized_message(client, monkeypatch):
+    headers = create_user(client, "ai-teacher2@test.com", "teacher")
+    broken = create_fake_ollama(error_rate=1.0, latency=0)
+    route = ollama_pool.transport_factory
+    monkeypatch.setattr(ollama_pool, "transport_factory",
+                        lambda host, port: httpx.ASGITransport(app=broken) if host == "broken" else route(host, port))
+    monkeypatch.setattr(ollama_backends, "backends", [*ollama_backends.backends, OllamaBackend("broken", 11434)])
+    r = client.post("/api/ai/analytics", json={"prompt": "Summarize grades", "host": "broken", "port": 11434},
+                    headers={**headers, "Accept-Language": "pt"})
+    assert r.status_code == 200
+    assert r.text.startswith("\n\nDesculpe")
+    assert broken.state.stats.errors == 1
+
+
+def test_requests_can_only_name_configured_backends(client):
+    headers = create_user(client, "ai-teacher3@test.com", "teacher")
+    r = client.post("/api/ai/analytics", json={"prompt": "Summarize grades", "host": "elsewhere.example", "port": 80},
+                    headers=headers)
+    assert r.status_code == 400
+    assert ("elsewhere.example", 80) not in ollama_pool._clients
+
+
+def test_shed_tutor_requests_leave_no_orphan_turns(client, db_session, monkeypatch):
+    headers = create_user(client, "ai-shed@test.com", "student")
+    assert client.post("/api/ai/tutor", json={"prompt": "First question"}, headers=headers).status_code == 200
+    flush_writes(client)
+
+    async def busy(priority, max_wait=None):
+        raise AdmissionRejected(429, "AI service is busy, please retry shortly", 3)
+    monkeypatch.setattr(ollama_admission, "acquire", busy)
+    student = db_session.query(User).filter_by(email="ai-shed@test.com").one()
+    session_id = db_session.query(ChatSession).filter_by(user_id=student.id).one().id
+    for body in ({"prompt": "Second question", "session_id": session_id}, {"prompt": "New chat"}):
+        r = client.post("/api/ai/tutor", json=body, headers=headers)
+        assert r.status_code == 429 and r.headers["Retry-After"] == "3"
+    db_session.expire_all()
+    assert db_session.query(ChatSession).filter_by(user_id=student.id).count() == 1
+    texts = [m.text for m in db_session.query(ChatMessage).filter_by(session_id=session_id).order_by(ChatMessage.seq)]
+    assert texts[0] == "First question" and "Second question" not in texts and len(texts) == 2
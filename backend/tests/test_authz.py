@@ -0,0 +1,55 @@
+from datetime import date
+
+from app.authz import classroom_access
+from app.models import Assignment, Classroom, Lesson, Subject, User, UserRole
+from app.security import get_password_hash
+
+
+def get_auth_headers(client, username, password):
+    token = client.post("/api/auth/login", data={"username": username, "password": password}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def seed(db_session):
+    teacher = User(email="authz-teacher@test.com", password_hash=get_password_hash("pass"), role=UserRole.teacher)
+    student = User(email="authz-student@test.com", password_hash=get_password_hash("pass"), role=UserRole.student)
+    db_session.add_all([teacher, student])
+    db_session.flush()
+    room = Classroom(name="Authz", join_code="authz", teacher_id=teacher.id)
+    room.assignments = [Assignment(title="Essay")]
+    room.lessons = [Lesson(title="Intro", scheduled_date=date(2031, 1, 1))]
+    room.subjects = [Subject(name="History")]
+    db_session.add(room)
+    db_session.commit()
+    return room.id, room.assignments[0].id, room.lessons[0].id, room.subjects[0].id
+
+
+def test_detail_checks_use_a_cached_membership_invalidated_on_join_and_delete(client, db_session, sql_statements):
+    room_id, assignment_id, lesson_id, subject_id = seed(db_session)
+    urls = [f"/api/classrooms/{room_id}", f"/api/assignments/{assignment_id}",
+            f"/api/lessons/{lesson_id}", f"/api/subjects/{subject_id}"]
+    student = get_auth_headers(client, "authz-student@test.com", "pass")
+    teacher = get_auth_headers(client, "authz-teacher@test.com", "pass")
+
+    assert [client.get(url, headers=student).status_code for url in urls] == [403] * 4
+    assert [client.get(url, headers=teacher).status_code for url in urls] == [200] * 4
+
+    assert client.post("/api/classrooms/join", json={"join_code": "authz"}, headers=student).status_code == 200
+    queries = classroom_access.queries
+    assert [client.get(url, headers=student).status_code for url in urls] == [200] * 4
+    assert classroom_access.queries == queries + 1  # one EXISTS, then the cached answer
+
+    # the check itself is a single EXISTS, not a walk over the roster
+    classroom_access.invalidate_user(db_session.query(User).filter_by(email="authz-student@test.com").one().id)
+    with sql_statements(lambda statement: "EXISTS" in statement) as checks:
+        client.get(urls[0], headers=student)
+    assert len(checks) == 1 and "classroom_students" in checks[0]
+
+
+    # deleting a classroom drops its cached answers
+    spare = client.post("/api/classrooms/", json={"name": "Spare", "join_code": "unused"}, headers=teacher).json()
+    client.post("/api/classrooms/join", json={"join_code": spare["join_code"]}, headers=student)
+    assert client.get(f"/api/classrooms/{spare['id']}", headers=student).status_code == 200
+    assert any(spare["id"] in known for known in classroom_access._cache.values())
+    assert client.delete(f"/api/classrooms/{spare['id']}", headers=teacher).status_code == 204
+    assert all(spare["id"] not in known for known in classroom_access._cache.values())
@@ -0,0 +1,82 @@
+import asyncio
+
+from app.cache import AICache, LRUCache, MemoryBackend, RedisBackend
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class BrokenRedis:
+    def __init__(self):
+        self.calls = 0
+
+    async def get(self, key):
+        self.calls += 1
+        raise ConnectionError("redis down")
+
+    async def set(self, key, value, ex=None):
+        self.calls += 1
+        raise ConnectionError("redis down")
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_lru_evicts_by_size_and_ttl():
+    clock = FakeClock()
+    cache = LRUCache(max_entries=10, ttl=5, max_bytes=10, clock=clock)
+    cache.set("a", "x" * 6, size=6)
+    cache.set("b", "y" * 6, size=6)
+    assert cache.get("a") is None
+    assert cache.get("b") == "y" * 6
+    clock.now = 6
+    assert cache.get("b") is None
+
+
+def test_ai_cache_hashes_keys_and_compresses():
+    key = AICache.make_key("ai_lesson", 1, "llama3.2", "a very long prompt " * 100)
+    assert key.startswith("ai_lesson:") and len(key) == len("ai_lesson:") + 32
+
+    async def run():
+        backend = MemoryBackend()
+        cache = AICache(backend, compress_min_bytes=16)
+        value = "lesson text " * 50
+        await cache.set(key, value)
+        stored = await backend.get(key)
+        assert stored[:1] == b"z" and len(stored) < len(value)
+        cache.l1.clear()
+        assert await cache.get(key) == value
+        assert cache.l2_hits == 1
+        # served from L1 without touching the backend
+        await backend.delete(key)
+        assert await cache.get(key) == value
+
+    asyncio.run(run())
+
+
+def test_redis_outage_is_a_cache_miss():
+    async def run():
+        client = BrokenRedis()
+        cache = AICache(RedisBackend(client))
+        assert await cache.get("k") is None
+        await cache.set("k", "v")
+        assert await cache.get("k") == "v"
+        cache.l1.clear()
+        assert await cache.get("k") is None
+        # backend is skipped while it is marked down
+        assert client.calls == 1
+
+    asyncio.run(run())
@@ -0,0 +1,33 @@
+from app.chat_history import append_messages, MAX_MESSAGES_PER_SESSION
+from app.models import ChatMessage, ChatSession, User, UserRole
+
+
+def get_auth_headers(client, username, password):
+    token = client.post("/api/auth/login", data={"username": username, "password": password}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_message_ring_keeps_newest_messages(db_session):
+    owner = User(email="ring@test.com", password_hash="x", role=UserRole.student)
+    db_session.add(owner)
+    db_session.commit()
+    chat = ChatSession(user_id=owner.id)
+    db_session.add(chat)
+    db_session.commit()
+    for i in range(MAX_MESSAGES_PER_SESSION + 5):
+        append_messages(db_session, chat.id, [ChatMessage(sender="user", text=str(i))])
+        db_session.commit()
+    seqs = [m.seq for m in db_session.query(ChatMessage).filter_by(session_id=chat.id).order_by(ChatMessage.seq)]
+    assert len(seqs) == MAX_MESSAGES_PER_SESSION
+    assert seqs[0] == 6 and seqs[-1] == MAX_MESSAGES_PER_SESSION + 5
+
+
+def test_session_cap_drops_oldest_sessions(client):
+    admin_headers = get_auth_headers(client, "admin@test.com", "password")
+    client.post("/api/users/", json={"email": "chatter@test.com", "password": "pass", "role": "student", "timezone": "UTC"}, headers=admin_headers)
+    headers = get_auth_headers(client, "chatter@test.com", "pass")
+    created = [client.post("/api/chat/sessions", headers=headers).json()["id"] for _ in range(34)]
+    sessions = client.get("/api/chat/sessions", headers=headers).json()
+    assert [s["id"] for s in sessions] == created[::-1][:32]
+    r = client.get(f"/api/chat/sessions/{created[0]}/messages", headers=headers)
+    assert r.status_code == 404
@@ -0,0 +1,59 @@
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from app.compression import CompressionMiddleware, CompressionStats, compression_stats, negotiate_encoding
+
+
+def get_auth_headers(client, username, password):
+    token = client.post("/api/auth/login", data={"username": username, "password": password}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_negotiation_honours_q_values_and_server_preference():
+    assert negotiate_encoding("gzip, deflate, br", ["br", "zstd", "gzip"]) == "br"
+    assert negotiate_encoding("br;q=0.5, gzip", ["br", "gzip"]) == "gzip"
+    assert negotiate_encoding("zstd;q=0, *;q=0.1", ["zstd", "gzip"]) == "gzip"
+    assert negotiate_encoding("identity", ["gzip"]) is None
+    assert negotiate_encoding(None, ["gzip"]) is None
+
+
+def test_large_lists_are_gzipped_and_counted_per_route(client):
+    headers = get_auth_headers(client, "admin@test.com", "password")
+    for i in range(30):
+        client.post("/api/users/", json={"email": f"bulk{i}@test.com", "password": "pass", "role": "student", "timezone": "UTC"}, headers=headers)
+    before = compression_stats.stats()["routes"].get("/api/users/", {}).get("bytes_saved", 0)
+    r = client.get("/api/users/", headers={**headers, "Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in r.headers["vary"]
+    assert len(r.json()) >= 30  # httpx decodes transparently
+    raw = client.get("/api/users/", headers={**headers, "Accept-Encoding": "identity"})
+    assert "content-encoding" not in raw.headers
+    assert compression_stats.stats()["routes"]["/api/users/"]["bytes_saved"] > before
+
+
+def test_small_bodies_and_ai_streams_are_not_compressed(client):
+    r = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in r.headers
+    admin = get_auth_headers(client, "admin@test.com", "password")
+    client.post("/api/users/", json={"email": "gz-student@test.com", "password": "pass", "role": "student", "timezone": "UTC"}, headers=admin)
+    headers = get_auth_headers(client, "gz-student@test.com", "pass")
+    r = client.post("/api/ai/tutor", json={"prompt": "hello " * 400}, headers={**headers, "Accept-Encoding": "gzip"})
+    assert r.status_code == 200 and "content-encoding" not in r.headers
+
+
+def test_routes_are_labelled_by_their_template_whatever_the_values():
+    stats = CompressionStats()
+    app, router = FastAPI(), APIRouter()
+    app.add_middleware(CompressionMiddleware, minimum_size=10, stats=stats)
+
+    @router.get("/classrooms/{classroom_id}/lessons/{lesson_id}")
+    def lesson(classroom_id: str, lesson_id: str):
+        return {"classroom": classroom_id, "lesson": lesson_id}
+    app.include_router(router, prefix="/api")
+
+    with TestClient(app) as client:
+        for path in ["/api/classrooms/1/lessons/1", "/api/classrooms/api/lessons/lessons", "/api/classrooms/7/lessons/8"]:
+            assert client.get(path, headers={"Accept-Encoding": "gzip"}).status_code == 200
+        client.get("/nowhere/1")
+    assert stats.stats()["routes"].keys() == {"/api/classrooms/{classroom_id}/lessons/{lesson_id}", "<unmatched>"}
+    assert stats.stats()["routes"]["/api/classrooms/{classroom_id}/lessons/{lesson_id}"]["responses"] == 3
@@ -0,0 +1,61 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+
+from app.database import InstrumentedQueuePool, PoolStats, engine_options, instrument_engine
+
+
+def get_auth_headers(client, username, password):
+    token = client.post("/api/auth/login", data={"username": username, "password": password}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_profiles_adapt_to_the_database_backend():
+    prod = {"pool_size": 10, "max_overflow": 20, "pool_timeout": 10, "pool_pre_ping": True, "statement_timeout": 15000}
+    pg = engine_options("postgresql://u:p@db/app", prod)
+    assert pg["poolclass"] is InstrumentedQueuePool and pg["pool_size"] == 10 and pg["pool_pre_ping"]
+    assert pg["connect_args"] == {"options": "-c statement_timeout=15000"}
+    assert pg["echo"] is False
+    memory = engine_options("sqlite://", {**prod, "echo": True})
+    assert "poolclass" not in memory and memory["echo"] is True
+    assert engine_options("sqlite:///app.db", prod)["connect_args"] == {"check_same_thread": False}
+
+
+def test_pool_stats_count_waits_overflow_and_timeouts(tmp_path):
+    profile = {"pool_size": 1, "max_overflow": 1, "pool_timeout": 0.05, "statement_timeout": 0}
+    url = f"sqlite:///{tmp_path / 'pool.db'}"
+    engine = create_engine(url, **engine_options(url, profile))
+    stats = PoolStats()
+    instrument_engine(engine, profile, stats)
+    first, second = engine.connect(), engine.connect()
+    assert stats.stats()["checked_out"] == 2 and stats.overflow_events == 1
+    with pytest.raises(PoolTimeoutError):
+        engine.connect()
+    first.close()
+    second.close()
+    result = stats.stats()
+    assert result["pool"] == "InstrumentedQueuePool"
+    assert result["checkouts"] == 3 and result["timeouts"] == 1 and result["checked_out"] == 0
+    assert result["max_wait_ms"] >= 50
+    engine.dispose()
+    engine.connect().close()
+    assert stats.stats()["checkouts"] == 4
+
+
+def test_sqlite_statement_timeout_interrupts_long_queries(tmp_path):
+    profile = {"pool_size": 1, "max_overflow": 0, "statement_timeout": 50}
+    url = f"sqlite:///{tmp_path / 'slow.db'}"
+    engine = create_engine(url, **engine_options(url, profile))
+    instrument_engine(engine, profile, PoolStats())
+    slow = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT count(*) FROM n"
+    with engine.connect() as conn:
+        with pytest.raises(OperationalError, match="interrupted"):
+            conn.execute(text(slow))
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+
+
+def test_db_metrics_require_admin(client):
+    headers = get_auth_headers(client, "admin@test.com", "password")
+    r = client.get("/api/metrics/db", headers=headers)
+    assert r.status_code == 200
+    assert r.json()["profile"] == "test" and "checkouts" in r.json()
@@ -0,0 +1,67 @@
+from app.models import Analytics, Classroom, User, UserRole
+from app.pagination import NEXT_CURSOR_HEADER
+from app.security import get_password_hash
+
+
+def get_auth_headers(client, username, password):
+    token = client.post("/api/auth/login", data={"username": username, "password": password}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def seed_classroom(db_session):
+    teacher = User(email="fs-teacher@test.com", password_hash=get_password_hash("pass"), role=UserRole.teacher)
+    db_session.add(teacher)
+    db_session.flush()
+    room = Classroom(name="Fieldsets", join_code="fieldsets", teacher_id=teacher.id)
+    room.students = [User(email=f"fs-{i}@test.com", password_hash="x", role=UserRole.student, name=f"S{i}") for i in range(3)]
+    db_session.add(room)
+    db_session.add(Analytics(teacher_id=teacher.id, data={"prompt": "p", "response": "x" * 5000}))
+    db_session.commit()
+    room_id = room.id
+    db_session.expunge_all()
+    return room_id
+
+
+def test_fields_project_columns_in_sql_and_in_json(client, db_session, sql_statements):
+    headers = get_auth_headers(client, "admin@test.com", "password")
+    room_id = seed_classroom(db_session)
+    with sql_statements() as statements:
+        r = client.get("/api/analytics/", headers=headers, params={"fields": "id,created_at"})
+    assert r.status_code == 200
+    assert r.json() and all(set(row) == {"id", "created_at"} for row in r.json())
+    assert not any("analytics.data" in s for s in statements)
+
+    db_session.expunge_all()
+    with sql_statements() as statements:
+        r = client.get(f"/api/classrooms/{room_id}", headers=headers, params={"fields": "id,name,students.email"})
+    assert r.json() == {"id": room_id, "name": "Fieldsets",
+                        "students": [{"email": f"fs-{i}@test.com"} for i in range(3)]}
+    # the principal lookup reads a whole user; the classroom and roster queries only what was asked for
+    assert not any("classrooms.join_code" in s for s in statements)
+    roster = [s for s in statements if "classroom_students" in s]
+    assert roster and not any("users.name" in s or "users.created_at" in s for s in roster)
+
+
+def test_include_controls_relationships(client, db_session, sql_statements):
+    headers = get_auth_headers(client, "admin@test.com", "password")
+    if not db_session.query(Classroom).filter_by(join_code="fieldsets").first():
+        seed_classroom(db_session)
+    db_session.expunge_all()
+    with sql_statements() as statements:
+        r = client.get("/api/classrooms/", headers=headers, params={"include": ""})
+    rooms = r.json()
+    assert rooms and all("students" not in room and "join_code" in room for room in rooms)
+    assert not any("classroom_students" in s for s in statements)
+    r = client.get("/api/classrooms/", headers=headers, params={"fields": "id", "include": "students"})
+    room = next(room for room in r.json() if room["students"])
+    assert set(room) == {"id", "students"} and "classrooms" in room["students"][0]
+
+
+def test_fieldsets_keep_pagination_and_reject_unknown_fields(client):
+    headers = get_auth_headers(client, "admin@test.com", "password")
+    r = client.get("/api/users/", headers=headers, params={"fields": "id,email", "limit": 1})
+    assert r.status_code == 200 and set(r.json()[0]) == {"id", "email"}
+    assert r.headers.get(NEXT_CURSOR_HEADER)
+    assert client.get("/api/users/", headers=headers, params={"fields": "password_hash"}).status_code == 400
+    assert client.get("/api/users/", headers=headers, params={"fields": "email.id"}).status_code == 400
+    assert client.get("/api/classrooms/", headers=headers, params={"include": "teacher"}).status_code == 400
@@ -0,0 +1,127 @@
+import asyncio
+import time
+
+from app.cache import ai_cache
+from app.jobs import LessonJobRunner, lesson_jobs
+from app.models import JobStatus, LessonJob, LessonJobItem, User, UserRole
+from tests.conftest import TestingSessionLocal
+
+
+def get_auth_headers(client, username, password):
+    token = client.post("/api/auth/login", data={"username": username, "password": password}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def wait_until_idle(timeout=10):
+    # watch the runner rather than polling the API, so no request shares the test DB connection with the worker
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        stats = lesson_jobs.stats()
+        if stats["queued"] == 0 and stats["busy"] == 0:
+            return
+        time.sleep(0.02)
+    raise AssertionError("lesson jobs did not finish")
+
+
+def test_batch_job_generates_all_prompts_and_reuses_lesson_cache(client):
+    admin_headers = get_auth_headers(client, "admin@test.com", "password")
+    client.post("/api/users/", json={"email": "batch-teacher@test.com", "password": "pass", "role": "teacher", "timezone": "UTC"}, headers=admin_headers)
+    headers = get_auth_headers(client, "batch-teacher@test.com", "pass")
+    teacher_id = client.get("/api/auth/me", headers=headers).json()["id"]
+    cache_key = ai_cache.make_key("ai_lesson", teacher_id, "llama3.2", "Fractions, week 2")
+    client.portal.call(ai_cache.set, cache_key, "cached draft")
+
+    r = client.post("/api/ai/lesson-jobs/", json={"prompts": ["Fractions, week 1", "Fractions, week 2", "Decimals"]}, headers=headers)
+    assert r.status_code == 202
+    job = r.json()
+    assert job["status"] == "queued" and job["total"] == 3
+
+    wait_until_idle()
+    finished = client.get(f"/api/ai/lesson-jobs/{job['id']}", headers=headers).json()
+    assert finished["status"] == "completed" and finished["completed"] == 3 and finished["failed"] == 0
+    items = client.get(f"/api/ai/lesson-jobs/{job['id']}/results", headers=headers).json()["items"]
+    assert [i["position"] for i in items] == [0, 1, 2]
+    assert items[1]["cached"] is True and items[1]["result"] == "cached draft"
+    assert items[0]["result"].startswith("Photosynthesis") and items[0]["cached"] is False
+
+    # progress stream of a finished job ends with a single done event
+    events = client.get(f"/api/ai/lesson-jobs/{job['id']}/events", headers=headers).text.strip().split("\n\n")
+    assert len(events) == 1 and "event: done" in events[0]
+
+    other = get_auth_headers(client, "admin@test.com", "password")
+    assert client.get(f"/api/ai/lesson-jobs/{job['id']}", headers=other).status_code == 403
+
+
+def test_interrupted_items_are_requeued_on_start():
+    db = TestingSessionLocal()
+    teacher = User(email="requeue@test.com", password_hash="x", role=UserRole.teacher)
+    db.add(teacher)
+    db.commit()
+    job = LessonJob(teacher_id=teacher.id, model="requeue-model", total=2, status=JobStatus.running, items=[
+        LessonJobItem(position=0, prompt="a", status=JobStatus.running),
+        LessonJobItem(position=1, prompt="b"),
+    ])
+    db.add(job)
+    db.commit()
+    job_id = job.id
+    db.close()
+
+    async def generate(prompt, model, style, pre_prompt):
+        yield f"draft {prompt}"
+
+    async def run():
+        runner = LessonJobRunner(session_factory=TestingSessionLocal, workers=1, generate=generate)
+        await runner.start()
+        for _ in range(200):
+            if runner.generated == 2 and runner.busy == 0:
+                break
+            await runner.wait(job_id, 0.05)
+        await runner.close()
+
+    asyncio.run(run())
+    db = TestingSessionLocal()
+    job = db.get(LessonJob, job_id)
+    assert job.status == JobStatus.completed and job.completed == 2 and job.finished_at is not None
+    assert [item.result for item in job.items] == ["draft a", "draft b"]
+    db.close()
+
+
+def test_jobs_posted_while_workers_idle_are_queued_from_the_event_loop(client, monkeypatch):
+    admin_headers = get_auth_headers(client, "admin@test.com", "password")
+    client.post("/api/users/", json={"email": "idle-teacher@test.com", "password": "pass", "role": "teacher"}, headers=admin_headers)
+    headers = get_auth_headers(client, "idle-teacher@test.com", "pass")
+    wait_until_idle()
+
+    enqueue, on_loop = lesson_jobs.enqueue, []
+    def record(item_ids):
+        try:
+            on_loop.append(asyncio.get_running_loop() is not None)
+        except RuntimeError:
+            on_loop.append(False)
+        enqueue(item_ids)
+    monkeypatch.setattr(lesson_jobs, "enqueue", record)
+
+    r = client.post("/api/ai/lesson-jobs/", json={"prompts": ["Idle 1", "Idle 2"]}, headers=headers)
+    assert r.status_code == 202 and on_loop == [True]
+    wait_until_idle()
+    assert client.get(f"/api/ai/lesson-jobs/{r.json()['id']}", headers=headers).json()["completed"] == 2
+
+
+def test_waiters_that_time_out_or_go_away_are_forgotten():
+    runner = LessonJobRunner(session_factory=TestingSessionLocal, workers=1)
+
+    async def run():
+        assert await runner.wait(1, 0.01) is False
+        waiting = asyncio.create_task(runner.wait(2, 10))
+        await asyncio.sleep(0)
+        assert set(runner._waiters) == {2}
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        assert runner._waiters == {}
+
+        woken = asyncio.create_task(runner.wait(3, 10))
+        await asyncio.sleep(0)
+        runner._notify(3)
+        assert await woken is True and runner._waiters == {}
+
+    asyncio.run(run())
@@ -0,0 +1,104 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.ollama_pool import NoBackendAvailable, OllamaBackend, OllamaBackendPool, OllamaClientPool
+
+
+class FakeOllama:
+    """Minimal stand-in for one Ollama node: answers /api/tags and can be switched off."""
+
+    def __init__(self, models):
+        self.models = models
+        self.up = True
+        self.probes = 0
+
+    def handle(self, request):
+        if not self.up:
+            raise httpx.ConnectError("connection refused", request=request)
+        if request.url.path == "/api/tags":
+            self.probes += 1
+            return httpx.Response(200, json={"models": [{"name": f"{m}:latest"} for m in self.models]})
+        return httpx.Response(404)
+
+
+def make_pool(servers, **kwargs):
+    clients = OllamaClientPool()
+    clients.transport_factory = lambda host, port: httpx.MockTransport(servers[(host, port)].handle)
+    backends = [OllamaBackend(host, port, models) for (host, port), models in kwargs.pop("configured").items()]
+    return OllamaBackendPool(backends, clients, probe_interval=0, **kwargs), clients
+
+
+def test_routes_by_model_and_least_outstanding():
+    servers = {("a", 1): FakeOllama(["llama3.2", "mistral"]), ("b", 2): FakeOllama(["llama3.2"])}
+    pool, clients = make_pool(servers, configured={("a", 1): None, ("b", 2): None})
+
+    async def run():
+        await pool.probe_all()
+        assert pool.pick("mistral").name == "a:1"
+        async with pool.lease("llama3.2") as first:
+            async with pool.lease("llama3.2") as second:
+                assert {first.name, second.name} == {"a:1", "b:2"}
+        with pytest.raises(NoBackendAvailable):
+            pool.pick("phi3")
+        await clients.close()
+
+    asyncio.run(run())
+
+
+def test_failed_backend_is_ejected_and_readmitted():
+    servers = {("a", 1): FakeOllama(["llama3.2"]), ("b", 2): FakeOllama(["llama3.2"])}
+    pool, clients = make_pool(servers, configured={("a", 1): ["llama3.2"], ("b", 2): ["llama3.2"]},
+                              failure_threshold=2, eject_seconds=60)
+
+    async def run():
+        servers[("a", 1)].up = False
+        await pool.probe_all()
+        await pool.probe_all()
+        stats = pool.stats()
+        assert stats["a:1"]["healthy"] is False and stats["b:2"]["healthy"] is True
+        assert all(pool.pick("llama3.2").name == "b:2" for _ in range(3))
+        servers[("a", 1)].up = True
+        await pool.probe_all()
+        assert pool.stats()["a:1"]["healthy"] is True
+        await clients.close()
+
+    asyncio.run(run())
+
+
+def test_client_pool_reports_saturation_from_the_connection_pool():
+    async def run():
+        release = asyncio.Event()
+
+        async def handle(reader, writer):
+            await reader.readuntil(b"\r\n\r\n")
+            await release.wait()
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+            await writer.drain()
+            writer.close()
+
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        pool = OllamaClientPool(max_connections=2, pool_timeout=5)
+
+        async def call():
+            async with pool.stream("GET", "127.0.0.1", port, "/api/tags") as resp:
+                await resp.aread()
+
+        first = [asyncio.create_task(call()) for _ in range(2)]
+        while pool.connections("127.0.0.1", port) != (2, 2):
+            await asyncio.sleep(0.01)
+        third = asyncio.create_task(call())
+        await asyncio.sleep(0.05)
+        endpoint = pool.stats()["endpoints"][f"127.0.0.1:{port}"]
+        assert endpoint["saturation"] == 1.0 and endpoint["saturated"] == 1 and endpoint["in_flight"] == 3
+        release.set()
+        await asyncio.gather(*first, third)
+        endpoint = pool.stats()["endpoints"][f"127.0.0.1:{port}"]
+        assert endpoint["connections_busy"] == 0 and endpoint["saturation"] == 0.0
+        await pool.close()
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(run())
@@ -0,0 +1,92 @@
+from datetime import date, datetime, timedelta
+
+from app.models import AuditLog, Classroom, Lesson, User, UserRole
+from app.pagination import NEXT_CURSOR_HEADER, encode_cursor
+from app.security import get_password_hash
+
+
+def get_auth_headers(client, username, password):
+    token = client.post("/api/auth/login", data={"username": username, "password": password}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def walk(client, url, headers, **params):
+    pages, cursor = [], None
+    while True:
+        r = client.get(url, headers=headers, params={**params, **({"cursor": cursor} if cursor else {})})
+        assert r.status_code == 200, r.text
+        pages.append(r.json())
+        cursor = r.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return pages
+
+
+def test_users_are_walked_page_by_page_without_gaps(client):
+    headers = get_auth_headers(client, "admin@test.com", "password")
+    for i in range(5):
+        client.post("/api/users/", json={"email": f"page{i}@test.com", "password": "pass", "role": "student", "timezone": "UTC"}, headers=headers)
+    pages = walk(client, "/api/users/", headers, limit=2, search="page")
+    assert [len(p) for p in pages] == [2, 2, 1]
+    emails = [u["email"] for p in pages for u in p]
+    assert emails == [f"page{i}@test.com" for i in range(5)]
+
+
+def test_cursor_and_limit_are_validated(client):
+    headers = get_auth_headers(client, "admin@test.com", "password")
+    assert client.get("/api/users/", headers=headers, params={"cursor": "not-a-cursor"}).status_code == 400
+    assert client.get("/api/users/", headers=headers, params={"limit": 100000}).status_code == 422
+    # a cursor from another listing does not match this one's sort keys
+    lessons_cursor = encode_cursor([Lesson.scheduled_date, Lesson.id], Lesson(id=1, scheduled_date=date(2031, 1, 1)))
+    assert client.get("/api/users/", headers=headers, params={"cursor": lessons_cursor}).status_code == 400
+    assert client.get("/api/audit_logs/", headers=headers, params={"limit": 1}).status_code == 200
+
+
+def test_audit_logs_page_newest_first_including_rows_without_a_timestamp(client, db_session):
+    headers = get_auth_headers(client, "admin@test.com", "password")
+    stamp = datetime(2030, 1, 1, 12, 0)
+    logs = [AuditLog(action=f"page-log-{i}", timestamp=None if i % 3 == 0 else stamp + timedelta(minutes=i // 2)) for i in range(6)]
+    db_session.add_all(logs)
+    db_session.commit()
+    first_id = logs[0].id
+    pages = walk(client, "/api/audit_logs/", headers, limit=2)
+    ids = [log["id"] for p in pages for log in p]
+    assert ids == sorted(ids, reverse=True) and len(set(ids)) == len(ids)
+    assert {log.id for log in logs} <= set(ids) and ids[-1] <= first_id
+
+
+def test_listings_are_only_paged_when_asked(client):
+    headers = get_auth_headers(client, "admin@test.com", "password")
+    for i in range(3):
+        client.post("/api/users/", json={"email": f"unpaged{i}@test.com", "password": "pass", "role": "student"}, headers=headers)
+    everyone = client.get("/api/users/", headers=headers, params={"search": "unpaged"})
+    assert len(everyone.json()) == 3 and NEXT_CURSOR_HEADER not in everyone.headers
+    first = client.get("/api/users/", headers=headers, params={"search": "unpaged", "limit": 1})
+    rest = client.get("/api/users/", headers=headers, params={"search": "unpaged", "cursor": first.headers[NEXT_CURSOR_HEADER]})
+    assert [u["email"] for u in first.json() + rest.json()] == [f"unpaged{i}@test.com" for i in range(3)]
+
+
+def test_lessons_filter_by_date_range_and_students_are_scoped(client, db_session):
+    teacher = User(email="page-teacher@test.com", password_hash=get_password_hash("pass"), role=UserRole.teacher)
+    student = User(email="page-student@test.com", password_hash=get_password_hash("pass"), role=UserRole.student)
+    db_session.add_all([teacher, student])
+    db_session.flush()
+    rooms = [Classroom(name=f"Paged {i}", join_code=f"paged-{i}", teacher_id=teacher.id) for i in range(2)]
+    for room in rooms:
+        room.students.append(student)
+    db_session.add_all(rooms)
+    db_session.flush()
+    start = date(2031, 3, 1)
+    db_session.add_all([Lesson(classroom_id=rooms[i % 2].id, title=f"L{i}", scheduled_date=start + timedelta(days=i)) for i in range(6)])
+    db_session.commit()
+
+    headers = get_auth_headers(client, "page-student@test.com", "pass")
+    pages = walk(client, "/api/lessons/", headers, limit=2, since="2031-03-02", until="2031-03-06")
+    assert [lesson["title"] for p in pages for lesson in p] == ["L1", "L2", "L3", "L4"]
+    only_first = walk(client, "/api/lessons/", headers, classroom_id=rooms[0].id)
+    assert [lesson["title"] for p in only_first for lesson in p] == ["L0", "L2", "L4"]
+
+    # enrolled in both of the teacher's classrooms, listed once
+    teacher_headers = get_auth_headers(client, "page-teacher@test.com", "pass")
+    students = client.get("/api/students/", headers=teacher_headers).json()
+    assert [s["email"] for s in students] == ["page-student@test.com"]
+    assert client.get("/api/students/", headers=headers).status_code == 403
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.models import User, UserRole
+from app.passwords import PasswordHasher, password_hasher
+from app.security import hash_with_rounds
+
+
+def test_login_upgrades_a_hash_made_with_another_work_factor(client, db_session):
+    user = User(email="rehash@test.com", password_hash=hash_with_rounds("pass", 4), role=UserRole.student)
+    db_session.add(user)
+    db_session.commit()
+    completed, rehashed = password_hasher.stats()["completed"], password_hasher.rehashed
+
+    r = client.post("/api/auth/login", data={"username": "rehash@test.com", "password": "pass"})
+    assert r.status_code == 200
+    db_session.refresh(user)
+    assert user.password_hash.startswith(f"$2b${password_hasher.rounds:02d}$")
+    assert password_hasher.rehashed == rehashed + 1
+
+    # the upgraded hash verifies and is left alone; a wrong password is still refused
+    assert client.post("/api/auth/login", data={"username": "rehash@test.com", "password": "pass"}).status_code == 200
+    assert client.post("/api/auth/login", data={"username": "rehash@test.com", "password": "nope"}).status_code == 401
+    assert password_hasher.rehashed == rehashed + 1
+    assert password_hasher.stats()["completed"] == completed + 3
+
+
+def test_a_full_hashing_queue_rejects_with_retry_after():
+    hasher = PasswordHasher(workers=1, max_queue=1, rounds=10, retry_after=7)
+
+    async def burst():
+        return await asyncio.gather(*(hasher.hash(f"pw{i}") for i in range(3)), return_exceptions=True)
+
+    try:
+        results = asyncio.run(burst())
+    finally:
+        hasher.close()
+    rejected = [r for r in results if isinstance(r, HTTPException)]
+    assert len(rejected) == 1 and rejected[0].status_code == 503 and rejected[0].headers == {"Retry-After": "7"}
+    assert sum(isinstance(r, str) and r.startswith("$2b$10$") for r in results) == 2
+    stats = hasher.stats()
+    assert stats["completed"] == 2 and stats["rejected"] == 1 and stats["max_queue_seen"] == 1
+    assert stats["in_flight"] == 0
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_the_hasher_starts_new_workers_after_close(executor):
+    hasher = PasswordHasher(workers=1, rounds=4, executor=executor)
+    try:
+        first = asyncio.run(hasher.hash("pw"))
+        hasher.close()
+        assert hasher.stats()["in_flight"] == 0
+        assert asyncio.run(hasher.verify("pw", first)) == (True, None)
+        assert hasher.stats()["completed"] == 2 and hasher.stats()["executor"] == executor
+    finally:
+        hasher.close()
+    with pytest.raises(ValueError):
+        PasswordHasher(executor="fork")
+
+
+def test_password_routes_keep_database_calls_off_the_event_loop(client, sql_statements):
+    def on_event_loop():
+        try:
+            asyncio.get_running_loop()
+            return True
+        except RuntimeError:
+            return False
+
+    with sql_statements(lambda statement: on_event_loop()) as blocking:
+        r = client.post("/api/auth/register", json={"email": "offloop@test.com", "password": "pass", "role": "student"})
+        user_id = r.json()["id"]
+        login = client.post("/api/auth/login", data={"username": "offloop@test.com", "password": "pass"})
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+        assert client.put(f"/api/users/{user_id}", json={"password": "new", "name": "Off"}, headers=headers).status_code == 200
+        admin = client.post("/api/auth/login", data={"username": "admin@test.com", "password": "password"}).json()
+        r = client.post("/api/users/", json={"email": "offloop2@test.com", "password": "pass", "role": "teacher"},
+                        headers={"Authorization": f"Bearer {admin['access_token']}"})
+        assert r.status_code == 200
+    assert blocking == []
@@ -0,0 +1,92 @@
+import app.routers.auth as auth
+from app.models import User, UserRole
+from app.principals import PrincipalCache, principal_cache
+from app.security import get_password_hash
+
+
+def get_auth_headers(client, username, password):
+    token = client.post("/api/auth/login", data={"username": username, "password": password}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def is_user_query(statement):
+    return statement.lstrip().upper().startswith("SELECT") and "FROM users" in statement
+
+
+def seed_teacher(db_session, email):
+    teacher = User(email=email, password_hash=get_password_hash("pass"), role=UserRole.teacher)
+    db_session.add(teacher)
+    db_session.commit()
+    return teacher.id
+
+
+def demote(client, user_id):
+    admin = get_auth_headers(client, "admin@test.com", "password")
+    assert client.put(f"/api/users/{user_id}", json={"role": "student"}, headers=admin).status_code == 200
+
+
+def test_principal_is_served_from_cache_until_the_user_changes(client, db_session, sql_statements):
+    user_id = seed_teacher(db_session, "principal-teacher@test.com")
+    headers = get_auth_headers(client, "principal-teacher@test.com", "pass")
+    client.get("/api/user/preferences", headers=headers)
+
+    db_session.expunge_all()  # a fresh request session: nothing left in the identity map
+    with sql_statements(is_user_query) as statements:
+        r = client.get("/api/user/preferences", headers=headers)
+    assert r.status_code == 200 and statements == []
+
+    # mutating the cached principal still writes through the session
+    r = client.post("/api/user/preferences", json={"theme": "dark"}, headers=headers)
+    assert r.json()["theme"] == "dark"
+    db_session.expunge_all()
+    assert client.get("/api/user/preferences", headers=headers).json()["theme"] == "dark"
+
+    assert client.get("/api/ai/lesson-jobs/", headers=headers).status_code == 200
+    demote(client, user_id)
+    db_session.expunge_all()
+    assert client.get("/api/ai/lesson-jobs/", headers=headers).status_code == 403
+
+
+def test_role_claims_authorize_without_the_database_until_the_role_changes(client, db_session, sql_statements, monkeypatch):
+    monkeypatch.setattr(auth, "PRINCIPAL_TOKEN_CLAIMS", True)
+    user_id = seed_teacher(db_session, "claims-teacher@test.com")
+    headers = get_auth_headers(client, "claims-teacher@test.com", "pass")
+
+    # the first request loads the user; claims only stand in for a cached principal
+    principal_cache._l1.clear()
+    assert client.get("/api/ai/lesson-jobs/", headers=headers).status_code == 200
+    db_session.expunge_all()
+    used = principal_cache.claims_used
+    with sql_statements(is_user_query) as statements:
+        r = client.get("/api/ai/lesson-jobs/", headers=headers)
+    assert r.status_code == 200 and statements == [] and principal_cache.claims_used == used + 1
+
+    # the token still says "teacher", but it was issued before the change
+    demote(client, user_id)
+    db_session.expunge_all()
+    assert client.get("/api/ai/lesson-jobs/", headers=headers).status_code == 403
+
+
+def test_role_claims_fall_back_to_the_database_and_keep_every_change_marker(db_session):
+    user_id = seed_teacher(db_session, "claims-markers@test.com")
+    now = [1000.0]
+    cache = PrincipalCache(max_entries=2, claims_ttl=60, clock=lambda: now[0])
+    claims = {"sub": str(user_id), "role": "teacher", "iat": 999}
+
+    assert cache.from_claims(db_session, claims) is None  # nothing cached yet
+    cache.resolve(db_session, user_id)
+    assert cache.from_claims(db_session, claims).email == "claims-markers@test.com"
+    assert cache.from_claims(db_session, {**claims, "role": "admin"}) is None
+
+    # many later changes to other users must not push this user's marker out
+    cache.invalidate(user_id)
+    for other in range(100, 110):
+        cache.invalidate(other)
+    cache.resolve(db_session, user_id)
+    assert cache.from_claims(db_session, claims) is None
+    assert cache.from_claims(db_session, {**claims, "iat": 1001}) is not None
+
+    # markers only go once every token issued before them has expired
+    now[0] = 1061.0
+    cache.invalidate(999)
+    assert user_id not in cache._changed and list(cache._changed) == [999]
@@ -0,0 +1,86 @@
+from app.models import Classroom, User, UserRole
+from app.security import get_password_hash
+
+PASSWORD_HASH = get_password_hash("pass")
+
+
+def get_auth_headers(client, username, password):
+    token = client.post("/api/auth/login", data={"username": username, "password": password}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def seed(db_session, tag, classrooms, students_per_classroom):
+    teacher = User(email=f"qc-{tag}-teacher@test.com", password_hash=PASSWORD_HASH, role=UserRole.teacher)
+    db_session.add(teacher)
+    db_session.flush()
+    for c in range(classrooms):
+        room = Classroom(name=f"QC {tag} {c}", join_code=f"qc-{tag}-{c}", teacher_id=teacher.id)
+        room.students = [User(email=f"qc-{tag}-{c}-{s}@test.com", password_hash=PASSWORD_HASH, role=UserRole.student)
+                         for s in range(students_per_classroom)]
+        db_session.add(room)
+    db_session.commit()
+    return teacher.email
+
+
+def queries_for(client, db_session, sql_statements, url, headers):
+    db_session.expunge_all()
+    with sql_statements() as statements:
+        r = client.get(url, headers=headers)
+    assert r.status_code == 200, r.text
+    return len(statements), r.json()
+
+
+def test_listing_query_counts_do_not_grow_with_the_data(client, db_session, sql_statements):
+    admin = get_auth_headers(client, "admin@test.com", "password")
+    small_teacher = seed(db_session, "small", classrooms=1, students_per_classroom=2)
+    small = {
+        "/api/classrooms/": queries_for(client, db_session, sql_statements, "/api/classrooms/", admin)[0],
+        "/api/users/": queries_for(client, db_session, sql_statements, "/api/users/", admin)[0],
+        "/api/students/": queries_for(client, db_session, sql_statements, "/api/students/", admin)[0],
+    }
+    teacher_headers = get_auth_headers(client, small_teacher, "pass")
+    small_teacher_count = queries_for(client, db_session, sql_statements, "/api/classrooms/", teacher_headers)[0]
+
+    large_teacher = seed(db_session, "large", classrooms=4, students_per_classroom=6)
+    for url, count in small.items():
+        assert queries_for(client, db_session, sql_statements, url, admin)[0] == count, url
+    teacher_headers = get_auth_headers(client, large_teacher, "pass")
+    count, rooms = queries_for(client, db_session, sql_statements, "/api/classrooms/", teacher_headers)
+    assert count == small_teacher_count
+    assert len(rooms) == 4 and all(len(room["students"]) == 6 for room in rooms)
+    assert all(s["classrooms"] for room in rooms for s in room["students"])
+
+
+def test_classroom_detail_loads_the_roster_in_bulk(client, db_session, sql_statements):
+    admin = get_auth_headers(client, "admin@test.com", "password")
+    seed(db_session, "detail", classrooms=1, students_per_classroom=8)
+    room_id = db_session.query(Classroom.id).filter(Classroom.join_code == "qc-detail-0").scalar()
+    count, room = queries_for(client, db_session, sql_statements, f"/api/classrooms/{room_id}", admin)
+    assert len(room["students"]) == 8
+    # principal, classroom, roster, and the students' two classroom lists
+    assert count <= 5
+
+
+def test_student_listings_cost_one_query_however_many_classrooms(client, db_session, sql_statements):
+    from datetime import date
+    from app.models import Assignment, Lesson, Subject
+    teacher = User(email="qc-scope-teacher@test.com", password_hash=PASSWORD_HASH, role=UserRole.teacher)
+    few = User(email="qc-scope-few@test.com", password_hash=PASSWORD_HASH, role=UserRole.student)
+    many = User(email="qc-scope-many@test.com", password_hash=PASSWORD_HASH, role=UserRole.student)
+    db_session.add_all([teacher, few, many])
+    db_session.flush()
+    for c in range(5):
+        room = Classroom(name=f"QC scope {c}", join_code=f"qc-scope-{c}", teacher_id=teacher.id)
+        room.students = [many, few] if c == 0 else [many]
+        room.assignments = [Assignment(title=f"A{c}")]
+        room.lessons = [Lesson(title=f"L{c}", scheduled_date=date(2032, 1, 1 + c))]
+        room.subjects = [Subject(name=f"S{c}")]
+        db_session.add(room)
+    db_session.commit()
+    few_headers = get_auth_headers(client, "qc-scope-few@test.com", "pass")
+    many_headers = get_auth_headers(client, "qc-scope-many@test.com", "pass")
+    for url in ("/api/assignments/", "/api/lessons/", "/api/subjects/", "/api/classrooms/"):
+        few_count, few_rows = queries_for(client, db_session, sql_statements, url, few_headers)
+        many_count, many_rows = queries_for(client, db_session, sql_statements, url, many_headers)
+        assert (len(few_rows), len(many_rows)) == (1, 5), url
+        assert few_count == many_count, url
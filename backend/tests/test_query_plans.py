@@ -0,0 +1,77 @@
+import re
+from datetime import date
+
+import pytest
+
+from app.advisor import advisor_snapshots
+from app.models import (Analytics, Assignment, ChatMessage, ChatSession, Classroom, Grade, Lesson, Subject, User,
+                        UserRole)
+from app.security import get_password_hash
+
+# tables whose role-scoped reads must always go through an index
+HOT_TABLES = {"users", "classrooms", "classroom_students", "assignments", "grades", "lessons", "subjects",
+              "analytics", "audit_logs", "chat_sessions", "chat_messages", "lesson_jobs"}
+# "SCAN grades" is a full table scan; "SCAN x USING INDEX" walks an index in order and is allowed
+FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+
+# /api/user/preferences is answered from the principal cache and issues no SQL at all
+STUDENT_URLS = ["/api/assignments/", "/api/lessons/", "/api/subjects/", "/api/classrooms/", "/api/grades/",
+                "/api/analytics/", "/api/advisor/", "/api/chat/sessions"]
+TEACHER_URLS = ["/api/assignments/", "/api/lessons/", "/api/subjects/", "/api/classrooms/", "/api/grades/",
+                "/api/analytics/", "/api/students/", "/api/ai/lesson-jobs/"]
+
+
+def get_auth_headers(client, username, password):
+    token = client.post("/api/auth/login", data={"username": username, "password": password}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def is_read(statement):
+    return statement.lstrip().upper().startswith(("SELECT", "WITH"))
+
+
+def full_scans(db_session, statement, parameters):
+    plan = db_session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    return [row[3] for row in plan if (m := FULL_SCAN.match(row[3])) and m.group(1) in HOT_TABLES]
+
+
+@pytest.fixture
+def seeded(db_session):
+    if db_session.query(User).filter_by(email="plan-teacher@test.com").first() is None:
+        teacher = User(email="plan-teacher@test.com", password_hash=get_password_hash("pass"), role=UserRole.teacher)
+        students = [User(email=f"plan-student{i}@test.com", password_hash=get_password_hash("pass"), role=UserRole.student)
+                    for i in range(3)]
+        db_session.add_all([teacher, *students])
+        db_session.flush()
+        for c in range(3):
+            room = Classroom(name=f"Plan {c}", join_code=f"plan-{c}", teacher_id=teacher.id, students=students[:c + 1])
+            room.subjects = [Subject(name=f"Subject {c}")]
+            room.lessons = [Lesson(title=f"Lesson {c}.{i}", scheduled_date=date(2033, 1, 1 + i)) for i in range(3)]
+            room.assignments = [Assignment(title=f"Assignment {c}.{i}") for i in range(3)]
+            db_session.add(room)
+            db_session.flush()
+            db_session.add_all(Grade(student_id=s.id, assignment_id=room.assignments[0].id, score=60) for s in room.students)
+        for s in students:
+            db_session.add(Analytics(student_id=s.id, teacher_id=teacher.id, data={"prompt": "p"}))
+            session = ChatSession(user_id=s.id, last_seq=1)
+            session.messages = [ChatMessage(seq=1, sender="user", text="hi")]
+            db_session.add(session)
+        db_session.commit()
+    return db_session
+
+
+@pytest.mark.parametrize("email,urls", [("plan-student0@test.com", STUDENT_URLS), ("plan-teacher@test.com", TEACHER_URLS)])
+def test_role_scoped_reads_never_fall_back_to_full_scans(client, seeded, sql_statements, email, urls):
+    headers = get_auth_headers(client, email, "pass")
+    advisor_snapshots._cache.clear()
+    problems = {}
+    for url in urls:
+        with sql_statements(is_read, with_parameters=True) as statements:
+            r = client.get(url, headers=headers)
+        assert r.status_code == 200, (url, r.text)
+        assert statements, url
+        for statement, parameters in statements:
+            scans = full_scans(seeded, statement, parameters)
+            if scans:
+                problems.setdefault(url, []).append((scans, " ".join(statement.split())))
+    assert not problems, problems
@@ -0,0 +1,61 @@
+from datetime import date
+
+from app.models import Assignment, Classroom, Lesson, User, UserRole
+from app.retrieval import BM25Index, ClassroomRetrieval
+from tests.conftest import fake_ollama
+
+
+def get_auth_headers(client, username, password):
+    token = client.post("/api/auth/login", data={"username": username, "password": password}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_bm25_ranks_matching_documents_and_updates_incrementally():
+    index = BM25Index()
+    index.upsert(("lesson", 1), "Photosynthesis in plants: light and chlorophyll")
+    index.upsert(("lesson", 2), "Adding fractions with unlike denominators")
+    index.upsert(("assignment", 3), "Fractions worksheet")
+    assert [key for _, key in index.search("adding fractions", 3)] == [("lesson", 2), ("assignment", 3)]
+    index.upsert(("lesson", 2), "Multiplying decimals")
+    assert [key for _, key in index.search("fractions", 3)] == [("assignment", 3)]
+    index.remove(("assignment", 3))
+    assert index.search("fractions", 3) == [] and "fractions" not in index.postings
+
+
+def test_snippets_come_from_the_classroom_and_fit_the_budget(db_session):
+    teacher = User(email="retrieval-teacher@test.com", password_hash="x", role=UserRole.teacher)
+    db_session.add(teacher)
+    db_session.commit()
+    room = Classroom(name="Biology", join_code="bio-ret", teacher_id=teacher.id)
+    db_session.add(room)
+    db_session.commit()
+    db_session.add_all([
+        Lesson(classroom_id=room.id, title="Photosynthesis", description="Light reactions and the Calvin cycle " * 40,
+               scheduled_date=date(2026, 10, 1)),
+        Assignment(classroom_id=room.id, title="Cell diagram", description="Label the parts of a plant cell"),
+    ])
+    db_session.commit()
+    retrieval = ClassroomRetrieval(top_k=4, token_budget=120, snippet_max_tokens=100)
+    snippets = retrieval.snippets(db_session, [room.id], "what happens in the calvin cycle of photosynthesis?")
+    assert snippets[0].startswith("Lesson: Photosynthesis") and snippets[0].endswith("...")
+    assert len(snippets[0]) <= 400 + 3
+    # edits pushed by the routes show up without a rebuild
+    retrieval.upsert(room.id, "assignment", 999, "Calvin cycle quiz", None)
+    assert "Assignment: Calvin cycle quiz" in retrieval.snippets(db_session, [room.id], "calvin cycle", token_budget=200)
+    assert retrieval.builds == 1
+
+
+def test_tutor_prompt_includes_classroom_material(client):
+    admin_headers = get_auth_headers(client, "admin@test.com", "password")
+    for email, role in (("rt-teacher@test.com", "teacher"), ("rt-student@test.com", "student")):
+        client.post("/api/users/", json={"email": email, "password": "pass", "role": role, "timezone": "UTC"}, headers=admin_headers)
+    teacher = get_auth_headers(client, "rt-teacher@test.com", "pass")
+    student = get_auth_headers(client, "rt-student@test.com", "pass")
+    room = client.post("/api/classrooms/", json={"name": "Volcanoes", "join_code": "ignored"}, headers=teacher).json()
+    client.post("/api/lessons/", json={"classroom_id": room["id"], "title": "Volcano types",
+                                        "description": "Shield volcanoes and stratovolcanoes", "scheduled_date": "2026-10-20"}, headers=teacher)
+    client.post("/api/classrooms/join", json={"join_code": room["join_code"]}, headers=student)
+    r = client.post("/api/ai/tutor", json={"prompt": "Why are shield volcanoes flat?"}, headers=student)
+    assert r.status_code == 200
+    grounding = [m["content"] for m in fake_ollama.state.stats.last_messages if m["role"] == "system"]
+    assert any("Lesson: Volcano types - Shield volcanoes and stratovolcanoes" in content for content in grounding)
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from app.singleflight import SingleFlight
+
+
+def make_factory(calls, chunks, delay=0.01, fail=False):
+    async def gen():
+        calls.append(1)
+        for chunk in chunks:
+            await asyncio.sleep(delay)
+            yield chunk
+        if fail:
+            raise RuntimeError("upstream failed")
+    return gen
+
+
+async def collect(stream):
+    return [chunk async for chunk in stream]
+
+
+def test_concurrent_identical_requests_share_one_upstream():
+    async def run():
+        flights = SingleFlight()
+        calls = []
+        factory = make_factory(calls, ["a", "b", "c"])
+        first = flights.stream("k", factory)
+        await first.__anext__()
+        # second subscriber joins mid-stream and still sees every chunk
+        second = flights.stream("k", factory)
+        rest, joined = await asyncio.gather(collect(first), collect(second))
+        assert ["a"] + rest == ["a", "b", "c"]
+        assert joined == ["a", "b", "c"]
+        assert len(calls) == 1
+        assert flights.stats()["coalesced"] == 1
+        assert flights.in_flight() == 0
+
+    asyncio.run(run())
+
+
+def test_upstream_error_reaches_every_subscriber():
+    async def run():
+        flights = SingleFlight()
+        factory = make_factory([], ["a"], fail=True)
+        streams = [flights.stream("k", factory) for _ in range(2)]
+        for stream in streams:
+            with pytest.raises(RuntimeError):
+                await collect(stream)
+
+    asyncio.run(run())
+
+
+def test_upstream_cancelled_when_last_subscriber_leaves():
+    async def run():
+        flights = SingleFlight()
+        factory = make_factory([], ["a"] * 100)
+        stream = flights.stream("k", factory)
+        await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0)
+        assert flights.in_flight() == 0
+        assert flights.stats()["cancelled"] == 1
+
+    asyncio.run(run())
@@ -0,0 +1,135 @@
+import asyncio
+import json
+
+from starlette.requests import Request
+
+from app import streaming
+from app.streaming import GenerationStats, coalesce, encode_frames, relay
+
+
+class FakeRequest:
+    def __init__(self):
+        self.disconnected = asyncio.Event()
+
+    async def is_disconnected(self):
+        return self.disconnected.is_set()
+
+
+def make_upstream(state, count=50, delay=0.01):
+    async def gen():
+        try:
+            for index in range(count):
+                await asyncio.sleep(delay)
+                state["produced"] = index + 1
+                yield "word "
+        finally:
+            state["closed"] = True
+    return gen()
+
+
+def test_relay_completes_and_persists_full_text(monkeypatch):
+    monkeypatch.setattr(streaming, "generation_stats", GenerationStats())
+
+    async def run():
+        state, finished = {}, []
+
+        async def on_finish(text, truncated):
+            finished.append((text, truncated))
+
+        chunks = [c async for c in relay(FakeRequest(), "tutor", "hi ", make_upstream(state, count=3), on_finish)]
+        assert "".join(chunks) == "hi word word word "
+        assert finished == [("hi word word word ", False)]
+        assert streaming.generation_stats.stats()["routes"]["tutor"]["completed"] == 1
+
+    asyncio.run(run())
+
+
+def test_disconnect_closes_upstream_and_persists_truncated_text(monkeypatch):
+    stats = GenerationStats()
+    stats.completed("tutor", "x" * 400)  # typical answer is ~100 tokens
+    monkeypatch.setattr(streaming, "generation_stats", stats)
+
+    async def run():
+        state, finished = {}, []
+
+        async def on_finish(text, truncated):
+            finished.append((text, truncated))
+
+        request = FakeRequest()
+        body = relay(request, "tutor", "hi ", make_upstream(state), on_finish)
+        received = [await body.__anext__(), await body.__anext__()]
+        request.disconnected.set()
+        received.extend([c async for c in body])
+        assert state["closed"] and state["produced"] < 50
+        assert len(finished) == 1
+        text, truncated = finished[0]
+        assert truncated and text == "".join(received)
+        snapshot = stats.stats()
+        assert snapshot["cancelled"] == 1
+        assert snapshot["tokens_saved"] > 0
+
+    asyncio.run(run())
+
+
+def test_relay_polls_the_request_instead_of_competing_for_receive(monkeypatch):
+    monkeypatch.setattr(streaming, "generation_stats", GenerationStats())
+
+    async def run():
+        state, finished, reads = {}, [], []
+        messages = [{"type": "http.disconnect"}]
+
+        async def on_finish(text, truncated):
+            finished.append((text, truncated))
+
+        async def receive():
+            reads.append(len(messages))
+            if messages:
+                return messages.pop()
+            await asyncio.sleep(3600)
+
+        request = Request({"type": "http", "method": "POST", "headers": []}, receive)
+        received = [c async for c in relay(request, "tutor", "hi ", make_upstream(state), on_finish)]
+        # the one queued disconnect is read by the relay's own poll, never by a background reader
+        assert received == ["hi "] and reads == [1] and state["closed"]
+        assert finished == [("hi ", True)]
+
+    asyncio.run(run())
+
+
+async def from_list(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def test_coalesce_passes_first_delta_then_batches_by_size():
+    async def run():
+        batches = [b async for b in coalesce(from_list(["a", "bb", "cc", "dd", "e"]), max_chars=4, max_delay=60)]
+        assert batches == [["a"], ["bb", "cc"], ["dd", "e"]]
+
+    asyncio.run(run())
+
+
+def test_coalesce_flushes_when_window_elapses():
+    ticks = iter([0.0, 0.0, 0.01, 0.2, 0.2, 0.2])
+
+    async def run():
+        batches = [b async for b in coalesce(from_list(["a", "b", "c", "d"]), max_chars=100, max_delay=0.05,
+                                             clock=lambda: next(ticks))]
+        assert batches == [["a"], ["b", "c"], ["d"]]
+
+    asyncio.run(run())
+
+
+def test_ndjson_frames_end_with_metadata():
+    async def run():
+        lines = [line async for line in encode_frames(from_list(["Hi", " there", "!"]), "ndjson", 0.0,
+                                                      {"model": "m"}, clock=lambda: 0.5,
+                                                      max_chars=100, max_delay=60)]
+        frames = [json.loads(line) for line in lines]
+        assert [f["id"] for f in frames] == [1, 2, 3]
+        assert [f.get("text") for f in frames[:2]] == ["Hi", " there!"]
+        done = frames[-1]
+        assert done["event"] == "done" and done["completion_tokens"] == 3 and done["frames"] == 2
+        assert done["ttft_ms"] == 500.0 and done["model"] == "m"
+
+    asyncio.run(run())
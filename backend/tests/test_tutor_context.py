@@ -0,0 +1,60 @@
+import asyncio
+
+from app.chat_history import append_messages
+from app.models import ChatMessage, ChatSession, User, UserRole
+from app.tutor_context import SessionSummarizer, build_context, estimate_tokens
+from tests.conftest import TestingSessionLocal
+
+
+def make_session(db, email):
+    owner = User(email=email, password_hash="x", role=UserRole.student)
+    db.add(owner)
+    db.commit()
+    chat = ChatSession(user_id=owner.id)
+    db.add(chat)
+    db.commit()
+    return chat
+
+
+def test_context_fills_budget_newest_first(db_session):
+    chat = make_session(db_session, "ctx@test.com")
+    append_messages(db_session, chat.id, [
+        ChatMessage(sender="user", text="a" * 400),
+        ChatMessage(sender="assistant", text="b" * 40),
+        ChatMessage(sender="user", text="c" * 40),
+    ])
+    db_session.commit()
+    history, fold_upto = build_context(db_session, chat, "prompt", token_budget=40)
+    # the long first message does not fit and is left for the summary
+    assert [m["content"][0] for m in history] == ["b", "c"]
+    assert fold_upto == 1
+    assert sum(estimate_tokens(m["content"]) for m in history) <= 40
+
+
+def test_summarizer_folds_old_turns_into_session_summary(db_session):
+    chat = make_session(db_session, "sum@test.com")
+    append_messages(db_session, chat.id, [ChatMessage(sender="user", text=f"turn {i}") for i in range(4)])
+    db_session.commit()
+    prompts = []
+
+    async def generate(prompt, instructions):
+        prompts.append(prompt)
+        yield "Student is practising "
+        yield "fractions."
+
+    async def run():
+        summarizer = SessionSummarizer(session_factory=TestingSessionLocal)
+        summarizer.schedule(chat.id, 2, generate)
+        summarizer.schedule(chat.id, 2, generate)
+        await asyncio.gather(*summarizer._tasks)
+        return summarizer
+
+    summarizer = asyncio.run(run())
+    assert summarizer.completed == 1 and len(prompts) == 1
+    assert "turn 1" in prompts[0] and "turn 2" not in prompts[0]
+    db_session.refresh(chat)
+    assert chat.summary == "Student is practising fractions." and chat.summary_seq == 2
+    history, fold_upto = build_context(db_session, chat, "next")
+    assert history[0]["role"] == "system" and "fractions" in history[0]["content"]
+    assert [m["content"] for m in history[1:]] == ["turn 2", "turn 3"]
+    assert fold_upto is None
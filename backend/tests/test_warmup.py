@@ -0,0 +1,46 @@
+import asyncio
+from datetime import datetime, timezone
+
+import httpx
+
+from app.ollama_pool import OllamaBackend, OllamaBackendPool, OllamaClientPool
+from app.warmup import ModelWarmer, SchoolHours, keep_alive_seconds
+
+
+def test_keep_alive_parsing():
+    assert keep_alive_seconds("30m") == 1800
+    assert keep_alive_seconds("2h") == 7200
+    assert keep_alive_seconds(45) == 45
+    assert keep_alive_seconds("-1") is None
+
+
+def test_school_hours_window():
+    hours = SchoolHours(["mon", "tue", "wed", "thu", "fri"], "07:00", "17:00", "UTC")
+    assert hours.contains(datetime(2026, 10, 14, 9, 30, tzinfo=timezone.utc))  # Wednesday
+    assert not hours.contains(datetime(2026, 10, 14, 18, 0, tzinfo=timezone.utc))
+    assert not hours.contains(datetime(2026, 10, 17, 9, 30, tzinfo=timezone.utc))  # Saturday
+
+
+def test_warmer_preloads_models_on_serving_backends():
+    loaded = []
+
+    def handler(request):
+        if request.url.host == "down":
+            raise httpx.ConnectError("refused", request=request)
+        loaded.append((request.url.host, request.read()))
+        return httpx.Response(200, json={"done": True})
+
+    clients = OllamaClientPool()
+    clients.transport_factory = lambda host, port: httpx.MockTransport(handler)
+    pool = OllamaBackendPool([OllamaBackend("a", 1, ["llama3.2"]), OllamaBackend("b", 2, ["mistral"]),
+                              OllamaBackend("down", 3, ["llama3.2"])], clients, probe_interval=0)
+    warmer = ModelWarmer(pool, models=["llama3.2", "mistral"], keep_alive="30m", interval=0)
+
+    async def run():
+        await warmer.start()
+        await clients.close()
+
+    asyncio.run(run())
+    assert sorted(host for host, _ in loaded) == ["a", "b"]
+    assert b'"keep_alive":"30m"' in loaded[0][1].replace(b" ", b"")
+    assert warmer.status() == {"llama3.2": ["a:1"], "mistral": ["b:2"]}
@@ -0,0 +1,107 @@
+import asyncio
+
+from app.chat_history import sequence_pending_messages
+from app.models import Analytics, ChatMessage, ChatSession, User, UserRole
+from app.write_behind import WriteBehindQueue
+from tests.conftest import TestingSessionLocal
+
+
+def test_rows_from_many_streams_flush_in_one_batch(db_session):
+    owner = User(email="wb@test.com", password_hash="x", role=UserRole.student)
+    db_session.add(owner)
+    db_session.commit()
+    chat = ChatSession(user_id=owner.id)
+    db_session.add(chat)
+    db_session.commit()
+
+    async def run():
+        queue = WriteBehindQueue(session_factory=TestingSessionLocal, max_batch=100, flush_interval=0.05)
+        queue.add_flush_hook(sequence_pending_messages)
+        await queue.start()
+        await asyncio.gather(*(
+            queue.submit(
+                Analytics(student_id=owner.id, data={"prompt": str(i), "response": "r"}),
+                ChatMessage(session_id=chat.id, sender="assistant", text=str(i)),
+            )
+            for i in range(10)
+        ))
+        await queue.close()
+        return queue.stats()
+
+    stats = asyncio.run(run())
+    assert stats["flushed_rows"] == 20
+    assert stats["batches"] == 1
+    assert stats["pending"] == 0
+    seqs = [m.seq for m in db_session.query(ChatMessage).filter_by(session_id=chat.id).order_by(ChatMessage.seq)]
+    assert seqs == list(range(1, 11))
+    assert db_session.query(Analytics).filter_by(student_id=owner.id).count() == 10
+
+
+def test_submit_writes_inline_when_not_started(db_session):
+    async def run():
+        queue = WriteBehindQueue(session_factory=TestingSessionLocal)
+        await queue.submit(Analytics(data={"prompt": "inline", "response": ""}))
+        return queue.stats()
+
+    stats = asyncio.run(run())
+    assert stats["inline_writes"] == 1 and stats["flushed_rows"] == 1
+
+
+def test_a_submit_that_does_not_fit_is_written_inline_exactly_once(db_session):
+    async def run():
+        queue = WriteBehindQueue(session_factory=TestingSessionLocal, max_pending=3, flush_interval=0.01)
+        await queue.start()
+        # nothing awaits in between, so the worker has not drained anything yet
+        await queue.submit(Analytics(data={"prompt": "fit-0", "response": ""}))
+        await queue.submit(Analytics(data={"prompt": "fit-1", "response": ""}))
+        await queue.submit(Analytics(data={"prompt": "fit-2", "response": ""}),
+                           Analytics(data={"prompt": "fit-3", "response": ""}))
+        await queue.close()
+        return queue.stats()
+
+    stats = asyncio.run(run())
+    assert stats["inline_writes"] == 1 and stats["flushed_rows"] == 4
+    prompts = sorted(a.data["prompt"] for a in db_session.query(Analytics) if a.data["prompt"].startswith("fit-"))
+    assert prompts == ["fit-0", "fit-1", "fit-2", "fit-3"]
+
+
+def test_a_bad_row_only_loses_itself(db_session):
+    async def run():
+        queue = WriteBehindQueue(session_factory=TestingSessionLocal, flush_interval=0.01)
+        await queue.start()
+        await queue.submit(Analytics(data={"prompt": "good-0", "response": ""}),
+                           Analytics(data={"prompt": "bad", "response": ""}, created_at="yesterday"),  # fails the batch
+                           Analytics(data={"prompt": "good-1", "response": ""}))
+        await queue.close()
+        return queue.stats()
+
+    stats = asyncio.run(run())
+    assert stats["flushed_rows"] == 2 and stats["dropped_rows"] == 1
+    prompts = sorted(a.data["prompt"] for a in db_session.query(Analytics) if a.data["prompt"].startswith("good-"))
+    assert prompts == ["good-0", "good-1"]
+
+
+def test_a_reply_for_a_deleted_session_is_dropped_without_the_rest_of_the_batch(db_session):
+    owner = User(email="wb-deleted@test.com", password_hash="x", role=UserRole.student)
+    db_session.add(owner)
+    db_session.commit()
+    kept, deleted = ChatSession(user_id=owner.id), ChatSession(user_id=owner.id)
+    db_session.add_all([kept, deleted])
+    db_session.commit()
+    kept_id, deleted_id = kept.id, deleted.id
+
+    async def run():
+        queue = WriteBehindQueue(session_factory=TestingSessionLocal, flush_interval=0.05)
+        queue.add_flush_hook(sequence_pending_messages)
+        await queue.start()
+        await queue.submit(ChatMessage(session_id=deleted_id, sender="assistant", text="late"),
+                           ChatMessage(session_id=kept_id, sender="assistant", text="on time"))
+        # the student deletes the session while its reply is still queued
+        db_session.delete(deleted)
+        db_session.commit()
+        await queue.close()
+        return queue.stats()
+
+    stats = asyncio.run(run())
+    assert stats["batches"] == 1 and stats["flushed_rows"] == 1 and stats["dropped_rows"] == 1
+    assert [m.text for m in db_session.query(ChatMessage).filter_by(session_id=kept_id)] == ["on time"]
@@ -0,0 +1 @@
+# CODEX: Developer tools: local Ollama stand-in and load benchmarks
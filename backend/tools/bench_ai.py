@@ -0,0 +1,157 @@
+# CODEX: Load benchmark for the streaming AI endpoints
+"""Drive /api/ai/tutor, /api/ai/lesson and /api/ai/analytics at fixed concurrency levels.
+
+Reports p50/p95/p99 time-to-first-token, total latency, request throughput and streamed
+characters per second for every endpoint and concurrency level. Point the API at a real
+Ollama or at the fake one:
+
+    python -m tools.fake_ollama --port 11434 --token-rate 40 --latency 0.3 &
+    uvicorn app.main:app --port 8000 &
+    python -m tools.bench_ai --base-url http://localhost:8000 --admin-email admin@example.com \
+        --admin-password secret --concurrency 1 8 32 --requests 64
+
+Bench users are created through the admin account when they do not exist yet. Use
+--json for machine-readable output (e.g. to compare against a stored baseline in CI).
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import httpx
+
+ENDPOINTS = {"tutor": "student", "lesson": "teacher", "analytics": "teacher"}
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile; None for an empty sample."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+async def login(client: httpx.AsyncClient, email: str, password: str) -> Dict[str, str]:
+    resp = await client.post("/api/auth/login", data={"username": email, "password": password})
+    resp.raise_for_status()
+    return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+
+async def ensure_user(client: httpx.AsyncClient, admin_headers: Dict[str, str], email: str, password: str, role: str):
+    resp = await client.post("/api/users/", json={"email": email, "password": password, "role": role, "timezone": "UTC"},
+                             headers=admin_headers)
+    if resp.status_code not in (200, 201, 400, 409):
+        resp.raise_for_status()
+
+
+async def one_request(client: httpx.AsyncClient, endpoint: str, headers: Dict[str, str], prompt: str) -> dict:
+    started = time.perf_counter()
+    first = None
+    chars = 0
+    try:
+        async with client.stream("POST", f"/api/ai/{endpoint}", json={"prompt": prompt}, headers=headers) as resp:
+            if resp.status_code != 200:
+                await resp.aread()
+                return {"ok": False, "status": resp.status_code}
+            async for chunk in resp.aiter_text():
+                if chunk and first is None:
+                    first = time.perf_counter() - started
+                chars += len(chunk)
+    except httpx.HTTPError as exc:
+        return {"ok": False, "status": type(exc).__name__}
+    return {"ok": True, "ttft": first if first is not None else time.perf_counter() - started,
+            "total": time.perf_counter() - started, "chars": chars}
+
+
+async def run_level(client: httpx.AsyncClient, endpoint: str, headers: Dict[str, str], concurrency: int,
+                    requests: int, unique_prompts: bool) -> dict:
+    queue: asyncio.Queue = asyncio.Queue()
+    for index in range(requests):
+        # lesson/analytics answers are cached and coalesced, so vary prompts to measure generation
+        queue.put_nowait(f"Explain topic {uuid.uuid4().hex if unique_prompts else index % 4} step by step")
+    results = []
+
+    async def worker():
+        while not queue.empty():
+            prompt = queue.get_nowait()
+            results.append(await one_request(client, endpoint, headers, prompt))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    ok = [r for r in results if r["ok"]]
+    errors: Dict[str, int] = {}
+    for r in results:
+        if not r["ok"]:
+            errors[str(r["status"])] = errors.get(str(r["status"]), 0) + 1
+    ttft = [r["ttft"] for r in ok]
+    total = [r["total"] for r in ok]
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": len(results),
+        "ok": len(ok),
+        "errors": errors,
+        "ttft": {p: percentile(ttft, p) for p in (50, 95, 99)},
+        "latency": {p: percentile(total, p) for p in (50, 95, 99)},
+        "throughput_rps": len(ok) / elapsed if elapsed else 0.0,
+        "chars_per_second": sum(r["chars"] for r in ok) / elapsed if elapsed else 0.0,
+    }
+
+
+def format_row(row: dict) -> str:
+    def ms(value):
+        return "     -" if value is None else f"{value * 1000:6.0f}"
+    return (f"{row['endpoint']:<10}{row['concurrency']:>5}{row['ok']:>6}/{row['requests']:<5}"
+            f"{ms(row['ttft'][50])}{ms(row['ttft'][95])}{ms(row['ttft'][99])}  "
+            f"{ms(row['latency'][50])}{ms(row['latency'][95])}{ms(row['latency'][99])}  "
+            f"{row['throughput_rps']:8.1f}{row['chars_per_second']:10.0f}  {row['errors'] or ''}")
+
+
+async def bench(args) -> List[dict]:
+    limits = httpx.Limits(max_connections=max(args.concurrency) + 4)
+    timeout = httpx.Timeout(args.timeout)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=timeout) as client:
+        headers = {}
+        if args.admin_email:
+            admin = await login(client, args.admin_email, args.admin_password)
+            for role in set(ENDPOINTS.values()):
+                await ensure_user(client, admin, f"bench-{role}@example.com", args.user_password, role)
+        for role in set(ENDPOINTS.values()):
+            headers[role] = await login(client, f"bench-{role}@example.com", args.user_password)
+        rows = []
+        for endpoint in args.endpoints:
+            for concurrency in args.concurrency:
+                rows.append(await run_level(client, endpoint, headers[ENDPOINTS[endpoint]], concurrency,
+                                            args.requests, not args.repeat_prompts))
+                if not args.json:
+                    print(format_row(rows[-1]), flush=True)
+        return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load benchmark for the streaming AI endpoints")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--admin-email", help="admin used to create the bench users if needed")
+    parser.add_argument("--admin-password")
+    parser.add_argument("--user-password", default="bench-password")
+    parser.add_argument("--endpoints", nargs="+", choices=list(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=32, help="requests per endpoint and concurrency level")
+    parser.add_argument("--repeat-prompts", action="store_true", help="reuse a few prompts to exercise cache/coalescing")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+    if not args.json:
+        print(f"{'endpoint':<10}{'conc':>5}{'ok':>6}{'':<6}{'ttft p50/p95/p99 ms':>18}  "
+              f"{'total p50/p95/p99 ms':>18}  {'req/s':>8}{'chars/s':>10}")
+    rows = asyncio.run(bench(args))
+    if args.json:
+        print(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# CODEX: Benchmark for the classroom BM25 retrieval index
+"""Measure index build, incremental update and query time of app.retrieval.BM25Index.
+
+Uses a synthetic corpus (no database needed), sized like a school: many classrooms with a
+few hundred lessons and assignments each.
+
+    python -m tools.bench_retrieval --classrooms 50 --docs 300 --queries 2000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from app.retrieval import BM25Index, make_document
+
+TOPICS = """fractions decimals percentages ratios algebra equations inequalities functions graphs geometry
+triangles circles area volume probability statistics photosynthesis cells mitochondria genetics evolution
+ecosystems atoms molecules reactions acids bases energy forces motion gravity electricity magnetism waves
+light sound volcanoes earthquakes climate weather rivers continents empires revolution democracy trade
+poetry grammar essays novels vocabulary reading writing debate programming loops variables algorithms""".split()
+FILLER = """review practice introduce explore compare explain solve describe analyse discuss investigate
+worksheet homework project quiz group chapter unit exercises examples notes summary questions""".split()
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(TOPICS if rng.random() < 0.4 else FILLER) for _ in range(words))
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the classroom BM25 retrieval index")
+    parser.add_argument("--classrooms", type=int, default=50)
+    parser.add_argument("--docs", type=int, default=300, help="lessons + assignments per classroom")
+    parser.add_argument("--words", type=int, default=40, help="words per description")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--top-k", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    corpus = [[(("lesson" if i % 2 else "assignment", i), sentence(rng, 6), sentence(rng, args.words))
+               for i in range(args.docs)] for _ in range(args.classrooms)]
+
+    started = time.perf_counter()
+    indexes = []
+    for docs in corpus:
+        index = BM25Index()
+        for key, title, description in docs:
+            index.upsert(key, *make_document(key[0], title, description))
+        indexes.append(index)
+    build = time.perf_counter() - started
+    total_docs = args.classrooms * args.docs
+
+    updates = []
+    for _ in range(1000):
+        index = rng.choice(indexes)
+        key = (rng.choice(["lesson", "assignment"]), rng.randrange(args.docs))
+        t = time.perf_counter()
+        index.upsert(key, *make_document(key[0], sentence(rng, 6), sentence(rng, args.words)))
+        updates.append(time.perf_counter() - t)
+
+    latencies = []
+    for _ in range(args.queries):
+        index = rng.choice(indexes)
+        query = sentence(rng, rng.randint(4, 30))
+        t = time.perf_counter()
+        index.search(query, args.top_k)
+        latencies.append(time.perf_counter() - t)
+
+    terms = sum(len(index.postings) for index in indexes)
+    print(f"corpus: {args.classrooms} classrooms x {args.docs} docs = {total_docs} docs, {terms} postings lists")
+    print(f"build:  {build * 1000:.1f} ms total, {build / total_docs * 1e6:.1f} us/doc")
+    print(f"update: p50 {percentile(updates, 50) * 1e6:.1f} us, p95 {percentile(updates, 95) * 1e6:.1f} us")
+    print(f"query:  p50 {percentile(latencies, 50) * 1e6:.1f} us, p95 {percentile(latencies, 95) * 1e6:.1f} us, "
+          f"p99 {percentile(latencies, 99) * 1e6:.1f} us, mean {statistics.mean(latencies) * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
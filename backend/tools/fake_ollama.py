@@ -0,0 +1,144 @@
+# CODEX: Fake OpenAI-compatible Ollama server for tests and load benchmarks
+"""Stand-in for an Ollama node that streams canned tokens at a controlled pace.
+
+Serves /v1/chat/completions (SSE, like Ollama's OpenAI-compatible API), /api/tags and
+/api/generate. Time-to-first-token, token rate, jitter and error rate are configurable, so
+the API's streaming path can be measured without a GPU:
+
+    python -m tools.fake_ollama --port 11434 --token-rate 40 --latency 0.3 --jitter 0.2
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_TEXT = (
+    "Photosynthesis is how plants turn light, water and carbon dioxide into sugar and oxygen. "
+    "The light reactions happen in the thylakoids and the Calvin cycle in the stroma."
+)
+
+
+class FakeOllamaStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.cancelled = 0
+        self.tokens = 0
+        self.last_messages = []
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
+
+
+def create_app(token_rate: float = 50.0, latency: float = 0.05, jitter: float = 0.0, error_rate: float = 0.0,
+               tokens: int = 40, models: Optional[List[str]] = None, text: str = DEFAULT_TEXT,
+               seed: Optional[int] = None) -> FastAPI:
+    """Build the fake server.
+
+    token_rate: tokens per second after the first one (0 streams as fast as possible).
+    latency: seconds before the first token (prompt processing).
+    jitter: relative random variation (0..1) applied to every delay.
+    error_rate: probability that a request fails with HTTP 500 before streaming.
+    tokens: tokens per answer; words of text are cycled to reach it.
+    """
+    app = FastAPI(title="Fake Ollama")
+    rng = random.Random(seed)
+    words = text.split()
+    stats = FakeOllamaStats()
+    app.state.stats = stats
+    served_models = models or ["llama3.2"]
+
+    def delay(base: float) -> float:
+        if not base:
+            return 0.0
+        return max(0.0, base * (1 + rng.uniform(-jitter, jitter)))
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": m if ":" in m else f"{m}:latest"} for m in served_models]}
+
+    @app.post("/api/generate")
+    async def generate(body: dict):
+        # an empty prompt is Ollama's "load the model" call used for warm-up
+        await asyncio.sleep(delay(latency))
+        return {"model": body.get("model"), "response": "", "done": True}
+
+    @app.get("/stats")
+    async def read_stats():
+        return stats.as_dict()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats.requests += 1
+        stats.last_messages = body.get("messages", [])
+        if error_rate and rng.random() < error_rate:
+            stats.errors += 1
+            return JSONResponse({"error": {"message": "injected failure"}}, status_code=500)
+        model = body.get("model", served_models[0])
+        created = int(time.time())
+        answer = [words[i % len(words)] + " " for i in range(tokens)]
+        if not body.get("stream"):
+            generation = sum(delay(1 / token_rate) for _ in answer[1:]) if token_rate else 0.0
+            await asyncio.sleep(delay(latency) + generation)
+            return {"id": "chatcmpl-fake", "object": "chat.completion", "created": created, "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(answer)},
+                                 "finish_reason": "stop"}]}
+
+        def frame(delta: dict, finish_reason=None) -> str:
+            chunk = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            return f"data: {json.dumps(chunk)}\n\n"
+
+        async def events():
+            stats.in_flight += 1
+            stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+            finished = False
+            try:
+                await asyncio.sleep(delay(latency))
+                for index, token in enumerate(answer):
+                    if index and token_rate:
+                        await asyncio.sleep(delay(1 / token_rate))
+                    stats.tokens += 1
+                    yield frame({"role": "assistant", "content": token} if index == 0 else {"content": token})
+                yield frame({}, "stop")
+                yield "data: [DONE]\n\n"
+                finished = True
+            finally:
+                stats.in_flight -= 1
+                if not finished:
+                    stats.cancelled += 1
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible Ollama server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--token-rate", type=float, default=50.0, help="tokens per second (0 = unthrottled)")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds before the first token")
+    parser.add_argument("--jitter", type=float, default=0.0, help="relative delay variation, 0..1")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--tokens", type=int, default=40, help="tokens per answer")
+    parser.add_argument("--model", action="append", dest="models", help="model to advertise (repeatable)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    import uvicorn
+    app = create_app(token_rate=args.token_rate, latency=args.latency, jitter=args.jitter,
+                     error_rate=args.error_rate, tokens=args.tokens, models=args.models, seed=args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()